@@ -0,0 +1 @@
+"""Benchmarks for the search and evaluation hot paths."""
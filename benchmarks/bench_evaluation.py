@@ -0,0 +1,40 @@
+"""Benchmark batch move evaluation against applying and scoring each move.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_evaluation
+"""
+import time
+from models import ArrayBoard
+from models.evaluation import MoveEvaluator
+from benchmarks.positions import make_position
+
+def time_per_call(fn, repeats: int) -> float:
+    """Average wall time of fn in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+def main(repeats: int = 500) -> None:
+    print(f"{'position':<26}{'board':<12}{'moves':>6}{'loop us':>10}{'batch us':>10}{'speedup':>9}")
+    for no_players, style, turns in [(1, 'rectangle', 2), (2, 'diamond', 4), (3, 'linear', 6), (4, 'rectangle', 8)]:
+        game = make_position(no_players, style, turns, seed=no_players)
+        cards = game.get_turn_building_cards(False, 4)
+        for board in [game.board, ArrayBoard.from_board(game.board)]:
+            moves = game.players[0]._generate_possible_moves(board, cards)
+            evaluator = MoveEvaluator(board)
+
+            def loop():
+                for move in moves:
+                    move.apply(board)
+                    board.calc_player_net(0)
+                    move.revert(board)
+
+            loop_us = time_per_call(loop, repeats)
+            batch_us = time_per_call(lambda: evaluator.evaluate(board, moves), repeats)
+            name = f'{no_players}p {style} turn {turns}'
+            print(f'{name:<26}{type(board).__name__:<12}{len(moves):>6}{loop_us:>10.1f}{batch_us:>10.1f}{loop_us / batch_us:>8.2f}x')
+
+if __name__ == '__main__':
+    main()
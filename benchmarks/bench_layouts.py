@@ -0,0 +1,30 @@
+"""Benchmark bulk layout generation and scoring against building each Board.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_layouts
+"""
+import time
+from models import Board, Settings
+from models.layouts import generate_layouts, score_layouts
+
+def main(no_layouts: int = 100000, no_boards: int = 200) -> None:
+    settings = Settings()
+    print(f"{'board':<16}{'Board us':>10}{'generate us':>13}{'score us':>10}{'speedup':>9}")
+    for no_players, style in [(2, 'rectangle'), (3, 'diamond'), (4, 'linear')]:
+        start = time.perf_counter()
+        for _ in range(no_boards):
+            Board(settings, no_players, style=style)
+        board_us = (time.perf_counter() - start) / no_boards * 1e6
+
+        start = time.perf_counter()
+        layouts = generate_layouts(no_layouts, no_players, style, settings, seed=0)
+        generate_us = (time.perf_counter() - start) / no_layouts * 1e6
+        start = time.perf_counter()
+        score_layouts(layouts, no_players, settings)
+        score_us = (time.perf_counter() - start) / no_layouts * 1e6
+        name = f'{no_players}p {style}'
+        print(f'{name:<16}{board_us:>10.1f}{generate_us:>13.2f}{score_us:>10.2f}{board_us / (generate_us + score_us):>8.0f}x')
+
+if __name__ == '__main__':
+    main()
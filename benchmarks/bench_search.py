@@ -0,0 +1,211 @@
+"""Benchmark the search and evaluation hot paths on fixed seeded positions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search --save baseline.json
+    python -m benchmarks.bench_search --compare baseline.json
+
+Every position (early, mid and late game; 1-4 players; rectangle, diamond
+and linear boards) times Board.calc_player_net, Player._generate_possible_moves,
+generate_move_codes, GameMove.validate_move, copy.deepcopy(Board) and find_best_move at each
+depth up to --max-depth. Searches report nodes/sec and the peak memory
+allocated during the search, measured in a separate traced run so tracing
+does not distort the timings. With --parallel, ParallelSearch is also
+timed on a few positions at each --parallel-depths depth for each number of
+--workers, and its speedup over the serial search is reported. With
+--compare, any benchmark slower than the baseline by more than --tolerance
+is reported and the exit code is 1.
+"""
+from typing import List, Dict, Optional, Callable
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+from benchmarks.positions import all_positions
+from models.move_codes import generate_move_codes
+from models.parallel import ParallelSearch
+
+PARALLEL_POSITIONS = ['2p-rectangle-early', '3p-diamond-mid']
+
+def time_per_call(fn: Callable, min_time: float) -> float:
+    """Average wall time of fn in microseconds, repeating it for at least min_time seconds."""
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls * 1e6
+
+def run(max_depth: int = 4, min_time: float = 0.05, prune: bool = True) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark.
+
+    Args:
+        max_depth: Deepest find_best_move search to time
+        min_time: Seconds each hot path benchmark repeats for
+        prune: Search with branch-and-bound pruning
+
+    Returns:
+        Dictionary from benchmark name to its measurements; 'us' is the
+        time per call in microseconds
+    """
+    results = {}
+    for name, game in all_positions():
+        board, player = game.board, game.players[0]
+        cards = game.get_turn_building_cards(False, 4)
+        moves = player._generate_possible_moves(board, cards)
+
+        def validate_all():
+            for move in moves:
+                move.validate_move(board)
+
+        results[f'calc_player_net/{name}'] = {'us': time_per_call(lambda: board.calc_player_net(0), min_time)}
+        results[f'generate_moves/{name}'] = {'us': time_per_call(lambda: player._generate_possible_moves(board, cards), min_time)}
+        results[f'move_codes/{name}'] = {'us': time_per_call(lambda: generate_move_codes(board, 0, cards), min_time)}
+        results[f'validate_move/{name}'] = {'us': time_per_call(validate_all, min_time) / max(len(moves), 1)}
+        results[f'deepcopy_board/{name}'] = {'us': time_per_call(lambda: copy.deepcopy(board), min_time)}
+
+        for depth in range(1, max_depth + 1):
+            _, _, count = player.find_best_move(board, cards, max_depth=depth, prune=prune)
+            seconds = time_per_call(lambda: player.find_best_move(board, cards, max_depth=depth, prune=prune), min_time) / 1e6
+            tracemalloc.start()
+            player.find_best_move(board, cards, max_depth=depth, prune=prune)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[f'find_best_move_d{depth}/{name}'] = {
+                'us': seconds * 1e6,
+                'nodes': count,
+                'nodes_per_sec': count / seconds,
+                'peak_kib': peak / 1024,
+            }
+        print(f'{name:<22}' + ''.join(f" d{d} {results[f'find_best_move_d{d}/{name}']['us'] / 1e6:7.3f}s"
+                                      for d in range(1, max_depth + 1)), flush=True)
+    return results
+
+def default_workers() -> List[int]:
+    """Powers of two up to the CPU count, and the CPU count itself."""
+    cpus = os.cpu_count() or 1
+    return sorted({2 ** k for k in range(cpus.bit_length()) if 2 ** k <= cpus} | {cpus})
+
+def run_parallel(depths: Optional[List[int]] = None, workers: Optional[List[int]] = None, positions: Optional[List[str]] = None,
+                 min_time: float = 0.05, prune: bool = True) -> Dict[str, Dict[str, float]]:
+    """Time ParallelSearch against the serial search for several worker counts.
+
+    Each pool is started, and its workers warmed up with a shallow search,
+    before it is timed, so the speedups measure the search alone.
+
+    Args:
+        depths: Search depths to time, defaults to 4 and 5
+        workers: Worker counts to time, defaults to default_workers()
+        positions: Names of the positions to search, see all_positions,
+            defaults to PARALLEL_POSITIONS
+        min_time: Seconds each search repeats for
+        prune: Search with branch-and-bound pruning
+
+    Returns:
+        Dictionary from benchmark name to its measurements; 'us' is the
+        time per search in microseconds, 'speedup' the serial time over it
+        and 'efficiency' the speedup per worker
+    """
+    depths = depths or [4, 5]
+    workers = workers or default_workers()
+    games = dict(all_positions())
+    results = {}
+    for name in positions or PARALLEL_POSITIONS:
+        game = games[name]
+        board, player = game.board, game.players[0]
+        cards = game.get_turn_building_cards(False, 4)
+        serial = {}
+        for depth in depths:
+            _, serial_net, _ = player.find_best_move(board, cards, max_depth=depth, prune=prune)
+            serial[depth] = (time_per_call(lambda: player.find_best_move(board, cards, max_depth=depth, prune=prune), min_time),
+                             serial_net)
+        for no_workers in workers:
+            with ParallelSearch(board, max_workers=no_workers) as pool:
+                pool.search(player, board, cards, max_depth=1)
+                for depth in depths:
+                    serial_us, serial_net = serial[depth]
+                    _, net, _ = pool.search(player, board, cards, max_depth=depth, prune=prune)
+                    if net != serial_net:
+                        raise AssertionError(f'{name} d{depth}: parallel net {net} differs from serial net {serial_net}')
+                    us = time_per_call(lambda: pool.search(player, board, cards, max_depth=depth, prune=prune), min_time)
+                    results[f'parallel_d{depth}_w{no_workers}/{name}'] = {
+                        'us': us,
+                        'speedup': serial_us / us,
+                        'efficiency': serial_us / us / no_workers,
+                    }
+        for depth in depths:
+            print(f'{name:<22} d{depth} serial {serial[depth][0] / 1e6:7.3f}s' +
+                  ''.join(f" w{w} {results[f'parallel_d{depth}_w{w}/{name}']['speedup']:5.2f}x" for w in workers), flush=True)
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Benchmarks that got slower than the baseline by more than the tolerance.
+
+    Args:
+        results: Measurements from run
+        baseline: Measurements from an earlier run
+        tolerance: Allowed slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        Description of each regression
+    """
+    regressions = []
+    for name, measured in results.items():
+        if name not in baseline:
+            continue
+        ratio = measured['us'] / baseline[name]['us']
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {baseline[name]['us']:.1f}us -> {measured['us']:.1f}us ({ratio:.2f}x)")
+    return regressions
+
+def summarise(results: Dict[str, Dict[str, float]]) -> None:
+    """Print the mean of each benchmark over all positions."""
+    groups: Dict[str, List[Dict[str, float]]] = {}
+    for name, measured in results.items():
+        groups.setdefault(name.split('/')[0], []).append(measured)
+    print(f"\n{'benchmark':<20}{'mean us':>12}{'nodes/sec':>12}{'peak KiB':>10}")
+    for group, measurements in groups.items():
+        line = f"{group:<20}{sum(m['us'] for m in measurements) / len(measurements):>12.1f}"
+        if 'nodes_per_sec' in measurements[0]:
+            line += f"{sum(m['nodes_per_sec'] for m in measurements) / len(measurements):>12.0f}"
+            line += f"{max(m['peak_kib'] for m in measurements):>10.0f}"
+        if 'speedup' in measurements[0]:
+            line += f"   speedup {sum(m['speedup'] for m in measurements) / len(measurements):.2f}x"
+        print(line)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the search and evaluation hot paths.')
+    parser.add_argument('--max-depth', type=int, default=4, help='deepest find_best_move search to time')
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds each hot path benchmark repeats for')
+    parser.add_argument('--no-prune', action='store_true', help='search without branch-and-bound pruning')
+    parser.add_argument('--parallel', action='store_true', help='also time ParallelSearch against the serial search')
+    parser.add_argument('--parallel-depths', type=int, nargs='+', default=[4, 5], help='search depths to time ParallelSearch at')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='worker counts to time ParallelSearch with, defaults to powers of two up to the CPU count')
+    parser.add_argument('--save', help='write the results to this baseline file')
+    parser.add_argument('--compare', help='compare the results against this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args.max_depth, args.min_time, not args.no_prune)
+    if args.parallel:
+        results.update(run_parallel(args.parallel_depths, args.workers, min_time=args.min_time, prune=not args.no_prune))
+    summarise(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print(f'\n{len(regressions)} regressions against {args.compare}')
+        for regression in regressions:
+            print('  ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
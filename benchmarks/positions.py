@@ -0,0 +1,23 @@
+"""Fixed seeded positions shared by the benchmarks."""
+from typing import List, Tuple
+import random
+from models import Game, Settings
+
+PHASES = {'early': 1, 'mid': 4, 'late': 8}
+STYLES = ['rectangle', 'diamond', 'linear']
+
+def make_position(no_players: int, style: str, turns: int, seed: int) -> Game:
+    """Create a game and advance it with seeded random moves."""
+    random.seed(seed)
+    game = Game(Settings(), no_players=no_players, board_style=style)
+    cards = game.get_turn_building_cards(False, 4)
+    rng = random.Random(seed)
+    for _ in range(turns):
+        for player in game.players:
+            rng.choice(player._generate_possible_moves(game.board, cards)).apply(game.board)
+    return game
+
+def all_positions() -> List[Tuple[str, Game]]:
+    """Every phase, player count and board style, named like '2p-diamond-mid'."""
+    return [(f'{no_players}p-{style}-{phase}', make_position(no_players, style, turns, seed=no_players))
+            for no_players in range(1, 5) for style in STYLES for phase, turns in PHASES.items()]
@@ -1,21 +1,27 @@
 """Game models package containing core game components and logic."""
 
+from models.adversarial_player import AdversarialPlayer
+from models.array_board import ArrayBoard
 from models.board import Board
 from models.board_card import BoardCard
 from models.building_card import BuildingCard
 from models.card import Card
 from models.deck import Deck
 from models.game import Game
+from models.mcts_player import MCTSPlayer
 from models.player import Player
 from models.settings import Settings
 
 __all__ = [
+    'AdversarialPlayer',
+    'ArrayBoard',
     'Board',
     'BoardCard',
     'BuildingCard',
     'Card',
     'Deck',
     'Game',
+    'MCTSPlayer',
     'Player',
     'Settings',
 ]
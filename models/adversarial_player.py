@@ -0,0 +1,237 @@
+"""Multi-player adversarial search player (paranoid and max-n)."""
+from typing import List, Tuple, Optional
+from models.settings import Settings
+from models.board import Board
+from models.game_move import GameMove
+from models.building_card import BuildingCard
+from models.player import Player
+from models.move_ordering import MoveOrdering
+from models.search_budget import SearchBudget, SearchBudgetExceeded
+from models.search_stats import SearchStats
+from models.move_codes import generate_move_codes, apply_code, revert_code, to_game_move
+
+MODES = ['paranoid', 'maxn']
+
+class AdversarialPlayer(Player):
+    """Player whose search interleaves the other players' moves with its own.
+
+    Player.find_best_move assumes nobody else moves, but opponents share the
+    total prices of markets on the same cards and take building slots. This
+    player searches sequences in which every player moves in seat order from
+    itself, as in Game.play_turn, with max_depth counting the moves of all
+    players. A player with no valid move passes.
+
+    In 'paranoid' mode the other players are assumed to play to minimise this
+    player's net, which is searched with alpha-beta pruning. In 'maxn' mode
+    every player maximises its own net; as deep pruning is unsound for max-n,
+    a subtree is only cut off when the upper bound on the net of the player
+    moving just above it cannot beat that player's best alternative (shallow
+    pruning). Both modes also cut off subtrees whose bound on the searching
+    player's net is already beaten, and order moves with a MoveOrdering
+    shared by the passes of an iterative deepening loop.
+    """
+
+    def __init__(self, player_ind: int, game_settings: Settings, mode: str = 'paranoid', prune: bool = True) -> None:
+        """Initialize the player.
+
+        Args:
+            player_ind: Player index
+            game_settings: Game settings configuration
+            mode: 'paranoid' or 'maxn'
+            prune: Use alpha-beta, shallow and bound pruning
+        """
+        super().__init__(player_ind, game_settings)
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.mode = mode
+        self.prune = prune
+        self._player_bound_tables = None
+        self._movers = None
+
+    def find_best_move(self, board: Board, available_building_cards: List[BuildingCard], max_depth: Optional[int] = None,
+                       moves_to_try: int = -1, time_budget: Optional[float] = None, node_budget: Optional[int] = None,
+                       ordering: Optional[MoveOrdering] = None, stats: Optional[SearchStats] = None,
+                       budget: Optional[SearchBudget] = None) -> Tuple[Optional[GameMove], float, int]:
+        """Choose a move by adversarial search, deepening until the depth or budget runs out.
+
+        Takes only the arguments that apply to this search, so a call with
+        arguments for Player.find_best_move such as transposition_table or
+        position_cache raises TypeError instead of being ignored.
+
+        Args:
+            board: Current game board state; left unchanged
+            available_building_cards: Building cards available to every player
+            max_depth: Moves to look ahead, counting every player's moves,
+                defaults to one move by each player
+            moves_to_try: Number of moves tried at each node, -1 for all
+            time_budget: Seconds to search for, None for no limit
+            node_budget: Moves to evaluate in total, None for no limit
+            ordering: Optional MoveOrdering to reuse, e.g. between turns
+            stats: Optional SearchStats to add this search's counters to
+            budget: Optional started SearchBudget to search within instead
+                of time_budget and node_budget
+
+        Returns:
+            The best move from the deepest completed pass, or None
+            This player's net at the end of the expected move sequence
+            The number of moves evaluated over all completed passes
+            The completed depth is left in self.last_completed_depth.
+        """
+        max_depth = max_depth or board.no_players
+        if budget is None:
+            budget = SearchBudget(time_budget, node_budget)
+            budget.start()
+        elif time_budget is not None or node_budget is not None:
+            raise ValueError('pass either a budget or time_budget and node_budget')
+        ordering = ordering if ordering is not None else MoveOrdering()
+        self.stats = stats if stats is not None else SearchStats()
+        self._movers = [(self.player_no + k) % board.no_players for k in range(board.no_players)]
+        if self.prune:
+            self._player_bound_tables = [self._calc_bound_tables(board, available_building_cards, p) for p in range(board.no_players)]
+        best_code, best_net, total_count = None, float('-inf'), 0
+        self.last_completed_depth = 0
+
+        for depth in range(1, max_depth + 1):
+            budget.enforced = depth > 1
+            try:
+                if self.mode == 'paranoid':
+                    code, net, total_count = self._search_paranoid(board, available_building_cards, depth, moves_to_try, 0, total_count,
+                                                                   float('-inf'), float('inf'), ordering, budget)
+                else:
+                    code, nets, total_count = self._search_maxn(board, available_building_cards, depth, moves_to_try, 0, total_count,
+                                                                None, float('-inf'), ordering, budget)
+                    net = nets[self.player_no]
+            except SearchBudgetExceeded:
+                break
+            best_code, best_net = code, net
+            self.last_completed_depth = depth
+            if budget.exhausted(total_count):
+                break
+
+        move = to_game_move(best_code, board, available_building_cards) if best_code is not None else None
+        return move, best_net, total_count
+
+    def _moves_left(self, player_ind: int, current_depth: int, max_depth: int) -> Tuple[int, bool]:
+        """Moves a player makes from current_depth to the horizon, and whether anyone else moves."""
+        movers = [self._movers[d % len(self._movers)] for d in range(current_depth, max_depth)]
+        return movers.count(player_ind), any(p != player_ind for p in movers)
+
+    def _net_upper_bound(self, board: Board, player_ind: int, current_depth: int, max_depth: int) -> float:
+        moves_left, contested = self._moves_left(player_ind, current_depth, max_depth)
+        return self._calc_net_upper_bound(board, moves_left, player_ind, self._player_bound_tables[player_ind], contested)
+
+    def _expand(self, board: Board, available_building_cards: List[BuildingCard], player_ind: int, moves_to_try: int,
+                current_depth: int, ordering: MoveOrdering) -> Tuple[List[int], int]:
+        """Ordered move codes of the player to move, and the ordering key of the position."""
+        codes = generate_move_codes(board, player_ind, available_building_cards)
+        codes = codes[:moves_to_try] if moves_to_try > 0 else codes
+        self.stats.expanded += 1
+        self.stats.moves_generated += len(codes)
+        key = board.zobrist_hash ^ board.zobrist.player(player_ind)
+        return ordering.order(codes, key, current_depth), key
+
+    def _search_paranoid(self, board: Board, available_building_cards: List[BuildingCard], max_depth: int, moves_to_try: int,
+                         current_depth: int, current_count: int, alpha: float, beta: float, ordering: MoveOrdering,
+                         budget: SearchBudget) -> Tuple[Optional[int], float, int]:
+        """Alpha-beta search of this player's net against every other player.
+
+        Returns:
+            The code of the best move for the player to move or None, the
+            value of the position (an upper bound if at most alpha, a lower
+            bound if at least beta) and the number of moves evaluated
+        """
+        budget.check(current_count)
+        self.stats.visit(current_depth)
+        if current_depth == max_depth:
+            return None, board.calc_player_net(self.player_no), current_count
+
+        if self.prune and alpha > float('-inf'):
+            upper_bound = self._net_upper_bound(board, self.player_no, current_depth, max_depth)
+            if upper_bound <= alpha:
+                self.stats.cutoffs += 1
+                return None, upper_bound, current_count
+
+        player_ind = self._movers[current_depth % len(self._movers)]
+        codes, key = self._expand(board, available_building_cards, player_ind, moves_to_try, current_depth, ordering)
+        if not codes:
+            _, value, current_count = self._search_paranoid(board, available_building_cards, max_depth, moves_to_try, current_depth + 1,
+                                                            current_count, alpha, beta, ordering, budget)
+            return None, value, current_count
+
+        maximising = player_ind == self.player_no
+        best_code, best_value = None, float('-inf') if maximising else float('inf')
+        window = (alpha, beta)
+        for code in codes:
+            undo = apply_code(board, code, available_building_cards)
+            try:
+                _, value, current_count = self._search_paranoid(board, available_building_cards, max_depth, moves_to_try, current_depth + 1,
+                                                                current_count + 1, alpha, beta, ordering, budget)
+            finally:
+                revert_code(board, code, undo)
+
+            if (value > best_value) if maximising else (value < best_value):
+                best_code, best_value = code, value
+                if maximising:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if self.prune and alpha >= beta:
+                    self.stats.cutoffs += 1
+                    break
+
+        if best_code is not None and (best_value > window[0] if maximising else best_value < window[1]):
+            ordering.record_best(best_code, key, current_depth, max_depth - current_depth)
+        return best_code, best_value, current_count
+
+    def _search_maxn(self, board: Board, available_building_cards: List[BuildingCard], max_depth: int, moves_to_try: int,
+                     current_depth: int, current_count: int, parent: Optional[int], parent_best: float, ordering: MoveOrdering,
+                     budget: SearchBudget) -> Tuple[Optional[int], List[float], int]:
+        """Max-n search in which every player maximises its own net.
+
+        Args:
+            parent: Player who moved into this position, None at the root
+            parent_best: Best net the parent player has found among its
+                other moves
+
+        Returns:
+            The code of the best move for the player to move or None, the net
+            of every player at the end of the chosen sequence and the number
+            of moves evaluated. When the position is cut off, the parent's
+            entry is an upper bound no higher than parent_best.
+        """
+        budget.check(current_count)
+        self.stats.visit(current_depth)
+        if current_depth == max_depth:
+            return None, [board.calc_player_net(p) for p in range(board.no_players)], current_count
+
+        if self.prune and parent is not None and parent_best > float('-inf'):
+            upper_bound = self._net_upper_bound(board, parent, current_depth, max_depth)
+            if upper_bound <= parent_best:
+                self.stats.cutoffs += 1
+                nets = [float('-inf')] * board.no_players
+                nets[parent] = upper_bound
+                return None, nets, current_count
+
+        player_ind = self._movers[current_depth % len(self._movers)]
+        codes, key = self._expand(board, available_building_cards, player_ind, moves_to_try, current_depth, ordering)
+        if not codes:
+            # a pass leaves the choice to the parent unchanged, so its bound still applies
+            _, nets, current_count = self._search_maxn(board, available_building_cards, max_depth, moves_to_try, current_depth + 1,
+                                                       current_count, parent, parent_best, ordering, budget)
+            return None, nets, current_count
+
+        best_code, best_nets = None, None
+        for code in codes:
+            undo = apply_code(board, code, available_building_cards)
+            try:
+                best_net = best_nets[player_ind] if best_nets is not None else float('-inf')
+                _, nets, current_count = self._search_maxn(board, available_building_cards, max_depth, moves_to_try, current_depth + 1,
+                                                           current_count + 1, player_ind, best_net, ordering, budget)
+            finally:
+                revert_code(board, code, undo)
+
+            if best_nets is None or nets[player_ind] > best_nets[player_ind]:
+                best_code, best_nets = code, nets
+
+        ordering.record_best(best_code, key, current_depth, max_depth - current_depth)
+        return best_code, best_nets, current_count
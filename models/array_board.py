@@ -0,0 +1,210 @@
+"""NumPy-backed board state with integer building type codes."""
+from typing import List, Dict, Tuple, Optional
+import copy
+import numpy as np
+from .settings import Settings
+from .board import Board
+from .board_card import BoardCard
+from .building_card import BuildingCard, BUILDING_TYPE_CODES, BUILDING_CODE_TYPES, NO_BUILDING
+
+class BuildingCodeRow:
+    """One row of a player's buildings, read and written as building cards."""
+
+    def __init__(self, codes: np.ndarray, code_cards: List[Optional[BuildingCard]]) -> None:
+        self.codes = codes
+        self.code_cards = code_cards
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self):
+        return (self.code_cards[code] for code in self.codes)
+
+    def __getitem__(self, col: int) -> BuildingCard:
+        return self.code_cards[self.codes[col]]
+
+    def __setitem__(self, col: int, card: BuildingCard) -> None:
+        code = BUILDING_TYPE_CODES[card.card_type]
+        if self.code_cards[code] is None:
+            self.code_cards[code] = card
+        self.codes[col] = code
+
+
+class BuildingCodeArray:
+    """Compatibility view of a (players, rows, cols) code array.
+
+    Indexing as array[p][i][j] returns the building card for the code stored
+    at that location, and assigning a card stores its type code, so code
+    written against Board.player_bud_arrays keeps working. All cards of a
+    type share the first card of that type placed on the board.
+    """
+
+    def __init__(self, codes: np.ndarray, code_cards: List[Optional[BuildingCard]]) -> None:
+        self.codes = codes
+        self.code_cards = code_cards
+        self.rows = [[BuildingCodeRow(row, code_cards) for row in player_codes] for player_codes in codes]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, player_ind: int) -> List[BuildingCodeRow]:
+        return self.rows[player_ind]
+
+    def __getstate__(self) -> Dict:
+        # the row views are rebuilt so they keep pointing into the copied codes
+        return {'codes': self.codes, 'code_cards': self.code_cards}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(state['codes'], state['code_cards'])
+
+
+class ArrayBoard(Board):
+    """Board whose mutable state is stored in compact NumPy arrays.
+
+    Attributes:
+        bud_codes: int8 building type codes, shape (players, rows, cols)
+        emp_counts: Employee counts, shape (players, rows, cols)
+        mask_codes: Player mask arrays, shape (players, rows, cols)
+        buy_prices: Buy price of each player
+        sell_prices: Sell price of each player
+        code_cards: Building card used for each type code
+
+    The Board attributes player_bud_arrays, player_emp_arrays,
+    player_mask_arrays, player_buy_prices and player_sell_prices refer to the
+    same storage, so Player, GameMove and __str__ work unchanged. The static
+    layout (settings, cards, mask and indices) is shared between copies.
+    """
+
+    def __init__(self, game_settings: Settings, no_players: int, shuffle: bool = True, style: str = 'rectangle',
+                 cards: Optional[List[BoardCard]] = None):
+        """Initialize the game board.
+
+        Args:
+            game_settings: Game settings configuration
+            no_players: Number of players
+            shuffle: Whether to shuffle board cards
+            style: Board layout style ('rectangle' or other)
+            cards: Board cards in card index order, see Board
+        """
+        super().__init__(game_settings, no_players, shuffle, style, cards)
+
+    @classmethod
+    def from_board(cls, board: Board) -> 'ArrayBoard':
+        """Create an ArrayBoard with the same layout and state as a Board.
+
+        Args:
+            board: Board to convert
+
+        Returns:
+            New ArrayBoard; the board passed in is not modified
+        """
+        array_board = cls.__new__(cls)
+        for name in ['game_settings', 'no_players', 'style', 'size', 'cards', 'mask', 'location_to_card_index',
+                     'card_index_to_location', 'card_array', 'zobrist', 'neighbours', 'rules']:
+            setattr(array_board, name, getattr(board, name))
+        (array_board.player_mask_arrays, array_board.player_bud_arrays,
+         array_board.player_emp_arrays) = array_board.gen_player_arrays(board.no_players, board.mask)
+        array_board.player_buy_prices, array_board.player_sell_prices = array_board.gen_player_prices(board.no_players)
+        for p in range(board.no_players):
+            for (i, j) in board.card_index_to_location.values():
+                array_board.player_bud_arrays[p][i][j] = board.player_bud_arrays[p][i][j]
+                array_board.mask_codes[p, i, j] = board.player_mask_arrays[p][i][j]
+                array_board.emp_counts[p, i, j] = board.player_emp_arrays[p][i][j]
+            array_board.buy_prices[p] = board.player_buy_prices[p]
+            array_board.sell_prices[p] = board.player_sell_prices[p]
+        array_board.compute_zobrist_hash()
+        array_board.refresh_player_totals()
+        array_board.refresh_legal_cells()
+        return array_board
+
+    def gen_player_arrays(self, no_players: int, board_array: List[List[int]]) -> Tuple[np.ndarray, BuildingCodeArray, np.ndarray]:
+        """Generate arrays tracking player buildings and employees.
+
+        Args:
+            no_players: Number of players
+            board_array: Board layout array
+
+        Returns:
+            Tuple of mask, building and employee arrays
+        """
+        shape = (no_players, len(board_array), len(board_array[0]))
+        self.bud_codes = np.zeros(shape, dtype=np.int8)
+        self.emp_counts = np.zeros(shape, dtype=np.int16)
+        self.mask_codes = np.zeros(shape, dtype=np.int8)
+        self.code_cards = [NO_BUILDING] + [None] * (len(BUILDING_CODE_TYPES) - 1)
+        return self.mask_codes, BuildingCodeArray(self.bud_codes, self.code_cards), self.emp_counts
+
+    def gen_player_prices(self, no_players: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Generate the starting buy and sell prices of every player.
+
+        Args:
+            no_players: Number of players
+
+        Returns:
+            Tuple of buy prices and sell prices, indexed by player
+        """
+        self.buy_prices = np.full(no_players, 1, dtype=np.int16)
+        self.sell_prices = np.full(no_players, 2, dtype=np.int16)
+        return self.buy_prices, self.sell_prices
+
+    def copy(self) -> 'ArrayBoard':
+        """Copy the board's mutable state, sharing its static layout.
+
+        Returns:
+            New ArrayBoard that can be changed without affecting this one
+        """
+        board = copy.copy(self)
+        board.bud_codes = self.bud_codes.copy()
+        board.emp_counts = self.emp_counts.copy()
+        board.mask_codes = self.mask_codes.copy()
+        board.buy_prices = self.buy_prices.copy()
+        board.sell_prices = self.sell_prices.copy()
+        board.code_cards = list(self.code_cards)
+        board.player_mask_arrays, board.player_emp_arrays = board.mask_codes, board.emp_counts
+        board.player_bud_arrays = BuildingCodeArray(board.bud_codes, board.code_cards)
+        board.player_buy_prices, board.player_sell_prices = board.buy_prices, board.sell_prices
+        board.cell_buy_price_totals = [list(row) for row in self.cell_buy_price_totals]
+        board.cell_sell_price_totals = [list(row) for row in self.cell_sell_price_totals]
+        board.player_building_cells = [dict(player_cells) for player_cells in self.player_building_cells]
+        board.player_totals = [dict(totals) for totals in self.player_totals]
+        board.open_cells = dict(self.open_cells)
+        board.player_occupied_cells = list(self.player_occupied_cells)
+        return board
+
+    def calc_player_totals(self, player_ind: int) -> Dict[str, int]:
+        """Calculate the totals that make up a player's net by scanning the board.
+
+        Returns:
+            Dictionary of totals as plain ints, see Board.calc_player_totals
+        """
+        return {key: int(value) for key, value in super().calc_player_totals(player_ind).items()}
+
+    def building_type(self, player_ind: int, row: int, col: int) -> str:
+        """Building type a player has on a location ('none' if empty)."""
+        return BUILDING_CODE_TYPES[self.bud_codes[player_ind, row, col]]
+
+    def _cell_output(self, player_ind: int, i: int, j: int) -> Tuple[Optional[str], int]:
+        """Output a player's building on a location adds to the player's totals.
+
+        Reads the type codes directly instead of going through the card view.
+
+        Returns:
+            Tuple of the totals key the output counts towards (None for no
+            output) and the amount
+        """
+        code = self.bud_codes[player_ind, i, j]
+        if code == 0 or code == BUILDING_TYPE_CODES['hq']:
+            return None, 0
+        card = self.code_cards[code]
+        curr_emp = int(self.emp_counts[player_ind, i, j])
+        if code == BUILDING_TYPE_CODES['buy_market']:
+            return 'sum_buy', card.get_value(int(self.buy_prices[player_ind]), int(self.cell_buy_price_totals[i][j])) + curr_emp
+        elif code == BUILDING_TYPE_CODES['sell_market']:
+            return 'sum_sell', card.get_value(int(self.sell_prices[player_ind]), int(self.cell_sell_price_totals[i][j])) + curr_emp
+        cells, neighbours = self.player_building_cells[player_ind], self.rules.neighbour_masks[(i,j)]
+        connected_buy_cards = (neighbours & cells['buy_market']).bit_count()
+        connected_sell_cards = (neighbours & cells['sell_market']).bit_count()
+        return 'sum_process', card.get_value(connected_buy_cards, connected_sell_cards) + curr_emp
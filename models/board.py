@@ -4,12 +4,15 @@ import random
 import numpy as np
 from .settings import Settings
 from .board_card import BoardCard
-from .building_card import BuildingCard
+from .building_card import BuildingCard, NO_BUILDING
+from .transposition import ZobristKeys
+from .ruleset import Ruleset
 
 class Board:
     """Represents the game board and manages its state."""
     
-    def __init__(self, game_settings: Settings, no_players: int, shuffle: bool = True, style: str = 'rectangle'):
+    def __init__(self, game_settings: Settings, no_players: int, shuffle: bool = True, style: str = 'rectangle',
+                 cards: Optional[List[BoardCard]] = None):
         """Initialize the game board.
         
         Args:
@@ -17,13 +20,15 @@ class Board:
             no_players: Number of players
             shuffle: Whether to shuffle board cards
             style: Board layout style ('rectangle' or other)
+            cards: Board cards in card index order, to recreate a known
+                layout instead of generating one
         """
         self.game_settings = game_settings
         self.no_players = no_players
         self.style = style
 
         self.size = game_settings.no_players_to_board_size[no_players]
-        self.cards = self.gen_all_board_cards(game_settings, no_players, shuffle)
+        self.cards = cards if cards is not None else self.gen_all_board_cards(game_settings, no_players, shuffle)
         if self.size != len(self.cards):
             raise ValueError('Board Error: board size does not match number of cards')
         
@@ -32,7 +37,16 @@ class Board:
         self.card_array = self.gen_card_array(self.mask, self.location_to_card_index, self.cards)
         
         self.player_mask_arrays, self.player_bud_arrays, self.player_emp_arrays = self.gen_player_arrays(no_players, self.mask)
-        self.player_buy_prices, self.player_sell_prices = [1] * no_players, [2] * no_players
+        self.player_buy_prices, self.player_sell_prices = self.gen_player_prices(no_players)
+
+        max_employees = max(card.max_employees for card in self.cards)
+        self.zobrist = ZobristKeys.shared(no_players, len(self.mask), len(self.mask[0]), max_employees)
+        self.zobrist_hash = self.zobrist.hash_board(self)
+
+        self.neighbours = self.gen_neighbours(self.mask)
+        self.rules = Ruleset(game_settings, self.card_array, self.card_index_to_location)
+        self.refresh_player_totals()
+        self.refresh_legal_cells()
 
     def __str__(self) -> str:
         """String representation of the board.
@@ -100,9 +114,9 @@ class Board:
             max_employees: Maximum employees per card
             
         Returns:
-            List of generated cards
+            List of count references to one shared, immutable card
         """
-        return [BoardCard(name, card_type, max_employees) for _ in range(count)]
+        return [BoardCard(name, card_type, max_employees)] * count
 
     def gen_mask(self, size: int, style: str) -> List[List[int]]:
         """Generate board mask based on style.
@@ -227,12 +241,339 @@ class Board:
         """
         height, width = len(board_array), len(board_array[0])
         mask_arrays = [[[0 for _ in range(width)] for _ in range(height)] for _ in range(no_players)]
-        bud_arrays = [[[BuildingCard('None', 'none', max_players=4) for _ in range(width)] for _ in range(height)] for _ in range(no_players)]
+        bud_arrays = [[[NO_BUILDING for _ in range(width)] for _ in range(height)] for _ in range(no_players)]
         emp_arrays = [[[0 for _ in range(width)] for _ in range(height)] for _ in range(no_players)]
         return mask_arrays, bud_arrays, emp_arrays
 
-    def calc_player_net(self, player_ind, debug = False):
+    def gen_player_prices(self, no_players: int) -> Tuple[List[int], List[int]]:
+        """Generate the starting buy and sell prices of every player.
+
+        Args:
+            no_players: Number of players
+
+        Returns:
+            Tuple of buy prices and sell prices, indexed by player
+        """
+        return [1] * no_players, [2] * no_players
+
+    def gen_neighbours(self, mask: List[List[int]]) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
+        """Generate the in-bounds neighbours of every board location.
+
+        Args:
+            mask: Board mask
+
+        Returns:
+            Mapping of location to its up, right, down and left neighbours
+        """
+        neighbours = {}
+        for i in range(len(mask)):
+            for j in range(len(mask[0])):
+                connected_inds = [(i-1,j),(i,j+1),(i+1,j),(i,j-1)]
+                neighbours[(i,j)] = [(ii,jj) for (ii,jj) in connected_inds if ii >= 0 and jj >= 0 and ii < len(mask) and jj < len(mask[0])]
+        return neighbours
+
+    def refresh_player_totals(self) -> None:
+        """Rebuild the running net accounting from the player arrays.
+
+        The totals are kept up to date incrementally by the set_building,
+        add_employees and shift_*_price methods; this is for a new board or
+        one whose arrays were edited directly.
+        """
+        self.cell_buy_price_totals = [[0 for _ in range(len(self.mask[0]))] for _ in range(len(self.mask))]
+        self.cell_sell_price_totals = [[0 for _ in range(len(self.mask[0]))] for _ in range(len(self.mask))]
+        self.player_building_cells = [{t: 0 for t in self.rules.building_types} for _ in range(self.no_players)]
+        for p in range(self.no_players):
+            for (i, j) in self.card_index_to_location.values():
+                card_type = self.player_bud_arrays[p][i][j].card_type
+                if card_type in self.player_building_cells[p]:
+                    self.player_building_cells[p][card_type] |= self.rules.bits[(i,j)]
+                if card_type == 'buy_market':
+                    self.cell_buy_price_totals[i][j] += self.player_buy_prices[p]
+                elif card_type == 'sell_market':
+                    self.cell_sell_price_totals[i][j] += self.player_sell_prices[p]
+        self.player_totals = [self.calc_player_totals(p) for p in range(self.no_players)]
+
+    def refresh_legal_cells(self) -> None:
+        """Rebuild the cells on which moves are currently legal.
+
+        Cell sets are bitboards over card indices (see Ruleset): open_cells
+        holds, per building type, the locations a player without a building
+        there may build on; employee_remove_cells and employee_add_cells the
+        locations whose employee total can go down or up; and
+        player_occupied_cells, per player, the locations the player has a
+        building on. That is the union of the player's
+        player_building_cells bitboards, which refresh_player_totals
+        rebuilds.
+
+        A player's legal placements of a type are then
+        open_cells[type] & ~player_occupied_cells[p], and their legal
+        employee changes the employee cells & player_occupied_cells[p].
+
+        They are kept up to date incrementally: set_building and
+        add_employees mark the location they change in stale_cells, and
+        update_legal_cells recomputes only the stale locations, so a move
+        applied and reverted at a leaf of the search costs two bit operations.
+        This is for a new board or one whose arrays were edited directly.
+        """
+        self.open_cells = {t: 0 for t in self.rules.building_types}
+        self.employee_remove_cells, self.employee_add_cells = 0, 0
+        self.player_occupied_cells = [0] * self.no_players
+        for p in range(self.no_players):
+            for cells in self.player_building_cells[p].values():
+                self.player_occupied_cells[p] |= cells
+        self.stale_cells = (1 << len(self.rules.locations)) - 1
+        self.legal_cells_version = 0
+        self.update_legal_cells()
+
+    def update_legal_cells(self) -> None:
+        """Recompute the legal cells of the locations changed since the last update.
+
+        Bumps legal_cells_version, so an undo can tell whether the legal
+        cells were recomputed after its move was applied.
+        """
+        stale = self.stale_cells
+        self.legal_cells_version += 1
+        while stale:
+            bit = stale & -stale
+            stale ^= bit
+            self._update_open_cells(bit.bit_length() - 1)
+            self._update_employee_cells(bit.bit_length() - 1)
+        self.stale_cells = 0
+
+    def _update_open_cells(self, card_index: int) -> None:
+        """Recompute which building types can be placed on a location.
+
+        A type can be placed if the board card allows it and every building
+        already on the location matches the type and has room for another
+        player, as in GameMove.validate_building_placement.
+        """
+        bit, (i, j) = 1 << card_index, self.rules.locations[card_index]
+        occupants = [self.player_bud_arrays[p][i][j] for p in range(self.no_players) if self.player_occupied_cells[p] & bit]
+        open_types = self.rules.allowed_types[card_index]
+        if occupants:
+            card_type = occupants[0].card_type
+            if card_type in open_types and all(card.max_players != len(occupants) and card.card_type == card_type for card in occupants):
+                open_types = (card_type,)
+            else:
+                open_types = ()
+        open_cells = self.open_cells
+        for t in open_cells:
+            open_cells[t] = open_cells[t] | bit if t in open_types else open_cells[t] & ~bit
+
+    def _update_employee_cells(self, card_index: int) -> None:
+        """Recompute whether a location's employee total can go down or up, as in GameMove.validate_employee_delta."""
+        bit, (i, j) = 1 << card_index, self.rules.locations[card_index]
+        curr_emps = sum(self.player_emp_arrays[p][i][j] for p in range(self.no_players))
+        max_employees = self.rules.max_employees[card_index]
+        self.employee_remove_cells = self.employee_remove_cells | bit if 0 <= curr_emps - 1 < max_employees else self.employee_remove_cells & ~bit
+        self.employee_add_cells = self.employee_add_cells | bit if curr_emps + 1 < max_employees else self.employee_add_cells & ~bit
+
+    def _cell_output(self, player_ind: int, i: int, j: int) -> Tuple[Optional[str], int]:
+        """Output a player's building on a location adds to the player's totals.
+
+        Uses the running per-location price totals, so it reads at most the
+        four neighbours of the location.
+
+        Returns:
+            Tuple of the totals key the output counts towards (None for no
+            output) and the amount
+        """
+        card = self.player_bud_arrays[player_ind][i][j]
+        curr_emp = self.player_emp_arrays[player_ind][i][j]
+        if card.card_type == 'buy_market':
+            return 'sum_buy', card.get_value(self.player_buy_prices[player_ind], self.cell_buy_price_totals[i][j]) + curr_emp
+        elif card.card_type == 'sell_market':
+            return 'sum_sell', card.get_value(self.player_sell_prices[player_ind], self.cell_sell_price_totals[i][j]) + curr_emp
+        elif card.card_type == 'process':
+            cells, neighbours = self.player_building_cells[player_ind], self.rules.neighbour_masks[(i,j)]
+            connected_buy_cards = (neighbours & cells['buy_market']).bit_count()
+            connected_sell_cards = (neighbours & cells['sell_market']).bit_count()
+            return 'sum_process', card.get_value(connected_buy_cards, connected_sell_cards) + curr_emp
+        return None, 0
+
+    def _update_outputs(self, locations: List[Tuple[int, int, int]], sign: int) -> None:
+        """Add or remove the outputs of (player, row, col) locations from the running totals."""
+        for (p, i, j) in locations:
+            key, amount = self._cell_output(p, i, j)
+            if key is not None:
+                self.player_totals[p][key] += sign * amount
+
+    def _market_locations(self, i: int, j: int, card_type: str) -> List[Tuple[int, int, int]]:
+        """Every player's market of the given type on a location."""
+        return [(p, i, j) for p in range(self.no_players) if self.player_bud_arrays[p][i][j].card_type == card_type]
+
+    def set_building(self, player_ind: int, row: int, col: int, card: BuildingCard, mask_value: int = 1) -> Tuple[BuildingCard, int]:
+        """Place a building card for a player, keeping hash and totals current.
+
+        Args:
+            player_ind: Player index
+            row: Row position
+            col: Column position
+            card: Building card to place, or a 'none' card to clear the location
+            mask_value: Value for the player's mask array at the location
+
+        Returns:
+            Tuple of the building card and mask value that were replaced
+        """
+        old_card = self.player_bud_arrays[player_ind][row][col]
+        old_mask = self.player_mask_arrays[player_ind][row][col]
+
+        totals, cells, bit = self.player_totals[player_ind], self.player_building_cells[player_ind], self.rules.bits[(row,col)]
+
+        # buildings whose output depends on this location: markets sharing it and own processes next to it
+        affected = [(p, row, col) for p in range(self.no_players)]
+        affected += [(player_ind, ii, jj) for (ii, jj) in self.rules.locations_of(self.rules.neighbour_masks[(row,col)] & cells['process'])]
+        self._update_outputs(affected, -1)
+
+        if old_card.card_type in cells:
+            cells[old_card.card_type] &= ~bit
+            totals[old_card.card_type] -= 1
+            totals['tot_buds'] -= 1
+        if old_card.card_type == 'buy_market':
+            self.cell_buy_price_totals[row][col] -= self.player_buy_prices[player_ind]
+        elif old_card.card_type == 'sell_market':
+            self.cell_sell_price_totals[row][col] -= self.player_sell_prices[player_ind]
+
+        self.zobrist_hash ^= self.zobrist.building(player_ind, row, col, old_card.card_type)
+        self.zobrist_hash ^= self.zobrist.building(player_ind, row, col, card.card_type)
+        self.player_bud_arrays[player_ind][row][col] = card
+        self.player_mask_arrays[player_ind][row][col] = mask_value
+
+        if card.card_type in cells:
+            cells[card.card_type] |= bit
+            totals[card.card_type] += 1
+            totals['tot_buds'] += 1
+        if card.card_type == 'buy_market':
+            self.cell_buy_price_totals[row][col] += self.player_buy_prices[player_ind]
+        elif card.card_type == 'sell_market':
+            self.cell_sell_price_totals[row][col] += self.player_sell_prices[player_ind]
+
+        self._update_outputs(affected, 1)
+        if card.card_type != 'none':
+            self.player_occupied_cells[player_ind] |= bit
+        else:
+            self.player_occupied_cells[player_ind] &= ~bit
+        self.stale_cells |= bit
+        return old_card, old_mask
+
+    def add_employees(self, player_ind: int, row: int, col: int, delta: int) -> None:
+        """Change a player's employee count on a location, keeping hash and totals current.
+
+        Args:
+            player_ind: Player index
+            row: Row position
+            col: Column position
+            delta: Change in employee count
+        """
+        count = self.player_emp_arrays[player_ind][row][col]
+        self._update_outputs([(player_ind, row, col)], -1)
+        self.zobrist_hash ^= self.zobrist.employees(player_ind, row, col, count) ^ self.zobrist.employees(player_ind, row, col, count + delta)
+        self.player_emp_arrays[player_ind][row][col] = count + delta
+        self.player_totals[player_ind]['tot_emps'] += delta
+        self._update_outputs([(player_ind, row, col)], 1)
+        self.stale_cells |= self.rules.bits[(row,col)]
+
+    def shift_buy_price(self, player_ind: int, delta: int) -> None:
+        """Change a player's buy price, keeping hash and totals current.
+
+        Args:
+            player_ind: Player index
+            delta: Change in buy price
+        """
+        cells = self.rules.locations_of(self.player_building_cells[player_ind]['buy_market'])
+        affected = [loc for (i, j) in cells for loc in self._market_locations(i, j, 'buy_market')]
+        self._update_outputs(affected, -1)
+        price = self.player_buy_prices[player_ind]
+        self.zobrist_hash ^= self.zobrist.buy_price(player_ind, price) ^ self.zobrist.buy_price(player_ind, price + delta)
+        self.player_buy_prices[player_ind] = price + delta
+        for (i, j) in cells:
+            self.cell_buy_price_totals[i][j] += delta
+        self._update_outputs(affected, 1)
+
+    def shift_sell_price(self, player_ind: int, delta: int) -> None:
+        """Change a player's sell price, keeping hash and totals current.
+
+        Args:
+            player_ind: Player index
+            delta: Change in sell price
+        """
+        cells = self.rules.locations_of(self.player_building_cells[player_ind]['sell_market'])
+        affected = [loc for (i, j) in cells for loc in self._market_locations(i, j, 'sell_market')]
+        self._update_outputs(affected, -1)
+        price = self.player_sell_prices[player_ind]
+        self.zobrist_hash ^= self.zobrist.sell_price(player_ind, price) ^ self.zobrist.sell_price(player_ind, price + delta)
+        self.player_sell_prices[player_ind] = price + delta
+        for (i, j) in cells:
+            self.cell_sell_price_totals[i][j] += delta
+        self._update_outputs(affected, 1)
+
+    def get_state(self) -> Tuple[Tuple, Tuple, Tuple, Tuple]:
+        """Capture the mutable state of the board.
+
+        Returns:
+            Tuple of building types and employee counts per player in card
+            index order, then buy prices and sell prices per player
+        """
+        locations = [self.card_index_to_location[ind] for ind in range(len(self.card_index_to_location))]
+        building_types = tuple(tuple(self.player_bud_arrays[p][i][j].card_type for (i, j) in locations) for p in range(self.no_players))
+        employees = tuple(tuple(int(self.player_emp_arrays[p][i][j]) for (i, j) in locations) for p in range(self.no_players))
+        return building_types, employees, tuple(int(v) for v in self.player_buy_prices), tuple(int(v) for v in self.player_sell_prices)
+
+    def set_state(self, state: Tuple[Tuple, Tuple, Tuple, Tuple], building_cards: Dict[str, BuildingCard]) -> None:
+        """Restore mutable state captured by get_state on a board with the same layout.
+
+        Args:
+            state: State returned by get_state
+            building_cards: Card to place for each building type in the state
+        """
+        building_types, employees, buy_prices, sell_prices = state
+        for p in range(self.no_players):
+            for ind, (i, j) in self.card_index_to_location.items():
+                card_type = building_types[p][ind]
+                if card_type == 'none':
+                    if self.player_bud_arrays[p][i][j].card_type != 'none':
+                        self.player_bud_arrays[p][i][j] = NO_BUILDING
+                    self.player_mask_arrays[p][i][j] = 0
+                else:
+                    self.player_bud_arrays[p][i][j] = building_cards[card_type]
+                    self.player_mask_arrays[p][i][j] = 1
+                self.player_emp_arrays[p][i][j] = employees[p][ind]
+            self.player_buy_prices[p] = buy_prices[p]
+            self.player_sell_prices[p] = sell_prices[p]
+        self.compute_zobrist_hash()
+        self.refresh_player_totals()
+        self.refresh_legal_cells()
+
+    def compute_zobrist_hash(self) -> int:
+        """Recompute the Zobrist hash of the board from scratch.
+
+        The hash is kept up to date incrementally by the set_building,
+        add_employees and shift_*_price methods; this is for boards whose
+        arrays were edited directly.
+
+        Returns:
+            64-bit Zobrist hash of the mutable board state
+        """
+        self.zobrist_hash = self.zobrist.hash_board(self)
+        return self.zobrist_hash
+
+    def calc_player_totals(self, player_ind: int) -> Dict[str, int]:
+        """Calculate the totals that make up a player's net by scanning the board.
+
+        The board keeps these totals current in self.player_totals, so this
+        full scan is only needed to rebuild or check them.
+
+        Args:
+            player_ind: Player index
+
+        Returns:
+            Dictionary with the player's summed buy, process and sell output
+            ('sum_buy', 'sum_process', 'sum_sell'), building and employee
+            counts ('tot_buds', 'tot_emps') and the number of buildings of
+            each type ('buy_market', 'sell_market', 'process', 'hq')
+        """
         sum_buy, sum_process, sum_sell, tot_buds, tot_emps = 0, 0, 0, 0, 0
+        type_counts = {'buy_market': 0, 'sell_market': 0, 'process': 0, 'hq': 0}
         player_buy_price = self.player_buy_prices[player_ind]
         player_sell_price = self.player_sell_prices[player_ind]
 
@@ -247,6 +588,7 @@ class Board:
             tot_emps += curr_emp
             if card.card_type in ['buy_market','sell_market','process','hq']:
                 tot_buds += 1
+                type_counts[card.card_type] += 1
             
             if card.card_type == 'buy_market':
                 for p in range(self.no_players):
@@ -274,6 +616,27 @@ class Board:
                 pass        
             elif card.card_type == 'none':
                 pass
+
+        totals = {'sum_buy': sum_buy, 'sum_process': sum_process, 'sum_sell': sum_sell, 'tot_buds': tot_buds, 'tot_emps': tot_emps}
+        totals.update(type_counts)
+        return totals
+
+    def calc_player_net(self, player_ind, debug = False):
+        """Calculate a player's net income from the running totals.
+
+        Args:
+            player_ind: Player index
+            debug: Print the totals behind the net
+
+        Returns:
+            Units produced times the player's margin, less building and employee costs
+        """
+        totals = self.player_totals[player_ind]
+        sum_buy, sum_process, sum_sell = totals['sum_buy'], totals['sum_process'], totals['sum_sell']
+        tot_buds, tot_emps = totals['tot_buds'], totals['tot_emps']
+        player_buy_price = self.player_buy_prices[player_ind]
+        player_sell_price = self.player_sell_prices[player_ind]
+
         units = min(sum_buy, sum_process, sum_sell)
         net = units * (player_sell_price - player_buy_price) - tot_buds - tot_emps
 
@@ -283,6 +646,3 @@ class Board:
             print('units: ' + str(units) + ' | player sell price: ' + str(player_sell_price) + ' | player buy price: ' + str(player_buy_price) + ' | net: ' + str(net))
 
         return net
-        
-
-
@@ -1,9 +1,55 @@
 """Building card model for game structures."""
 from typing import Dict, List, Tuple, Optional
+import numpy as np
 from .card import Card
 
+# Integer codes for building types, used by compact board representations
+BUILDING_TYPE_CODES = {'none': 0, 'buy_market': 1, 'sell_market': 2, 'process': 3, 'hq': 4}
+BUILDING_CODE_TYPES = ['none', 'buy_market', 'sell_market', 'process', 'hq']
+
+# dense value tables cover every x and y from 0 up to this bound, which is
+# above any price, total price or connection count reachable in play
+TABLE_SIZE = 32
+
+def compile_value_table(values: Dict[int, Dict[int, int]], x_values: List[int], y_values: List[int]) -> Tuple[List[List[Optional[int]]], np.ndarray]:
+    """Compile a value dictionary into dense clamped tables.
+
+    Coordinates outside the defined x and y values are clamped to them, as
+    BuildingCard.get_value always has. Gaps in a row of the dictionary, which
+    cannot be reached in play, are None in the rows and take the value of
+    the nearest defined entry in the row in the array.
+
+    Args:
+        values: Dictionary of x, y coordinates to values
+        x_values: List of valid x values
+        y_values: List of valid y values
+
+    Returns:
+        Tuple of nested lists indexed [x][y], for scalar lookups, and a
+        read-only array indexed [x, y], for vectorised lookups
+    """
+    rows: List[List[Optional[int]]] = []
+    array = np.zeros((TABLE_SIZE, TABLE_SIZE), dtype=np.int64)
+    for x in range(TABLE_SIZE):
+        row = values[min(max(x, min(x_values)), max(x_values))]
+        defined = sorted(row)
+        rows.append([])
+        for y in range(TABLE_SIZE):
+            cy = min(max(y, min(y_values)), max(y_values))
+            rows[x].append(row.get(cy))
+            array[x, y] = row[cy] if cy in row else row[min(defined, key=lambda d: (abs(d - cy), d))]
+    array.flags.writeable = False
+    return rows, array
+
 class BuildingCard(Card):
-    """A card representing a building in the game."""
+    """A card representing a building in the game.
+
+    Value tables depend only on the card type, so they are generated and
+    compiled into dense lookup tables once per type, and shared, read-only,
+    by every card of that type.
+    """
+
+    _value_tables: Dict[Tuple[type, str], Tuple] = {}
     
     def __init__(self, name: str = '', card_type: str = '', x_name: str = '', 
                  y_name: str = '', max_output: int = 5, max_min: int = 2, 
@@ -31,7 +77,12 @@ class BuildingCard(Card):
         self.max_players = max_players
         self.max_output = max_output
         self.max_min = max_min
-        self.values, self.x_values, self.y_values = self.generate_values()
+        key = (type(self), self.card_type)
+        if key not in self._value_tables:
+            values, x_values, y_values = self.generate_values()
+            dense = compile_value_table(values, x_values, y_values) if values else (None, None)
+            self._value_tables[key] = (values, x_values, y_values) + dense
+        self.values, self.x_values, self.y_values, self.value_rows, self.value_array = self._value_tables[key]
         self.title = self.name
 
     def get_value(self, x: int, y: int) -> int:
@@ -42,16 +93,31 @@ class BuildingCard(Card):
             y: Y coordinate
             
         Returns:
-            Value at the specified coordinates
+            Value at the specified coordinates, clamped to the defined x and y values
+
+        Raises:
+            KeyError: If the clamped coordinates are a gap in the table
+        """
+        if 0 <= x < TABLE_SIZE and 0 <= y < TABLE_SIZE:
+            value = self.value_rows[x][y]
+        else:
+            value = self.value_rows[min(max(x, 0), TABLE_SIZE - 1)][min(max(y, 0), TABLE_SIZE - 1)]
+        if value is None:
+            raise KeyError((x, y))
+        return value
+
+    def get_values(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Get the values at arrays of coordinates.
+
+        Args:
+            x: X coordinates
+            y: Y coordinates, broadcast against x
+
+        Returns:
+            Array of values, clamped as in get_value; gaps take the nearest
+            defined value in their row instead of raising
         """
-        if x in self.x_values and y in self.y_values:
-            return self.values[x][y]
-        
-        if x not in self.x_values:
-            x = min(self.x_values) if x < min(self.x_values) else max(self.x_values)
-        if y not in self.y_values:
-            y = min(self.y_values) if y < min(self.y_values) else max(self.y_values)
-        return self.values[x][y]
+        return self.value_array[np.clip(x, 0, TABLE_SIZE - 1), np.clip(y, 0, TABLE_SIZE - 1)]
     
     def generate_values(self) -> Tuple[Dict[int, Dict[int, int]], List[int], List[int]]:
         """Generate value matrix based on card type.
@@ -107,6 +173,11 @@ class BuildingCard(Card):
             ax: Matplotlib axis object
             save_path: Path to save the rendered image
         """
+        import numpy as np
+        import matplotlib.pyplot as plt
+        from matplotlib import patches
+        from pyfonts import load_font
+
         def get_start_y_and_height(index):
             y_mod, h_mod, y_mods, h_mods = 0, 0, {0:0,1:2,2:8,3:4,4:2}, {0:2,1:6,2:-4,3:-2,4:-2} # modify start points and heights of rectangles
             if index in y_mods:
@@ -215,4 +286,6 @@ class BuildingCard(Card):
             return 'H'
         elif self.card_type == 'none':
             return '-'
-        return ''
\ No newline at end of file
+        return ''
+# shared placeholder for locations without a building
+NO_BUILDING = BuildingCard('None', 'none', max_players=4)
@@ -1,9 +1,12 @@
 """Core card models for the game."""
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+from functools import lru_cache
 import os
 from os.path import join
-from matplotlib import axes
+
+if TYPE_CHECKING:
+    from matplotlib import axes
 
 @dataclass
 class CardConfig:
@@ -11,8 +14,36 @@ class CardConfig:
     asset_path: str = join('assets', 'theme_1')
     valid_card_types: List[str] = ('farm', 'residential', 'industry', 'unit_cost','sell_market', 'buy_market', 'process', 'hq')
 
-class Card:
-    """Base class for all game cards."""
+@lru_cache(maxsize=None)
+def list_assets(path: str) -> Tuple[str, ...]:
+    """Image files in an asset directory, read from disk once per process.
+
+    Args:
+        path: Asset directory of a card type
+
+    Returns:
+        Tuple of file names, empty if the directory does not exist
+    """
+    if not os.path.exists(path):
+        return ()
+    return tuple(os.listdir(path))
+
+class _FrozenAfterInit(type):
+    """Metaclass that makes instances read-only once their __init__ has run."""
+
+    def __call__(cls, *args, **kwargs):
+        instance = super().__call__(*args, **kwargs)
+        object.__setattr__(instance, '_frozen', True)
+        return instance
+
+class Card(metaclass=_FrozenAfterInit):
+    """Base class for all game cards.
+
+    Cards cannot be changed once created: setting or deleting an attribute
+    raises AttributeError. Boards and card stacks can therefore hold one card
+    at many positions, and deep copies of a board or game share their cards
+    instead of duplicating them.
+    """
     
     def __init__(self, name: str, card_type: str = '') -> None:
         """Initialize a card.
@@ -24,6 +55,20 @@ class Card:
         self.name = name
         self.card_type = card_type.lower() if card_type else name.lower()
         self.image_path = self._set_image_path()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'{type(self).__name__} is immutable, cannot set {name!r}')
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'{type(self).__name__} is immutable, cannot delete {name!r}')
+        super().__delattr__(name)
+
+    def __deepcopy__(self, memo: Dict) -> 'Card':
+        """Cards are immutable, so copies share them."""
+        return self
         
     def _set_image_path(self) -> str:
         """Set the image path for the card based on its type.
@@ -34,20 +79,16 @@ class Card:
         if not self.card_type or self.card_type not in CardConfig.valid_card_types:
             return ''
             
-        path = join(CardConfig.asset_path, self.card_type)
-        if not os.path.exists(path):
-            return ''
-            
-        imgs = os.listdir(path)
+        imgs = list_assets(join(CardConfig.asset_path, self.card_type))
         if not imgs:
             return ''
             
         # Get next image index for this card type
-        from ..utils.image_manager import get_next_image_index
+        from utils.image_manager import get_next_image_index
         img_idx = get_next_image_index(self.card_type)
         return join(CardConfig.asset_path, self.card_type, imgs[img_idx % len(imgs)])
         
-    def render(self, ax: Optional[axes.Axes] = None) -> None:
+    def render(self, ax: Optional['axes.Axes'] = None) -> None:
         """Render the card.
         
         Args:
@@ -1,7 +1,7 @@
 """Deck model for managing collections of cards."""
 from typing import List, Optional
+from collections.abc import Sequence
 import random
-import matplotlib.pyplot as plt
 from .card import Card
 
 class Deck:
@@ -17,6 +17,8 @@ class Deck:
  
     def render(self) -> None:
         """Render all cards in the deck in a horizontal layout."""
+        import matplotlib.pyplot as plt
+
         fig, axs = plt.subplots(1, len(self.cards))
         fig.set_figwidth(12)
         fig.set_figheight(3)
@@ -100,3 +102,51 @@ class Deck:
         """
         random.shuffle(self.cards)
         return self.cards
+
+
+class CardStack(Sequence):
+    """A pile of identical cards, stored as one shared card and a count.
+
+    Reads like a list of count references to the same card, without creating
+    count card objects. Call materialise for a real list, e.g. to build a Deck.
+    """
+
+    def __init__(self, card: Card, count: int) -> None:
+        """Initialize a stack.
+
+        Args:
+            card: The card every position in the stack holds
+            count: Number of cards in the stack
+        """
+        if count < 0:
+            raise ValueError('card count must not be negative')
+        self.card = card
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.card] * len(range(*index.indices(self.count)))
+        if not -self.count <= index < self.count:
+            raise IndexError('card stack index out of range')
+        return self.card
+
+    def draw(self, N: int = 1) -> List[Card]:
+        """Take N cards off the stack.
+
+        Args:
+            N: Number of cards to take
+
+        Returns:
+            List of the cards taken
+        """
+        if N > self.count:
+            raise ValueError(f'cannot draw {N} cards from a stack of {self.count}')
+        self.count -= N
+        return [self.card] * N
+
+    def materialise(self) -> List[Card]:
+        """The stack as a list of card references."""
+        return [self.card] * self.count
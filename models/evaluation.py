@@ -0,0 +1,196 @@
+"""Vectorised evaluation of candidate moves."""
+from typing import List, Dict, Tuple, Optional
+import numpy as np
+from .board import Board
+from .building_card import BuildingCard, BUILDING_TYPE_CODES
+from .game_move import GameMove
+from .move_codes import BUILD, EMPLOYEE, SELL_PRICE, BUY_PRICE
+
+BUY, SELL, PROCESS = BUILDING_TYPE_CODES['buy_market'], BUILDING_TYPE_CODES['sell_market'], BUILDING_TYPE_CODES['process']
+
+class MoveEvaluator:
+    """Evaluates the net a player would have after each of a list of moves.
+
+    The static parts of the board (neighbour tables) are prepared once, so a
+    single evaluator can be reused for every position on the same board.
+    """
+
+    def __init__(self, board: Board) -> None:
+        """Prepare the neighbour tables of a board.
+
+        Args:
+            board: Board whose layout the evaluator will be used with
+        """
+        self.neighbours = board.neighbours
+        self.height, self.width = len(board.mask), len(board.mask[0])
+        cells = self.height * self.width
+        # neighbour flat indices, padded with an always empty sentinel cell
+        self.neighbour_index = np.full((cells, 4), cells, dtype=np.int64)
+        for (i, j), neighbours in board.neighbours.items():
+            for k, (ii, jj) in enumerate(neighbours):
+                self.neighbour_index[i * self.width + j, k] = ii * self.width + jj
+        self.tables: Dict[int, np.ndarray] = {}
+
+    def _table(self, card: Optional[BuildingCard]) -> Optional[np.ndarray]:
+        if card is None or not card.values:
+            return None
+        code = BUILDING_TYPE_CODES[card.card_type]
+        if code not in self.tables:
+            self.tables[code] = card.value_array
+        return self.tables[code]
+
+    def _player_grids(self, board: Board, player_ind: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Flat building code and employee arrays for a player, with a sentinel cell."""
+        codes = np.zeros(self.height * self.width + 1, dtype=np.int64)
+        emps = np.zeros(self.height * self.width + 1, dtype=np.int64)
+        if hasattr(board, 'bud_codes'):
+            codes[:-1] = board.bud_codes[player_ind].ravel()
+            emps[:-1] = board.emp_counts[player_ind].ravel()
+        else:
+            for (i, j) in board.card_index_to_location.values():
+                codes[i * self.width + j] = BUILDING_TYPE_CODES[board.player_bud_arrays[player_ind][i][j].card_type]
+                emps[i * self.width + j] = board.player_emp_arrays[player_ind][i][j]
+        return codes, emps
+
+    def evaluate(self, board: Board, moves: List[GameMove]) -> np.ndarray:
+        """Net of the moving player after each move, computed for all moves at once.
+
+        Args:
+            board: Current board state; it is not modified
+            moves: Candidate moves, all made by the same player
+
+        Returns:
+            Array with the net after each move, in the order of moves
+        """
+        if not moves:
+            return np.zeros(0, dtype=np.int64)
+        p = moves[0].player_ind
+        if any(m.player_ind != p for m in moves):
+            raise ValueError('all moves must be made by the same player')
+
+        # value tables from the cards in the moves
+        if len(self.tables) < 3:
+            for move in moves:
+                self._table(move.building_card)
+
+        width = self.width
+        move_array = np.array([(
+            BUILDING_TYPE_CODES[m.building_card.card_type] if m.building_card is not None else 0,
+            m.building_coordinate[0] * width + m.building_coordinate[1],
+            m.employee_delta,
+            m.employee_coordinate[0] * width + m.employee_coordinate[1],
+            m.buy_price_delta,
+            m.sell_price_delta) for m in moves], dtype=np.int64)
+        return self._evaluate(board, p, *move_array.T)
+
+    def evaluate_codes(self, board: Board, codes: List[int], available_building_cards: List[BuildingCard]) -> np.ndarray:
+        """Net of the moving player after each move, for move codes.
+
+        Args:
+            board: Current board state; it is not modified
+            codes: Candidate move codes, all made by the same player
+            available_building_cards: Building cards the codes were generated for
+
+        Returns:
+            Array with the net after each move, in the order of codes
+        """
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        codes = np.array(codes, dtype=np.int64)
+        p = int(codes[0] & 3)
+        if ((codes & 3) != p).any():
+            raise ValueError('all moves must be made by the same player')
+        if len(self.tables) < 3:
+            for card in available_building_cards:
+                self._table(card)
+
+        kind, card_index, cell = codes >> 2 & 3, codes >> 5 & 7, codes >> 8
+        delta = np.where(codes & 16, 1, -1)
+        card_codes = np.array([BUILDING_TYPE_CODES[card.card_type] for card in available_building_cards] + [0], dtype=np.int64)
+        is_build, is_employee = kind == BUILD, kind == EMPLOYEE
+        return self._evaluate(board, p,
+                              np.where(is_build, card_codes[card_index], 0),
+                              np.where(is_build, cell, 0),
+                              np.where(is_employee, delta, 0),
+                              np.where(is_employee, cell, 0),
+                              np.where(kind == BUY_PRICE, delta, 0),
+                              np.where(kind == SELL_PRICE, delta, 0))
+
+    def _evaluate(self, board: Board, p: int, build_code: np.ndarray, build_cell: np.ndarray, emp_delta: np.ndarray,
+                  emp_cell: np.ndarray, buy_delta: np.ndarray, sell_delta: np.ndarray) -> np.ndarray:
+        """Net of player p after each move, given the moves as arrays of their fields."""
+        totals = board.player_totals[p]
+        buy_price, sell_price = int(board.player_buy_prices[p]), int(board.player_sell_prices[p])
+        codes, emps = self._player_grids(board, p)
+        cell_buy_totals = np.append(np.asarray(board.cell_buy_price_totals, dtype=np.int64).ravel(), 0)
+        cell_sell_totals = np.append(np.asarray(board.cell_sell_price_totals, dtype=np.int64).ravel(), 0)
+
+        # value tables from the cards on the board
+        if len(self.tables) < 3:
+            for (i, j) in board.card_index_to_location.values():
+                self._table(board.player_bud_arrays[p][i][j])
+        buy_table, sell_table, process_table = self.tables.get(BUY), self.tables.get(SELL), self.tables.get(PROCESS)
+
+        d_buy = np.zeros(len(build_code), dtype=np.int64)
+        d_process = np.zeros(len(build_code), dtype=np.int64)
+        d_sell = np.zeros(len(build_code), dtype=np.int64)
+
+        # process connectivity of every cell
+        neighbour_codes = codes[self.neighbour_index]
+        connected_buy = np.append((neighbour_codes == BUY).sum(axis=1), 0)
+        connected_sell = np.append((neighbour_codes == SELL).sum(axis=1), 0)
+        is_process = codes == PROCESS
+
+        if process_table is not None:
+            # gain to own processes next to a cell if a market were built on it
+            process_now = process_table[connected_buy, connected_sell]
+            gain_buy_conn = np.where(is_process, process_table[connected_buy + 1, connected_sell] - process_now, 0)
+            gain_sell_conn = np.where(is_process, process_table[connected_buy, connected_sell + 1] - process_now, 0)
+            gain_buy_conn[-1] = gain_sell_conn[-1] = 0
+            d_process += np.where(build_code == BUY, gain_buy_conn[self.neighbour_index[build_cell]].sum(axis=1), 0)
+            d_process += np.where(build_code == SELL, gain_sell_conn[self.neighbour_index[build_cell]].sum(axis=1), 0)
+            new_process = process_table[connected_buy[build_cell], connected_sell[build_cell]] + emps[build_cell]
+            d_process += np.where(build_code == PROCESS, new_process, 0)
+        if buy_table is not None:
+            new_buy = buy_table[buy_price, cell_buy_totals[build_cell] + buy_price] + emps[build_cell]
+            d_buy += np.where(build_code == BUY, new_buy, 0)
+        if sell_table is not None:
+            new_sell = sell_table[sell_price, cell_sell_totals[build_cell] + sell_price] + emps[build_cell]
+            d_sell += np.where(build_code == SELL, new_sell, 0)
+
+        # employees add or remove one output from the building they work in
+        emp_code = codes[emp_cell]
+        d_buy += np.where(emp_code == BUY, emp_delta, 0)
+        d_process += np.where(emp_code == PROCESS, emp_delta, 0)
+        d_sell += np.where(emp_code == SELL, emp_delta, 0)
+
+        # price changes move the player's price and the total price of every shared market
+        for table, code, price, cell_totals, delta, d_sum in [(buy_table, BUY, buy_price, cell_buy_totals, buy_delta, d_buy),
+                                                              (sell_table, SELL, sell_price, cell_sell_totals, sell_delta, d_sell)]:
+            if table is None or not delta.any():
+                continue
+            own_totals = cell_totals[codes == code]
+            current = table[price, own_totals].sum()
+            for d in [-1, 1]:
+                d_sum += (delta == d) * (table[price + d, own_totals + d].sum() - current)
+
+        units = np.minimum(np.minimum(totals['sum_buy'] + d_buy, totals['sum_process'] + d_process), totals['sum_sell'] + d_sell)
+        margin = (sell_price + sell_delta) - (buy_price + buy_delta)
+        tot_buds = totals['tot_buds'] + (build_code != 0)
+        tot_emps = totals['tot_emps'] + emp_delta
+        return units * margin - tot_buds - tot_emps
+
+def evaluate_moves(board: Board, moves: List[GameMove]) -> np.ndarray:
+    """Net of the moving player after each move, computed for all moves at once.
+
+    Convenience wrapper that builds a MoveEvaluator for the board; reuse a
+    MoveEvaluator when evaluating many positions on the same board.
+
+    Args:
+        board: Current board state; it is not modified
+        moves: Candidate moves, all made by the same player
+
+    Returns:
+        Array with the net after each move, in the order of moves
+    """
+    return MoveEvaluator(board).evaluate(board, moves)
@@ -3,17 +3,12 @@
 import random
 import copy
 import math
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
 import os
 from os import listdir
 from os.path import join
-from matplotlib import patches
-from pyfonts import load_font
 
 from models.card import Card
-from models.deck import Deck
+from models.deck import Deck, CardStack
 from models.building_card import BuildingCard
 from models.board_card import BoardCard
 from models.settings import Settings
@@ -40,6 +35,7 @@ class Game:
         self.no_players = no_players
         self.game_settings = game_settings
         self.turn_number = 0
+        self.replay_log, self.replay_id = None, None # ReplayWriter logging this game and its id there, see models.replay
         
         # Initialize players
         self.players = [Player(i, game_settings) for i in range(no_players)]
@@ -50,6 +46,16 @@ class Game:
         # Initialize board
         self.board = Board(game_settings, no_players, shuffle, board_style)
 
+    def __getstate__(self) -> dict:
+        """State for copy.deepcopy and pickle, without the replay log and its open file.
+
+        A copy is not logged: moves played on it must not be written to the
+        original game's log.
+        """
+        state = self.__dict__.copy()
+        state['replay_log'], state['replay_id'] = None, None
+        return state
+
     def _init_building_cards(self) -> dict:
         """Initialize all building card decks.
         
@@ -105,8 +111,8 @@ class Game:
 
     def gen_building_cards(self, count: int, name: str, card_type: str, 
                          allowed_on: list, x_name: str, y_name: str,
-                         max_players: int, max_output: int) -> list:
-        """Generate a list of building cards with specified parameters.
+                         max_players: int, max_output: int) -> CardStack:
+        """Generate a stack of identical building cards with specified parameters.
         
         Args:
             count: Number of cards to generate
@@ -119,20 +125,18 @@ class Game:
             max_output: Maximum output value
             
         Returns:
-            List of generated BuildingCard objects
+            CardStack of count references to one shared BuildingCard
         """
-        return [
-            BuildingCard(
-                name=name,
-                card_type=card_type,
-                x_name=x_name,
-                y_name=y_name,
-                max_players=max_players,
-                max_output=max_output,
-                allowed_board_cards=allowed_on
-            )
-            for _ in range(count)
-        ]
+        card = BuildingCard(
+            name=name,
+            card_type=card_type,
+            x_name=x_name,
+            y_name=y_name,
+            max_players=max_players,
+            max_output=max_output,
+            allowed_board_cards=allowed_on
+        )
+        return CardStack(card, count)
 
     def render_row_of_cards(self, titles: list, cards: list) -> None:
         """Render a row of cards with titles.
@@ -141,6 +145,8 @@ class Game:
             titles: List of titles for the row
             cards: List of cards to render
         """
+        import matplotlib.pyplot as plt
+
         fig, axs = plt.subplots(1, len(cards))
         fig.set_figwidth(15)
         
@@ -161,6 +167,8 @@ class Game:
         Args:
             ax: Matplotlib axis to render on
         """
+        import matplotlib.pyplot as plt
+
         props = {'w': 256, 'h': 339, 'p': 6, 'r': 24, 'fs1': 9, 'fs2': 10, 'fs3': 8}
         w, h = props['w'], props['h']
         
@@ -194,4 +202,56 @@ class Game:
             cards.append(self.building_cards['sell_market'][0])
             cards.append(self.building_cards['process'][0])
             #cards.append(self.building_cards['hq'][0])
-        return cards
\ No newline at end of file
+        return cards
+
+    def play_turn(self, max_depth: int = 2, **search_kwargs) -> list:
+        """Play one turn, in which every player makes the move chosen by its AI.
+
+        Players move in order on the shared board, so later players see the
+        moves made earlier in the turn. The look-ahead is capped by the number
+        of turns left in the game.
+
+        Args:
+            max_depth: Maximum depth of each player's look-ahead search
+            **search_kwargs: Further arguments for Player.find_best_move
+
+        Returns:
+            List with the move each player made, None if it had no valid move
+        """
+        cards = self.get_turn_building_cards(False, 4)
+        turns_left = self.game_settings.no_of_turns_in_game - self.turn_number
+        if self.replay_log is not None:
+            self.replay_log.start_turn(self)
+        moves = []
+        for player in self.players:
+            move, _, _ = player.find_best_move(self.board, cards, max_depth=min(max_depth, turns_left), **search_kwargs)
+            if move is not None:
+                move.apply(self.board)
+                if self.replay_log is not None:
+                    self.replay_log.record_move(self, move)
+            moves.append(move)
+        self.turn_number += 1
+        return moves
+
+    def play_game(self, max_depth: int = 2, **search_kwargs) -> dict:
+        """Play the remaining turns of the game.
+
+        Args:
+            max_depth: Maximum depth of each player's look-ahead search
+            **search_kwargs: Further arguments for Player.find_best_move
+
+        Returns:
+            Dictionary with the moves of every turn, the final net of every
+            player and the indices of the players with the highest net
+        """
+        turns = []
+        while self.turn_number < self.game_settings.no_of_turns_in_game:
+            turns.append(self.play_turn(max_depth, **search_kwargs))
+        if self.replay_log is not None:
+            self.replay_log.end_game(self)
+        nets = [self.board.calc_player_net(p) for p in range(self.no_players)]
+        return {
+            'turns': turns,
+            'nets': nets,
+            'winners': [p for p, net in enumerate(nets) if net == max(nets)],
+        }
\ No newline at end of file
@@ -1,5 +1,5 @@
 """Game move module containing the GameMove class."""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Tuple
 from models.board import Board
 from models.building_card import BuildingCard
@@ -17,7 +17,8 @@ class GameMove:
         employee_coordinate: Coordinate of employee
         sell_price_delta: Change in sell price
         buy_price_delta: Change in buy price
-        current_net: current player net
+        replaced_building_card: Building card displaced by the last apply, used by revert
+        replaced_mask_value: Player mask value displaced by the last apply, used by revert
     """
     player_ind: int
     move_type: str
@@ -27,6 +28,8 @@ class GameMove:
     employee_coordinate: Tuple[int, int]
     sell_price_delta: int
     buy_price_delta: int
+    replaced_building_card: Optional[BuildingCard] = field(default=None, init=False, repr=False, compare=False)
+    replaced_mask_value: int = field(default=0, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         """Validate values after initialization."""
@@ -62,6 +65,16 @@ class GameMove:
         out += f"B{sym}{abs(self.buy_price_delta)}"
         return out
 
+    def key(self) -> Tuple:
+        """Hashable identity of the move, equal for moves that do the same thing.
+
+        Returns:
+            Tuple of the move's player, type, building type, coordinates and deltas
+        """
+        card_type = self.building_card.card_type if self.building_card is not None else 'none'
+        return (self.player_ind, self.move_type, card_type, self.building_coordinate, self.employee_delta,
+                self.employee_coordinate, self.sell_price_delta, self.buy_price_delta)
+
     def validate_move(self, board: Board) -> bool:
         """Validate the move against the board state.
         Args:
@@ -113,7 +126,7 @@ class GameMove:
             return False
         
         # check if player has building on location
-        if board.player_bud_arrays[self.player_ind][row][col] == None or board.player_bud_arrays[self.player_ind][row][col].card_type == 'none':
+        if not board.player_occupied_cells[self.player_ind] & board.rules.bits[(row,col)]:
             #print('no building on location')
             return False
 
@@ -147,7 +160,8 @@ class GameMove:
             return False
 
         # check if player has a building at this location already
-        if board.player_bud_arrays[self.player_ind][row][col] != None and board.player_bud_arrays[self.player_ind][row][col].card_type != 'none':
+        bit = board.rules.bits[(row,col)]
+        if board.player_occupied_cells[self.player_ind] & bit:
             #print('player already has a building on this location')
             return False
         
@@ -157,22 +171,16 @@ class GameMove:
             #print('invalid building card: ' + str(self.building_card.card_type) + ' | on board card: ' + str(board_card.card_type))
             return False
         
-        # check if other player has a building on location
-        p_count_on_location = 0
-        for p in range(board.no_players):
-            if board.player_bud_arrays[p][row][col] != None and board.player_bud_arrays[p][row][col].card_type != 'none':
-                p_count_on_location += 1
-
         # check existing building card max players and that new card is correct type
-        for p in range(board.no_players):
-            if p != self.player_ind and board.player_bud_arrays[p][row][col] != None and board.player_bud_arrays[p][row][col].card_type != 'none':
-                existing_bud_card = board.player_bud_arrays[p][row][col]
-                if existing_bud_card.max_players == p_count_on_location:
-                    #print('board card already has max players')
-                    return False
-                elif existing_bud_card.card_type != self.building_card.card_type:
-                    #print('building needs to match existing building card type')
-                    return False
+        occupants = [p for p in range(board.no_players) if board.player_occupied_cells[p] & bit]
+        for p in occupants:
+            existing_bud_card = board.player_bud_arrays[p][row][col]
+            if existing_bud_card.max_players == len(occupants):
+                #print('board card already has max players')
+                return False
+            elif existing_bud_card.card_type != self.building_card.card_type:
+                #print('building needs to match existing building card type')
+                return False
 
         return True
     
@@ -183,15 +191,48 @@ class GameMove:
             board: Board
         """
         if self.building_card != None and self.building_card.card_type != 'none':
-            board.player_bud_arrays[self.player_ind][self.building_coordinate[0]][self.building_coordinate[1]] = self.building_card
-            board.player_mask_arrays[self.player_ind][self.building_coordinate[0]][self.building_coordinate[1]] = 1
+            self.replaced_building_card, self.replaced_mask_value = board.set_building(
+                self.player_ind, self.building_coordinate[0], self.building_coordinate[1], self.building_card)
         
         if self.employee_delta != 0:
-            board.player_emp_arrays[self.player_ind][self.employee_coordinate[0]][self.employee_coordinate[1]] += self.employee_delta
+            board.add_employees(self.player_ind, self.employee_coordinate[0], self.employee_coordinate[1], self.employee_delta)
             
         if self.sell_price_delta != 0:
-            board.player_sell_prices[self.player_ind] += self.sell_price_delta
+            board.shift_sell_price(self.player_ind, self.sell_price_delta)
             
         if self.buy_price_delta != 0:
-            board.player_buy_prices[self.player_ind] += self.buy_price_delta
-        return board
\ No newline at end of file
+            board.shift_buy_price(self.player_ind, self.buy_price_delta)
+        return board
+
+    def revert(self, board: Board) -> Board:
+        """Undo a move previously applied to the board.
+
+        Restores the board to the exact state it was in before the matching
+        call to apply, so a search can make and unmake moves on a single board
+        instead of copying it for every node.
+
+        Args:
+            board: Board the move was applied to
+
+        Raises:
+            ValueError: If the move builds and has not been applied since it
+                was last reverted, so there is no displaced building to restore
+        """
+        builds = self.building_card != None and self.building_card.card_type != 'none'
+        if builds and self.replaced_building_card is None:
+            raise ValueError(f'cannot revert a build that has not been applied: {self}')
+
+        if self.buy_price_delta != 0:
+            board.shift_buy_price(self.player_ind, -self.buy_price_delta)
+
+        if self.sell_price_delta != 0:
+            board.shift_sell_price(self.player_ind, -self.sell_price_delta)
+
+        if self.employee_delta != 0:
+            board.add_employees(self.player_ind, self.employee_coordinate[0], self.employee_coordinate[1], -self.employee_delta)
+
+        if builds:
+            board.set_building(self.player_ind, self.building_coordinate[0], self.building_coordinate[1],
+                               self.replaced_building_card, self.replaced_mask_value)
+            self.replaced_building_card = None
+        return board
@@ -0,0 +1,155 @@
+"""Bulk generation and scoring of board layouts as NumPy arrays.
+
+A batch of layouts is an int8 array of shape (N, rows, cols) holding the
+board card type code of every location (see BOARD_TYPE_CODES), 0 off the
+board. Generating and scoring a batch creates no per-layout Python objects,
+so hundreds of thousands of layouts can be studied at once; to_board turns a
+single layout into a Board to play on.
+
+Example:
+    layouts = generate_layouts(100000, no_players=3, style='diamond', seed=0)
+    scores = score_layouts(layouts, no_players=3)
+    fairest = to_board(layouts[scores['fairness'].argmin()], no_players=3, style='diamond')
+"""
+from typing import List, Dict, Optional
+from collections import Counter
+import numpy as np
+from .settings import Settings
+from .board import Board
+from .board_card import BoardCard
+from .building_card import BuildingCard
+
+BOARD_TYPE_CODES = {'none': 0, 'industry': 1, 'farm': 2, 'residential': 3}
+BOARD_CODE_TYPES = ['none', 'industry', 'farm', 'residential']
+
+def _template(game_settings: Settings, no_players: int, style: str) -> Board:
+    """Unshuffled board with the mask and card counts of the layouts."""
+    return Board(game_settings, no_players, shuffle=False, style=style)
+
+def generate_layouts(n: int, no_players: int = 2, style: str = 'rectangle', game_settings: Optional[Settings] = None,
+                     seed: Optional[int] = None) -> np.ndarray:
+    """Generate shuffled board layouts.
+
+    Each layout holds the cards of Board.gen_all_board_cards in an
+    independent uniformly random order, placed in card index order; as on a
+    Board, cards beyond the number of locations are left out.
+
+    Args:
+        n: Number of layouts
+        no_players: Number of players, which sets the board size and card counts
+        style: Board layout style
+        game_settings: Settings with the card counts, defaults to Settings()
+        seed: Seed for the NumPy random generator
+
+    Returns:
+        int8 array of board card type codes, shape (n, rows, cols)
+    """
+    template = _template(game_settings or Settings(), no_players, style)
+    codes = np.array([BOARD_TYPE_CODES[card.card_type] for card in template.cards], dtype=np.int8)
+    shuffled = np.random.default_rng(seed).permuted(np.tile(codes, (n, 1)), axis=1)
+    rows, cols = len(template.mask), len(template.mask[0])
+    layouts = np.zeros((n, rows * cols), dtype=np.int8)
+    layouts[:, template.rules.cells] = shuffled[:, :len(template.rules.cells)]
+    return layouts.reshape(n, rows, cols)
+
+def to_board(layout: np.ndarray, no_players: int = 2, style: str = 'rectangle', game_settings: Optional[Settings] = None) -> Board:
+    """Board with one generated layout.
+
+    Args:
+        layout: Type codes of one layout, shape (rows, cols)
+        no_players: Number of players the layout was generated for
+        style: Board layout style the layout was generated for
+        game_settings: Settings the layout was generated with
+
+    Returns:
+        New Board with the layout's cards
+    """
+    game_settings = game_settings or Settings()
+    template = _template(game_settings, no_players, style)
+    card_of_type = {card.card_type: card for card in template.cards}
+    flat = layout.reshape(-1)
+    cards: List[BoardCard] = [card_of_type[BOARD_CODE_TYPES[flat[cell]]] for cell in template.rules.cells]
+    # cards left out of the layout follow the placed ones, as on a shuffled Board
+    left_out = Counter(card.card_type for card in template.cards) - Counter(card.card_type for card in cards)
+    cards += [card_of_type[card_type] for card_type in sorted(left_out.elements())]
+    return Board(game_settings, no_players, style=style, cards=cards)
+
+def neighbour_counts(layouts: np.ndarray, card_type: str) -> np.ndarray:
+    """Number of up, right, down and left neighbours of each location with a board card type.
+
+    Args:
+        layouts: Type codes, shape (N, rows, cols)
+        card_type: Board card type to count
+
+    Returns:
+        int8 array of counts, shape (N, rows, cols)
+    """
+    padded = np.pad(layouts == BOARD_TYPE_CODES[card_type], ((0, 0), (1, 1), (1, 1))).astype(np.int8)
+    return padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1] + padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:]
+
+def start_net_table(game_settings: Optional[Settings] = None) -> np.ndarray:
+    """Best net a player alone on the board can make around one process location.
+
+    For every number of neighbouring farm and residential cards, tries every
+    number of buy and sell markets to build next to the process and every
+    fixed buy and sell price reachable within the game's moves, and keeps
+    the best net. Employees are left out.
+
+    Args:
+        game_settings: Settings with the number of turns, defaults to Settings()
+
+    Returns:
+        int64 array of nets indexed [farm neighbours, residential neighbours], shape (5, 5)
+    """
+    game_settings = game_settings or Settings()
+    buy, sell, process = (BuildingCard(card_type=t).value_array for t in ['buy_market', 'sell_market', 'process'])
+    # axes: buy markets, sell markets, buy price, sell price
+    markets = np.arange(5)
+    buy_markets, sell_markets = markets[:, None, None, None], markets[None, :, None, None]
+    buy_price, sell_price = np.arange(1, 5)[None, None, :, None], np.arange(2, 6)[None, None, None, :]
+    units = np.minimum(np.minimum(buy_markets * buy[buy_price, buy_price], process[buy_markets, sell_markets]),
+                       sell_markets * sell[sell_price, sell_price])
+    buildings = 1 + buy_markets + sell_markets
+    nets = units * (sell_price - buy_price) - buildings
+    moves = buildings + (buy_price - 1) + (sell_price - 2)
+    best = np.where(moves <= game_settings.no_of_turns_in_game, nets, np.iinfo(np.int64).min).max(axis=(2, 3))
+    best = np.maximum(best, 0) # building nothing
+    # a location with f farms and r residentials can use any fewer of each
+    return np.maximum.accumulate(np.maximum.accumulate(best, axis=0), axis=1)
+
+def score_layouts(layouts: np.ndarray, no_players: int = 2, game_settings: Optional[Settings] = None) -> Dict[str, np.ndarray]:
+    """Score a batch of layouts for how well and how fairly they can be played.
+
+    Start positions are industry locations, scored with start_net_table from
+    their farm and residential neighbours; the players are assumed to take
+    the best no_players of them.
+
+    Args:
+        layouts: Type codes from generate_layouts, shape (N, rows, cols)
+        no_players: Number of players
+        game_settings: Settings the layouts were generated with
+
+    Returns:
+        Dictionary of arrays over the layouts:
+        'industry_farm_edges' and 'industry_residential_edges': adjacent
+            pairs of industry and farm or residential cards
+        'connected_industry': industry locations next to at least one farm
+            and one residential card
+        'start_nets': estimated nets of the best no_players start
+            positions, best first, shape (N, no_players)
+        'fairness': gap between the best and the worst of those nets, 0
+            when every player can start as well as the others
+    """
+    industry = layouts == BOARD_TYPE_CODES['industry']
+    farms = neighbour_counts(layouts, 'farm')
+    residentials = neighbour_counts(layouts, 'residential')
+    # table nets are never negative, so -1 marks locations that are not start positions
+    nets = np.where(industry, start_net_table(game_settings)[farms, residentials], -1).reshape(len(layouts), -1)
+    start_nets = -np.sort(-nets, axis=1)[:, :no_players]
+    return {
+        'industry_farm_edges': (farms * industry).sum(axis=(1, 2)),
+        'industry_residential_edges': (residentials * industry).sum(axis=(1, 2)),
+        'connected_industry': (industry & (farms > 0) & (residentials > 0)).sum(axis=(1, 2)),
+        'start_nets': start_nets,
+        'fairness': start_nets[:, 0] - start_nets[:, -1],
+    }
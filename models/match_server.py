@@ -0,0 +1,467 @@
+"""Asyncio match server hosting many concurrent games in one process.
+
+Example:
+    python -m models.match_server --port 8765 --workers 4
+
+Clients talk to the server over a TCP or Unix socket, one JSON object per
+line each way. Every request has an "op" and may have an "id", which is
+echoed in its response; requests on one connection are answered as they
+complete, so a client can wait on one game while playing another.
+
+    {"op": "new_game", "players": 2, "style": "rectangle", "seats": ["ai", "client"],
+     "strategy": "search", "depth": 2, "time_budget": 0.5, "seed": 0, "settings": {...}}
+                                     -> {"ok": true, "game": id}
+    {"op": "state", "game": id}      -> turn, seat to move, cards, board state, nets
+    {"op": "wait_turn", "game": id, "seat": p}
+                                     -> the state once it is seat p's turn or the game is over
+    {"op": "move", "game": id, "seat": p, "move": [...] or null}
+                                     -> plays a client seat's move, see replay.encode_move;
+                                        null passes
+    {"op": "result", "game": id}     -> nets, winners and moves once the game is over
+    {"op": "stats"}                  -> games, queued searches and move latency percentiles
+
+Failed requests are answered with {"ok": false, "error": message}.
+
+Each game is a coroutine that plays turns as Game.play_turn does. The moves
+of AI seats are searched in a process pool, from a snapshot of the board
+(see models.snapshot), with the game's time budget per move; at most
+max_pending searches are queued in the pool and further games wait their
+turn, so a busy server slows every game down evenly instead of piling up
+work. New games are refused once max_games are in progress, and a
+connection stops being read while max_requests of its requests are open.
+"""
+from typing import List, Dict, Optional, Tuple, Any
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import random
+import time
+import numpy as np
+from models.settings import Settings
+from models.board import Board
+from models.board_card import BoardCard
+from models.building_card import BuildingCard
+from models.game import Game
+from models.game_move import GameMove
+from models.player import Player
+from models.adversarial_player import AdversarialPlayer
+from models.replay import encode_move, decode_move, _settings_from_dict
+from models.snapshot import encode_board, decode
+
+STRATEGIES = ['search', 'paranoid', 'maxn']
+SEATS = ['ai', 'client']
+STYLES = ['rectangle', 'diamond', 'linear']
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _check_settings(values: Any) -> Dict[str, Any]:
+    """Check Settings field overrides from a request against the types of the defaults.
+
+    Raises:
+        ValueError: If a field is unknown or a value has the wrong type
+    """
+    if not isinstance(values, dict):
+        raise ValueError('settings must be an object')
+    defaults = asdict(Settings())
+    for name, value in values.items():
+        if name not in defaults:
+            raise ValueError(f'unknown settings field {name!r}')
+        default = defaults[name]
+        if isinstance(default, dict):
+            valid = isinstance(value, dict) and all(_is_int(v) for v in value.values())
+        elif isinstance(default, list):
+            valid = isinstance(value, list) and all(isinstance(v, str) for v in value)
+        elif isinstance(default, int):
+            valid = _is_int(value) and value >= 0
+        else:
+            valid = isinstance(value, type(default))
+        if not valid:
+            raise ValueError(f'invalid value for settings field {name!r}: {value!r}')
+    return values
+
+# worker process boards, one per layout, reused for every search
+_worker_boards: Dict[str, Board] = {}
+MAX_WORKER_BOARDS = 64
+
+def _search_move(layout_key: str, game_settings: Settings, no_players: int, style: str, layout: List[BoardCard],
+                 state: bytes, building_cards: Dict[str, BuildingCard], cards: List[BuildingCard], player_ind: int,
+                 strategy: str, max_depth: int, time_budget: Optional[float]) -> Tuple[Optional[List], float, int]:
+    """Search a move in a worker process from a board snapshot.
+
+    Returns:
+        Tuple of the move in encode_move form (None for no move), its net and
+        the search depth completed within the time budget
+    """
+    board = _worker_boards.get(layout_key)
+    if board is None:
+        if len(_worker_boards) >= MAX_WORKER_BOARDS:
+            _worker_boards.clear()
+        board = _worker_boards[layout_key] = Board(game_settings, no_players, style=style, cards=layout)
+    decode(state).restore(board, building_cards)
+    if strategy == 'search':
+        player = Player(player_ind, game_settings)
+        move, net, _ = player.find_best_move_iterative(board, cards, max_depth, time_budget=time_budget)
+    else:
+        player = AdversarialPlayer(player_ind, game_settings, mode=strategy)
+        move, net, _ = player.find_best_move(board, cards, max_depth, time_budget=time_budget)
+    return (encode_move(move) if move is not None else None), net, player.last_completed_depth
+
+
+class LatencyStats:
+    """Percentiles of the most recent move latencies."""
+
+    def __init__(self, window: int = 10000) -> None:
+        """Initialize an empty window.
+
+        Args:
+            window: Number of most recent latencies kept
+        """
+        self.latencies = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        """Add a latency."""
+        self.latencies.append(seconds)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Number of moves timed and the mean, 50th, 90th and 99th percentile and maximum latency of the window in milliseconds."""
+        if not self.latencies:
+            return {'count': 0}
+        ms = np.array(self.latencies) * 1000
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        return {'count': self.count, 'mean': round(float(ms.mean()), 3), 'p50': round(float(p50), 3),
+                'p90': round(float(p90), 3), 'p99': round(float(p99), 3), 'max': round(float(ms.max()), 3)}
+
+
+class Match:
+    """A game hosted by the server and the state of its coroutine."""
+
+    def __init__(self, match_id: int, game: Game, seats: List[str], strategy: str, max_depth: int, time_budget: Optional[float]) -> None:
+        """Initialize a game that has not started.
+
+        Args:
+            match_id: Id of the game on the server
+            game: Game to play
+            seats: 'ai' or 'client' for each player
+            strategy: AI search, see MatchServer.new_game
+            max_depth: Deepest AI search
+            time_budget: Seconds per AI move
+        """
+        self.id = match_id
+        self.game = game
+        self.seats = seats
+        self.strategy = strategy
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.to_move: Optional[int] = None
+        self.cards: List[BuildingCard] = []
+        self.moves: List[List[Optional[List]]] = []
+        self.finished = False
+        self.changed = asyncio.Condition()
+        self.client_moves: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+        board = game.board
+        self.layout = list(board.cards)
+        self.layout_key = json.dumps([asdict(game.game_settings), board.no_players, board.style,
+                                      [[card.card_type, card.max_employees] for card in board.cards]], default=str)
+        self.building_cards = {card_type: stack[0] for card_type, stack in game.building_cards.items()}
+
+    async def set_to_move(self, player_ind: Optional[int]) -> None:
+        """Set the seat to move and wake the requests waiting for it."""
+        async with self.changed:
+            self.to_move = player_ind
+            self.changed.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public state of the game."""
+        board = self.game.board
+        building_types, employees, buy_prices, sell_prices = board.get_state()
+        return {'ok': True, 'game': self.id, 'turn': self.game.turn_number, 'to_move': self.to_move, 'finished': self.finished,
+                'seats': self.seats, 'cards': [card.card_type for card in self.cards],
+                'locations': [list(loc) for loc in board.rules.locations],
+                'layout': [[card.card_type, card.max_employees] for card in board.cards],
+                'buildings': building_types, 'employees': employees, 'buy_prices': buy_prices, 'sell_prices': sell_prices,
+                'nets': [board.calc_player_net(p) for p in range(board.no_players)]}
+
+
+class MatchServer:
+    """Hosts games between AI and client seats, searching AI moves in an executor."""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None, max_games: int = 500,
+                 max_requests: int = 32, time_budget: float = 1.0, max_finished: int = 1000,
+                 executor: Optional[Executor] = None) -> None:
+        """Initialize the server.
+
+        Args:
+            max_workers: Worker processes searching AI moves, defaults to the
+                CPU count, or 1 with an executor passed in
+            max_pending: Searches queued in the executor at once, defaults
+                to twice the number of workers
+            max_games: Games in progress at once
+            max_requests: Open requests per connection before it stops being read
+            time_budget: Default seconds per AI move
+            max_finished: Finished games kept for result requests
+            executor: Executor to search in instead of a new process pool
+        """
+        self.max_workers = max_workers or (os.cpu_count() or 1 if executor is None else 1)
+        self.executor = executor or ProcessPoolExecutor(self.max_workers)
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.max_games = max_games
+        self.max_requests = max_requests
+        self.time_budget = time_budget
+        self.max_finished = max_finished
+        self.matches: Dict[int, Match] = {}
+        self.finished: OrderedDict = OrderedDict()
+        self.latency = LatencyStats()
+        self.pending = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._ids = itertools.count()
+        self._tasks = set()
+
+    def close(self) -> None:
+        """Shut down the executor."""
+        self.executor.shutdown(cancel_futures=True)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, path: Optional[str] = None) -> None:
+        """Serve clients until cancelled, on a Unix socket if path is given, else on TCP."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of one client connection."""
+        open_requests = asyncio.Semaphore(self.max_requests)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line: bytes) -> None:
+            try:
+                try:
+                    request = json.loads(line)
+                    response = await self.handle_request(request)
+                except Exception as e:
+                    # every request is answered, whatever went wrong with it
+                    request, response = {}, {'ok': False, 'error': str(e) or type(e).__name__}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                async with write_lock:
+                    writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                open_requests.release()
+
+        try:
+            while line := await reader.readline():
+                await open_requests.acquire()
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one request, see the module docstring.
+
+        Raises:
+            ValueError: If the request is invalid
+        """
+        if not isinstance(request, dict):
+            raise ValueError('request must be a JSON object')
+        op = request.get('op')
+        if op == 'new_game':
+            return {'ok': True, 'game': self.new_game(**{k: v for k, v in request.items() if k not in ['op', 'id']})}
+        if op == 'stats':
+            return {'ok': True, 'games': len(self.matches), 'finished': len(self.finished), 'pending': self.pending,
+                    'latency_ms': self.latency.summary()}
+        if op not in ['state', 'wait_turn', 'move', 'result']:
+            raise ValueError(f'unknown op {op!r}')
+        match = self._match(request.get('game'))
+        if op == 'state':
+            return match.to_dict()
+        if op == 'wait_turn':
+            seat = self._seat(match, request.get('seat'))
+            async with match.changed:
+                await match.changed.wait_for(lambda: match.to_move == seat or match.finished)
+            return match.to_dict()
+        if op == 'move':
+            await self.client_move(match, self._seat(match, request.get('seat')), request.get('move'))
+            return {'ok': True}
+        return {'ok': True, 'game': match.id, **await asyncio.shield(match.result)}
+
+    def _match(self, match_id: Any) -> Match:
+        match = self.matches.get(match_id) or self.finished.get(match_id)
+        if match is None:
+            raise ValueError(f'no game {match_id!r}')
+        return match
+
+    def _seat(self, match: Match, seat: Any) -> int:
+        if not _is_int(seat) or not 0 <= seat < len(match.seats):
+            raise ValueError(f'seat must be an integer from 0 to {len(match.seats) - 1}, got {seat!r}')
+        return seat
+
+    def new_game(self, players: int = 2, style: str = 'rectangle', seats: Optional[List[str]] = None, strategy: str = 'search',
+                 depth: int = 2, time_budget: Optional[float] = None, seed: Optional[int] = None,
+                 settings: Optional[Dict[str, Any]] = None) -> int:
+        """Start hosting a game.
+
+        Args:
+            players: Number of players
+            style: Board layout style
+            seats: 'ai' or 'client' for each player, defaults to all AI
+            strategy: AI search, 'search' for Player.find_best_move_iterative
+                or 'paranoid' or 'maxn' for AdversarialPlayer
+            depth: Deepest AI search; for the adversarial strategies it
+                counts the moves of every player
+            time_budget: Seconds per AI move, defaults to the server's
+            seed: Seed for the board layout
+            settings: Settings fields to change from the defaults
+
+        Returns:
+            Id of the game
+
+        Raises:
+            ValueError: If the server is full or the arguments are invalid
+        """
+        if len(self.matches) >= self.max_games:
+            raise ValueError('server full')
+        if not _is_int(players):
+            raise ValueError('players must be an integer')
+        seats = seats or ['ai'] * players
+        if len(seats) != players or any(seat not in SEATS for seat in seats):
+            raise ValueError(f'seats must be {players} of {SEATS}')
+        if strategy not in STRATEGIES:
+            raise ValueError(f'strategy must be one of {STRATEGIES}')
+        if style not in STYLES:
+            raise ValueError(f'style must be one of {STYLES}')
+        if not _is_int(depth) or depth < 1:
+            raise ValueError('depth must be a positive integer')
+        if time_budget is not None and (not isinstance(time_budget, (int, float)) or isinstance(time_budget, bool) or time_budget <= 0):
+            raise ValueError('time_budget must be a positive number of seconds')
+        if seed is not None and not _is_int(seed):
+            raise ValueError('seed must be an integer')
+        game_settings = _settings_from_dict({**asdict(Settings()), **_check_settings(settings or {})})
+        if players not in game_settings.no_players_to_board_size:
+            raise ValueError(f'players must be one of {sorted(game_settings.no_players_to_board_size)}')
+        # seed the layout without disturbing the random state of anything else in the process
+        random_state = random.getstate()
+        if seed is not None:
+            random.seed(seed)
+        try:
+            game = Game(game_settings, players, board_style=style)
+        except Exception as e:
+            raise ValueError(f'cannot set up the game: {e}') from e
+        finally:
+            random.setstate(random_state)
+
+        match = Match(next(self._ids), game, seats, strategy, depth, self.time_budget if time_budget is None else time_budget)
+        self.matches[match.id] = match
+        task = asyncio.create_task(self._play(match))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return match.id
+
+    async def _play(self, match: Match) -> None:
+        """Play a game to the end, as Game.play_game does."""
+        game = match.game
+        try:
+            while game.turn_number < game.game_settings.no_of_turns_in_game:
+                match.cards = game.get_turn_building_cards(False, 4)
+                turns_left = game.game_settings.no_of_turns_in_game - game.turn_number
+                turn = []
+                for player_ind, seat in enumerate(match.seats):
+                    await match.set_to_move(player_ind)
+                    if seat == 'ai':
+                        move = await self.ai_move(match, player_ind, min(match.max_depth, turns_left) if match.strategy == 'search' else match.max_depth)
+                    else:
+                        move = await match.client_moves.get()
+                    if move is not None:
+                        move.apply(game.board)
+                    turn.append(encode_move(move) if move is not None else None)
+                match.moves.append(turn)
+                game.turn_number += 1
+            nets = [game.board.calc_player_net(p) for p in range(game.no_players)]
+            match.result.set_result({'nets': nets, 'winners': [p for p, net in enumerate(nets) if net == max(nets)], 'moves': match.moves})
+        except Exception as e:
+            match.result.set_result({'ok': False, 'error': f'{type(e).__name__}: {e}'})
+        finally:
+            match.finished = True
+            await match.set_to_move(None)
+            del self.matches[match.id]
+            self.finished[match.id] = match
+            while len(self.finished) > self.max_finished:
+                self.finished.popitem(last=False)
+
+    async def ai_move(self, match: Match, player_ind: int, max_depth: int) -> Optional[GameMove]:
+        """Search an AI seat's move in the executor, waiting for a free slot first.
+
+        The latency recorded includes the wait for a slot.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        start = time.perf_counter()
+        async with self._slots:
+            self.pending += 1
+            try:
+                search = functools.partial(_search_move, match.layout_key, match.game.game_settings, match.game.no_players,
+                                           match.game.board.style, match.layout, encode_board(match.game.board),
+                                           match.building_cards, match.cards, player_ind, match.strategy, max_depth, match.time_budget)
+                record, _, _ = await asyncio.get_running_loop().run_in_executor(self.executor, search)
+            finally:
+                self.pending -= 1
+        self.latency.record(time.perf_counter() - start)
+        return decode_move(record, match.game) if record is not None else None
+
+    async def client_move(self, match: Match, seat: int, record: Optional[List]) -> None:
+        """Play a client seat's move.
+
+        Raises:
+            ValueError: If the seat does not exist, it is not the seat's turn
+                or the move is not valid
+        """
+        seat = self._seat(match, seat)
+        if match.seats[seat] != 'client' or match.to_move != seat or match.client_moves.full():
+            raise ValueError(f"it is not client seat {seat}'s turn")
+        move = None
+        if record is not None:
+            move = decode_move(record, match.game)
+            if move.player_ind != seat or not move.validate_move(match.game.board) or \
+                    (move.move_type == 'build' and move.building_card.card_type not in [card.card_type for card in match.cards]):
+                raise ValueError(f'invalid move {record}')
+        await match.client_moves.put(move)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Host concurrent games for AI and scripted clients.')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to listen on')
+    parser.add_argument('--unix', default=None, help='Unix socket path to listen on instead of TCP')
+    parser.add_argument('--workers', type=int, default=None, help='search worker processes, defaults to the CPU count')
+    parser.add_argument('--max-pending', type=int, default=None, help='searches queued in the pool at once')
+    parser.add_argument('--max-games', type=int, default=500, help='games in progress at once')
+    parser.add_argument('--time-budget', type=float, default=1.0, help='default seconds per AI move')
+    args = parser.parse_args(argv)
+
+    server = MatchServer(args.workers, args.max_pending, args.max_games, time_budget=args.time_budget)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Monte Carlo Tree Search player."""
+from typing import List, Tuple, Optional
+import math
+import random
+from models.settings import Settings
+from models.board import Board
+from models.game_move import GameMove
+from models.building_card import BuildingCard
+from models.player import Player
+from models.evaluation import MoveEvaluator
+from models.search_budget import SearchBudget
+
+class MCTSNode:
+    """A position in the search tree, reached by playing move from its parent."""
+
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'total_net', 'best_net')
+
+    def __init__(self, move: Optional[GameMove] = None, parent: Optional['MCTSNode'] = None) -> None:
+        self.move = move
+        self.parent = parent
+        self.children: List['MCTSNode'] = []
+        self.untried: Optional[List[GameMove]] = None
+        self.visits = 0
+        self.total_net = 0.0
+        self.best_net = float('-inf')
+
+
+class MCTSPlayer(Player):
+    """Player that plans with Monte Carlo Tree Search instead of full enumeration.
+
+    Each iteration walks down the tree with UCT selection, adds at most one
+    new position, plays a cheap rollout to the planning horizon and scores
+    the final board with calc_player_net. Progressive widening limits how
+    many children a position may have by its visit count, and children are
+    added best immediate net first, so a position with a large branching
+    factor is searched deeply before it is searched widely.
+    """
+
+    def __init__(self, player_ind: int, game_settings: Settings, exploration: float = 0.7,
+                 widening_constant: float = 2.0, widening_exponent: float = 0.5,
+                 rollout_policy: str = 'greedy', rollout_epsilon: float = 0.2, seed: Optional[int] = None) -> None:
+        """Initialize the player.
+
+        Args:
+            player_ind: Player index
+            game_settings: Game settings configuration
+            exploration: UCT exploration constant, applied to nets scaled to [0, 1]
+            widening_constant: A position may have widening_constant * visits ** widening_exponent children
+            widening_exponent: See widening_constant
+            rollout_policy: 'greedy' to play the best immediate move, 'random' for uniform random moves
+            rollout_epsilon: Chance of a random move in a greedy rollout
+            seed: Seed for the player's own random number generator
+        """
+        super().__init__(player_ind, game_settings)
+        if rollout_policy not in ['greedy', 'random']:
+            raise ValueError("rollout policy must be one of ['greedy', 'random']")
+        self.exploration = exploration
+        self.widening_constant = widening_constant
+        self.widening_exponent = widening_exponent
+        self.rollout_policy = rollout_policy
+        self.rollout_epsilon = rollout_epsilon
+        self.rng = random.Random(seed)
+        self.root = None
+
+    def find_best_move(self, board: Board, available_building_cards: List[BuildingCard], max_depth: Optional[int] = None,
+                       iterations: Optional[int] = 1000, time_budget: Optional[float] = None) -> Tuple[Optional[GameMove], float, int]:
+        """Plan over a horizon of moves with a fixed iteration or time budget.
+
+        Takes only the arguments that apply to MCTS, so a Game.play_turn call
+        with arguments for Player.find_best_move, such as prune, raises
+        TypeError instead of quietly playing a different search.
+
+        Args:
+            board: Current game board state; restored before returning
+            available_building_cards: List of available building cards
+            max_depth: Planning horizon in moves, defaults to the number of turns in a game
+            iterations: Number of iterations to run, None for no limit
+            time_budget: Seconds to search for, None for no limit
+
+        Returns:
+            The most visited root move, or None if there is no valid move
+            The best net found in a playout starting with that move
+            The number of iterations run
+        """
+        if iterations is None and time_budget is None:
+            raise ValueError('MCTS needs an iteration or time budget')
+        horizon = max_depth or self.game_settings.no_of_turns_in_game
+        if self._move_evaluator is None or self._move_evaluator.neighbours is not board.neighbours:
+            self._move_evaluator = MoveEvaluator(board)
+        budget = SearchBudget(time_budget, iterations)
+        budget.start()
+
+        self.root = MCTSNode()
+        self._net_range = [float('inf'), float('-inf')]
+        count = 0
+        while not budget.exhausted(count):
+            self._iterate(board, available_building_cards, horizon)
+            count += 1
+            if not self.root.children and not self.root.untried:
+                break # no valid moves
+
+        if not self.root.children:
+            return None, float('-inf'), count
+        best = max(self.root.children, key=lambda child: child.visits)
+        return best.move, best.best_net, count
+
+    def _candidate_moves(self, board: Board, available_building_cards: List[BuildingCard]) -> Tuple[List[GameMove], List[float]]:
+        """Valid moves and the player's net after each one."""
+        moves = self._generate_possible_moves(board, available_building_cards)
+        nets = list(self._move_evaluator.evaluate(board, moves)) if moves else []
+        return moves, nets
+
+    def _iterate(self, board: Board, available_building_cards: List[BuildingCard], horizon: int) -> None:
+        """Run one selection, expansion, rollout and backpropagation pass."""
+        node, applied = self.root, []
+        try:
+            # selection and expansion
+            while len(applied) < horizon:
+                if node.untried is None:
+                    moves, nets = self._candidate_moves(board, available_building_cards)
+                    order = sorted(range(len(moves)), key=lambda i: -nets[i])
+                    node.untried = [moves[i] for i in order]
+                widen_limit = self.widening_constant * max(node.visits, 1) ** self.widening_exponent
+                if node.untried and len(node.children) < widen_limit:
+                    child = MCTSNode(node.untried.pop(0), node)
+                    node.children.append(child)
+                    node = child
+                    node.move.apply(board)
+                    applied.append(node.move)
+                    break
+                if not node.children:
+                    break
+                node = self._select_child(node)
+                node.move.apply(board)
+                applied.append(node.move)
+
+            # rollout to the horizon
+            while len(applied) < horizon:
+                moves, nets = self._candidate_moves(board, available_building_cards)
+                if not moves:
+                    break
+                if self.rollout_policy == 'random' or self.rng.random() < self.rollout_epsilon:
+                    move = self.rng.choice(moves)
+                else:
+                    move = moves[max(range(len(moves)), key=lambda i: nets[i])]
+                move.apply(board)
+                applied.append(move)
+
+            net = board.calc_player_net(self.player_no)
+        finally:
+            for move in reversed(applied):
+                move.revert(board)
+
+        self._net_range = [min(self._net_range[0], net), max(self._net_range[1], net)]
+        while node is not None:
+            node.visits += 1
+            node.total_net += net
+            node.best_net = max(node.best_net, net)
+            node = node.parent
+
+    def _select_child(self, node: MCTSNode) -> MCTSNode:
+        """Child with the highest UCT score, with mean nets scaled to [0, 1]."""
+        low, high = self._net_range
+        scale = high - low if high > low else 1.0
+        log_visits = math.log(node.visits)
+
+        def uct(child: MCTSNode) -> float:
+            if child.visits == 0:
+                return float('inf')
+            mean = (child.total_net / child.visits - low) / scale
+            return mean + self.exploration * math.sqrt(log_visits / child.visits)
+        return max(node.children, key=uct)
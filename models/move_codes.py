@@ -0,0 +1,212 @@
+"""Compact integer encoding of moves for the search.
+
+A move code packs a move into a small int:
+
+    bits 0-1  player index
+    bits 2-3  move kind (BUILD, EMPLOYEE, SELL_PRICE or BUY_PRICE)
+    bit  4    sign of the employee or price delta (1 for +1, 0 for -1)
+    bits 5-7  index of the building card in the available building cards
+    bits 8-   flat board location, row * board width + column
+
+Codes are only meaningful together with the board layout and the list of
+available building cards they were generated for. Convert to and from
+GameMove with to_game_move and from_game_move at the edge of the search.
+"""
+from typing import List, Tuple
+from .board import Board
+from .building_card import BuildingCard, NO_BUILDING
+from .game_move import GameMove
+
+BUILD, EMPLOYEE, SELL_PRICE, BUY_PRICE = 0, 1, 2, 3
+MOVE_KINDS = ['build', 'employee', 'sell_price', 'buy_price']
+MAX_PLAYERS = 4
+MAX_CARDS = 8
+
+def encode(player_ind: int, kind: int, card_index: int = 0, cell: int = 0, delta: int = 0) -> int:
+    """Pack a move into a code.
+
+    Args:
+        player_ind: Player index
+        kind: Move kind
+        card_index: Index of the building card in the available cards, for builds
+        cell: Flat board location, for builds and employee changes
+        delta: Employee or price change, -1 or 1
+
+    Returns:
+        Move code
+    """
+    return player_ind | kind << 2 | (delta > 0) << 4 | card_index << 5 | cell << 8
+
+def decode(code: int) -> Tuple[int, int, int, int, int]:
+    """Unpack a move code.
+
+    Returns:
+        Tuple of player index, move kind, card index, flat location and delta
+        (0 for builds)
+    """
+    kind = code >> 2 & 3
+    delta = 0 if kind == BUILD else (1 if code & 16 else -1)
+    return code & 3, kind, code >> 5 & 7, code >> 8, delta
+
+def to_game_move(code: int, board: Board, available_building_cards: List[BuildingCard]) -> GameMove:
+    """Convert a move code into a GameMove.
+
+    Args:
+        code: Move code
+        board: Board the code was generated for
+        available_building_cards: Building cards the code was generated for
+
+    Returns:
+        Equivalent GameMove
+    """
+    player_ind, kind, card_index, cell, delta = decode(code)
+    coords = divmod(cell, len(board.mask[0]))
+    return GameMove(
+        player_ind=player_ind,
+        move_type=MOVE_KINDS[kind],
+        building_card=available_building_cards[card_index] if kind == BUILD else NO_BUILDING,
+        building_coordinate=coords if kind == BUILD else (0,0),
+        employee_delta=delta if kind == EMPLOYEE else 0,
+        employee_coordinate=coords if kind == EMPLOYEE else (0,0),
+        sell_price_delta=delta if kind == SELL_PRICE else 0,
+        buy_price_delta=delta if kind == BUY_PRICE else 0
+    )
+
+def from_game_move(move: GameMove, board: Board, available_building_cards: List[BuildingCard]) -> int:
+    """Convert a GameMove into a move code.
+
+    Args:
+        move: Move to convert; a build's card is matched to the available
+            card it is, or else to the first available card of its type
+        board: Board the move is for
+        available_building_cards: Building cards to index the move's card in
+
+    Returns:
+        Equivalent move code
+    """
+    kind = MOVE_KINDS.index(move.move_type)
+    width = len(board.mask[0])
+    if kind == BUILD:
+        matches = [k for k, card in enumerate(available_building_cards) if card is move.building_card]
+        matches += [k for k, card in enumerate(available_building_cards) if card.card_type == move.building_card.card_type]
+        if not matches:
+            raise ValueError(f'no available building card for {move}')
+        card_index = matches[0]
+        return encode(move.player_ind, kind, card_index, move.building_coordinate[0] * width + move.building_coordinate[1])
+    if kind == EMPLOYEE:
+        return encode(move.player_ind, kind, 0, move.employee_coordinate[0] * width + move.employee_coordinate[1], move.employee_delta)
+    return encode(move.player_ind, kind, delta=move.sell_price_delta if kind == SELL_PRICE else move.buy_price_delta)
+
+def generate_move_codes(board: Board, player_ind: int, available_building_cards: List[BuildingCard]) -> List[int]:
+    """Codes of all valid moves for a player, in Player._generate_possible_moves order.
+
+    Reads the legal cells the board maintains (see Board.refresh_legal_cells
+    and Board.update_legal_cells) instead of validating each candidate, so
+    the building cards must follow the placement rules of the board's
+    Settings, as the cards of a Game do.
+
+    Args:
+        board: Current board state
+        player_ind: Player to move
+        available_building_cards: List of available building cards
+
+    Returns:
+        List of move codes
+    """
+    if player_ind >= MAX_PLAYERS or len(available_building_cards) > MAX_CARDS:
+        raise ValueError(f'move codes support at most {MAX_PLAYERS} players and {MAX_CARDS} building cards')
+    if board.stale_cells:
+        board.update_legal_cells()
+    codes = []
+    cells = board.rules.cells
+    open_cells, occupied = board.open_cells, board.player_occupied_cells[player_ind]
+
+    # building placements, by cell and then by card
+    card_cells = [(open_cells.get(card.card_type, 0) & ~occupied, player_ind | k << 5) for k, card in enumerate(available_building_cards)]
+    remaining = 0
+    for legal, _ in card_cells:
+        remaining |= legal
+    while remaining:
+        bit = remaining & -remaining
+        remaining ^= bit
+        cell_code = cells[bit.bit_length() - 1] << 8
+        for legal, card_code in card_cells:
+            if legal & bit:
+                codes.append(cell_code | card_code)
+
+    # employee changes
+    removes, adds = board.employee_remove_cells & occupied, board.employee_add_cells & occupied
+    remaining = removes | adds
+    while remaining:
+        bit = remaining & -remaining
+        remaining ^= bit
+        cell_code = player_ind | EMPLOYEE << 2 | cells[bit.bit_length() - 1] << 8
+        if removes & bit:
+            codes.append(cell_code)
+        if adds & bit:
+            codes.append(cell_code | 16)
+
+    # price changes
+    sell_price, buy_price = board.player_sell_prices[player_ind], board.player_buy_prices[player_ind]
+    for kind, price, low, high in [(SELL_PRICE, sell_price, 2, 5), (BUY_PRICE, buy_price, 1, 4)]:
+        if low <= price - 1 <= high:
+            codes.append(player_ind | kind << 2)
+        if low <= price + 1 <= high:
+            codes.append(player_ind | kind << 2 | 16)
+    return codes
+
+def apply_code(board: Board, code: int, available_building_cards: List[BuildingCard]) -> Tuple:
+    """Apply a move code to the board.
+
+    Args:
+        board: Board to change
+        code: Move code
+        available_building_cards: Building cards the code was generated for
+
+    Returns:
+        Undo information for revert_code: the board's stale cells and legal
+        cells version before the move, then for builds the building card
+        and mask value that were replaced
+    """
+    undo = (board.stale_cells, board.legal_cells_version)
+    player_ind, kind = code & 3, code >> 2 & 3
+    if kind == BUILD:
+        i, j = divmod(code >> 8, len(board.mask[0]))
+        return undo + board.set_building(player_ind, i, j, available_building_cards[code >> 5 & 7])
+    delta = 1 if code & 16 else -1
+    if kind == EMPLOYEE:
+        i, j = divmod(code >> 8, len(board.mask[0]))
+        board.add_employees(player_ind, i, j, delta)
+    elif kind == SELL_PRICE:
+        board.shift_sell_price(player_ind, delta)
+    else:
+        board.shift_buy_price(player_ind, delta)
+    return undo
+
+def revert_code(board: Board, code: int, undo: Tuple) -> None:
+    """Undo a move code previously applied with apply_code.
+
+    Moves are reverted in the reverse order they were applied, so if the
+    legal cells were not recomputed in between they are still those of the
+    position before the move, and only its stale cells need restoring.
+
+    Args:
+        board: Board the code was applied to
+        code: Move code
+        undo: Value returned by apply_code
+    """
+    player_ind, kind = code & 3, code >> 2 & 3
+    if kind == BUILD:
+        i, j = divmod(code >> 8, len(board.mask[0]))
+        board.set_building(player_ind, i, j, undo[2], undo[3])
+    else:
+        delta = -1 if code & 16 else 1
+        if kind == EMPLOYEE:
+            i, j = divmod(code >> 8, len(board.mask[0]))
+            board.add_employees(player_ind, i, j, delta)
+        elif kind == SELL_PRICE:
+            board.shift_sell_price(player_ind, delta)
+        else:
+            board.shift_buy_price(player_ind, delta)
+    if board.legal_cells_version == undo[1]:
+        board.stale_cells = undo[0]
@@ -0,0 +1,71 @@
+"""Move ordering heuristics for iterative deepening searches."""
+from typing import List, Dict, Tuple
+
+class MoveOrdering:
+    """Orders moves so the likely best ones are searched first.
+
+    Moves are tried in this order: the best move found for the same position
+    by an earlier search (which includes the principal variation of the
+    previous iteration), then killer moves that were best at the same ply
+    elsewhere in the tree, then the rest by history score, a running total
+    that rewards moves for being best with weight growing with the depth
+    searched below them. Moves with equal standing keep their generated order.
+    Moves are identified by their move codes (see models.move_codes).
+    """
+
+    def __init__(self, no_killers: int = 2) -> None:
+        """Initialize empty ordering statistics.
+
+        Args:
+            no_killers: Killer moves remembered per ply
+        """
+        self.no_killers = no_killers
+        self.best_moves: Dict[int, int] = {}
+        self.killers: Dict[int, List[int]] = {}
+        self.history: Dict[int, int] = {}
+
+    def order(self, moves: List[int], position_key: int, ply: int) -> List[int]:
+        """Sort moves for searching.
+
+        Args:
+            moves: Move codes in generated order
+            position_key: Hash of the position the moves are made from
+            ply: Depth of the position below the search root
+
+        Returns:
+            The moves, best candidates first
+        """
+        best = self.best_moves.get(position_key)
+        killers = self.killers.get(ply, [])
+        history = self.history
+
+        def rank(move: int) -> Tuple[int, int]:
+            if move == best:
+                return (0, 0)
+            if move in killers:
+                return (1, killers.index(move))
+            return (2, -history.get(move, 0))
+        return sorted(moves, key=rank)
+
+    def record_best(self, move: int, position_key: int, ply: int, depth_left: int) -> None:
+        """Record the best move found for a position.
+
+        Args:
+            move: Code of the best move from the position
+            position_key: Hash of the position
+            ply: Depth of the position below the search root
+            depth_left: Depth searched below the position
+        """
+        self.best_moves[position_key] = move
+        killers = self.killers.setdefault(ply, [])
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[self.no_killers:]
+        self.history[move] = self.history.get(move, 0) + 2 ** depth_left
+
+    def clear(self) -> None:
+        """Forget all statistics."""
+        self.best_moves.clear()
+        self.killers.clear()
+        self.history.clear()
@@ -0,0 +1,141 @@
+"""Root-parallel move search on a pool of persistent worker processes."""
+from typing import List, Dict, Tuple, Optional, Any
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import os
+from .board import Board
+from .building_card import BuildingCard
+from .game_move import GameMove
+from .player import Player
+from .transposition import TranspositionTable
+from .search_stats import SearchStats
+from .snapshot import encode_board, decode
+
+# worker process state, set once by _init_worker and reused for every task
+_worker: Dict[str, Any] = {}
+
+def _layout_key(board: Board) -> Tuple:
+    """Identify a board's static layout."""
+    return (board.no_players, board.style, tuple(card.card_type for card in board.cards))
+
+def _init_worker(board: Board, tt_size: int) -> None:
+    """Keep a private copy of the board layout in the worker process."""
+    _worker['board'] = board
+    _worker['players'] = {}
+    _worker['table'] = TranspositionTable(tt_size) if tt_size > 0 else None
+    _worker['table_signature'] = None
+
+def _search_slice(player_ind: int, state: bytes, cards: List[BuildingCard], move_indices: List[int],
+                  max_depth: int, moves_to_try: int, prune: bool, batch_leaves: bool, timing: bool) -> Tuple[Optional[int], float, int, SearchStats]:
+    """Search a slice of the root moves from a board snapshot.
+
+    Returns:
+        Tuple of the index of the best move in the slice's root move list, its
+        net, the number of moves evaluated and the slice's search statistics
+    """
+    board = _worker['board']
+    decode(state).restore(board, {card.card_type: card for card in cards})
+    player = _worker['players'].setdefault(player_ind, Player(player_ind, board.game_settings))
+
+    # cached nets are only valid for the same cards and move limit
+    table = _worker['table']
+    signature = (tuple(card.card_type for card in cards), moves_to_try)
+    if table is not None and signature != _worker['table_signature']:
+        table.clear()
+        _worker['table_signature'] = signature
+
+    all_moves = player._generate_possible_moves(board, cards)
+    all_moves = all_moves[:moves_to_try] if moves_to_try > 0 else all_moves
+    root_moves = [all_moves[ind] for ind in move_indices]
+    move, net, count = player.find_best_move(board, cards, max_depth, moves_to_try, transposition_table=table,
+                                             prune=prune, batch_leaves=batch_leaves, root_moves=root_moves,
+                                             stats=SearchStats(timing))
+    best_index = move_indices[root_moves.index(move)] if move is not None else None
+    return best_index, net, count, player.stats
+
+
+class ParallelSearch:
+    """Splits the root moves of Player.find_best_move across worker processes.
+
+    Workers are started once and receive the board layout (settings, board
+    cards, mask, Zobrist keys) when they start, so each task only carries a
+    binary snapshot of the mutable board state and the indices of the root
+    moves to search. Keep one ParallelSearch per game and call search every
+    turn; it returns the same move and net as the serial search.
+    """
+
+    def __init__(self, board: Board, max_workers: Optional[int] = None, tasks_per_worker: int = 4,
+                 tt_size: int = 0, mp_context: Any = None) -> None:
+        """Start the worker pool.
+
+        Args:
+            board: Board whose layout the workers will search
+            max_workers: Number of worker processes, defaults to the CPU count
+            tasks_per_worker: Root move slices per worker, for load balancing
+            tt_size: Buckets in each worker's own transposition table (0 for none)
+            mp_context: Optional multiprocessing context for the pool
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.tasks_per_worker = tasks_per_worker
+        self.tt_size = tt_size
+        self.mp_context = mp_context
+        self.layout_key = _layout_key(board)
+        self.executor = ProcessPoolExecutor(self.max_workers, mp_context=mp_context,
+                                            initializer=_init_worker, initargs=(copy.deepcopy(board), tt_size))
+
+    def __enter__(self) -> 'ParallelSearch':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        self.executor.shutdown()
+
+    def search(self, player: Player, board: Board, available_building_cards: List[BuildingCard], max_depth: int = 4,
+               moves_to_try: int = -1, prune: bool = False, batch_leaves: bool = False,
+               timing: bool = False) -> Tuple[Optional[GameMove], float, int]:
+        """Find the best move for a player, searching root moves in parallel.
+
+        Args:
+            player: Player to move
+            board: Current board state, with the layout the pool was started with
+            available_building_cards: List of available building cards
+            max_depth: Maximum depth of look-ahead search
+            moves_to_try: Number of moves to try
+            prune: Use branch-and-bound pruning in each worker
+            batch_leaves: Use vectorised leaf evaluation in each worker
+            timing: Time the sections of each worker's search
+
+        Returns:
+            The optimal GameMove or None if no valid move found
+            The net income of the best move sequence
+            The number of moves evaluated
+            The workers' statistics are merged into player.stats.
+        """
+        if _layout_key(board) != self.layout_key:
+            raise ValueError('board layout does not match the layout the workers were started with')
+
+        all_moves = player._generate_possible_moves(board, available_building_cards)
+        root_moves = all_moves[:moves_to_try] if moves_to_try > 0 else all_moves
+        if not root_moves:
+            return None, float('-inf'), 0
+
+        no_tasks = min(len(root_moves), self.max_workers * self.tasks_per_worker)
+        slices = [list(range(len(root_moves)))[k::no_tasks] for k in range(no_tasks)]
+        state = encode_board(board)
+        futures = [self.executor.submit(_search_slice, player.player_no, state, available_building_cards, move_indices,
+                                        max_depth, moves_to_try, prune, batch_leaves, timing) for move_indices in slices]
+
+        best_index, best_net, total_count, stats = None, float('-inf'), 0, SearchStats(timing)
+        for future in futures:
+            index, net, count, slice_stats = future.result()
+            total_count += count
+            stats.merge(slice_stats)
+            # ties go to the earliest root move, as in the serial search
+            if index is not None and (net > best_net or (net == best_net and index < best_index)):
+                best_index, best_net = index, net
+        player.stats = stats
+        best_move = root_moves[best_index] if best_index is not None else None
+        return best_move, best_net, total_count
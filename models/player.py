@@ -1,13 +1,24 @@
 """Player module containing the Player class."""
 
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
 import random
 import copy
 import math
+import time
+import numpy as np
 from models.settings import Settings
 from models.board import Board
 from models.game_move import GameMove
 from models.building_card import BuildingCard
+from models.transposition import TranspositionTable
+from models.evaluation import MoveEvaluator
+from models.move_ordering import MoveOrdering
+from models.search_budget import SearchBudget, SearchBudgetExceeded
+from models.search_stats import SearchStats
+from models.move_codes import generate_move_codes, apply_code, revert_code, to_game_move, from_game_move
+
+if TYPE_CHECKING:
+    from models.position_cache import PositionCache
 
 class Player:
     """Represents a player in the game."""
@@ -20,12 +31,31 @@ class Player:
         """
         self.player_no = player_ind
         self.game_settings = game_settings
+        self.stats = SearchStats()
+        self._bound_tables = None
+        self._move_evaluator = None
+        self.last_completed_depth = 0
+
+    @property
+    def nodes_pruned(self) -> int:
+        """Subtrees skipped by pruning in the last search."""
+        return self.stats.cutoffs
+
+    @nodes_pruned.setter
+    def nodes_pruned(self, value: int) -> None:
+        self.stats.cutoffs = value
     
-    def find_best_move(self, board: Board, available_building_cards: List[BuildingCard], max_depth: int = 4, moves_to_try: int = -1, debug_level: int = 0, current_depth: int = 0, current_count: int = 0) -> Tuple[GameMove, float, int]:
+    def find_best_move(self, board: Board, available_building_cards: List[BuildingCard], max_depth: int = 4, moves_to_try: int = -1,
+                       debug_level: int = 0, current_depth: int = 0, current_count: int = 0,
+                       transposition_table: Optional[TranspositionTable] = None, prune: bool = False, alpha: float = float('-inf'),
+                       batch_leaves: bool = False, root_moves: Optional[List[GameMove]] = None, ordering: Optional[MoveOrdering] = None,
+                       budget: Optional[SearchBudget] = None, stats: Optional[SearchStats] = None,
+                       position_cache: Optional['PositionCache'] = None) -> Tuple[GameMove, float, int]:
         """Find the optimal move sequence to maximize net income.
         
         Uses a look-ahead search to evaluate sequences of 4 moves and choose
-        the first move of the best sequence.
+        the first move of the best sequence. Moves are applied to the board in
+        place and reverted after each branch, so the board is left unchanged.
         
         Args:
             board: Current game board state
@@ -34,39 +64,334 @@ class Player:
             moves_to_try: Number of moves to try
             debug_level: Debug level
             current_depth: Current depth of search
+            current_count: Number of moves evaluated so far
+            transposition_table: Optional cache of searched positions keyed by
+                the board's Zobrist hash. Only reuse a table between searches
+                with the same available building cards and moves_to_try.
+            prune: Skip subtrees whose upper bound on the player's net cannot
+                beat the best net already found. Returns the same move and net
+                as the exhaustive search; the number of subtrees skipped is
+                left in self.nodes_pruned.
+            alpha: Best net found so far elsewhere in the search
+            batch_leaves: Score all moves one step from the search horizon in
+                a single vectorised MoveEvaluator call instead of applying
+                each one and calling calc_player_net
+            root_moves: Search only these moves at the root instead of every
+                possible move, e.g. one worker's share of a parallel search.
+                The transposition table is not used at the root.
+            ordering: Optional MoveOrdering used to sort the moves at every
+                node and updated with the best moves found
+            budget: Optional SearchBudget; SearchBudgetExceeded is raised
+                once it runs out, with the board restored
+            stats: Optional SearchStats to add this search's counters,
+                timings and trace events to. A new SearchStats is used if
+                none is given; either way it is left in self.stats.
+            position_cache: Optional PositionCache to look the result up in
+                before searching and to store it in after. Not used for
+                searches limited by alpha, root_moves or a budget, nor for
+                searches whose result also depends on an ordering's history
+                or on the random sample of moves_to_try.
             
         Returns:
             The optimal GameMove or None if no valid move found
             The net income of the best move sequence
             The number of moves evaluated
         """
+        if current_depth == 0:
+            self.stats = stats if stats is not None else SearchStats()
+            if prune:
+                self._bound_tables = self._calc_bound_tables(board, available_building_cards)
+            if batch_leaves and (self._move_evaluator is None or self._move_evaluator.neighbours is not board.neighbours):
+                self._move_evaluator = MoveEvaluator(board)
+
+        # searches limited by alpha, root moves or a budget are not complete results, and
+        # an ordering can break ties to another move and moves_to_try samples the moves
+        key = None
+        if (position_cache is not None and current_depth == 0 and alpha == float('-inf') and root_moves is None and budget is None
+                and ordering is None and moves_to_try == -1):
+            # sqlite3 is only loaded by callers that use a cache
+            from models.position_cache import position_key
+            key = position_key(board, available_building_cards, self.player_no, max_depth, moves_to_try)
+        cached = position_cache.get(key) if key is not None else None
+        if cached is not None:
+            code, net, count = cached
+        else:
+            root_codes = [from_game_move(move, board, available_building_cards) for move in root_moves] if root_moves is not None else None
+            code, net, count = self._search(board, available_building_cards, max_depth, moves_to_try, debug_level, current_depth, current_count,
+                                            transposition_table, prune, alpha, batch_leaves, root_codes, ordering, budget)
+            if key is not None:
+                position_cache.put(key, code, net, count)
+        move = to_game_move(code, board, available_building_cards) if code is not None else None
+        return move, net, count
+
+    def _search(self, board: Board, available_building_cards: List[BuildingCard], max_depth: int, moves_to_try: int, debug_level: int,
+                current_depth: int, current_count: int, transposition_table: Optional[TranspositionTable], prune: bool, alpha: float,
+                batch_leaves: bool, root_codes: Optional[List[int]], ordering: Optional[MoveOrdering],
+                budget: Optional[SearchBudget]) -> Tuple[Optional[int], float, int]:
+        """Recursive part of find_best_move, working on move codes.
+
+        Returns:
+            The code of the best move or None, its net and the number of moves evaluated
+        """
         pstr = ''
         for d in range(current_depth): pstr += '  ' 
 
+        if budget is not None:
+            budget.check(current_count)
+
+        stats = self.stats
+        stats.visit(current_depth)
+        timing, tracer = stats.timing, stats.tracer
+
         if current_depth == max_depth:
             show_net_calc = False
             if debug_level > 1: show_net_calc = True
 
+            if timing: start = time.perf_counter()
             net = board.calc_player_net(self.player_no, show_net_calc)
+            if timing: stats.times['evaluate'] += time.perf_counter() - start
+            if tracer is not None: tracer.record('leaf', current_depth, net=net)
             if debug_level > 0: print('net: ' + str(net))
             return None, net, current_count
-        
-        best_move, best_net_income = None, float('-inf')
-        all_possible_moves = self._generate_possible_moves(board, available_building_cards)
-        possible_moves = all_possible_moves[:moves_to_try] if moves_to_try > 0 else all_possible_moves
-
-        for move in possible_moves:
-            board_copy = copy.deepcopy(board)
-            move.apply(board_copy)
-            if debug_level > 0: print(pstr + str(current_depth) + '_move: ' + str(move))
-            if debug_level > 1: print(board_copy)
-            _, net_income, current_count = self.find_best_move(board_copy, available_building_cards, max_depth, moves_to_try, debug_level, current_depth + 1, current_count+1)
+
+        use_table = transposition_table is not None and (root_codes is None or current_depth > 0)
+        tt_key = board.zobrist_hash ^ board.zobrist.player(self.player_no)
+        if use_table:
+            cached = transposition_table.probe(tt_key, max_depth - current_depth)
+            if cached is not None:
+                net, code = cached
+                stats.tt_hits += 1
+                if tracer is not None: tracer.record('tt_hit', current_depth, code, net)
+                if debug_level > 0: print(pstr + 'cached net: ' + str(net))
+                return code, net, current_count
+            stats.tt_misses += 1
+
+        if prune and alpha > float('-inf'):
+            upper_bound = self._calc_net_upper_bound(board, max_depth - current_depth)
+            if upper_bound <= alpha:
+                if debug_level > 0: print(pstr + 'pruned, bound: ' + str(upper_bound))
+                stats.cutoffs += 1
+                if tracer is not None: tracer.record('cutoff', current_depth, net=upper_bound)
+                return None, upper_bound, current_count
+
+        best_code, best_net_income = None, float('-inf')
+        if root_codes is not None and current_depth == 0:
+            codes = list(root_codes)
+        else:
+            if timing: start = time.perf_counter()
+            all_codes = generate_move_codes(board, self.player_no, available_building_cards)
+            if timing: stats.times['generate'] += time.perf_counter() - start
+            codes = all_codes[:moves_to_try] if moves_to_try > 0 else all_codes
+        stats.expanded += 1
+        stats.moves_generated += len(codes)
+        if ordering is not None:
+            codes = ordering.order(codes, tt_key, current_depth)
+
+        if batch_leaves and current_depth == max_depth - 1:
+            if codes:
+                if timing: start = time.perf_counter()
+                nets = self._move_evaluator.evaluate_codes(board, codes, available_building_cards)
+                if timing: stats.times['evaluate'] += time.perf_counter() - start
+                best_index = int(np.argmax(nets)) # first of the best, as in the loop below
+                best_code, best_net_income = codes[best_index], int(nets[best_index])
+                current_count += len(codes)
+                if debug_level > 0:
+                    for code, net in zip(codes, nets):
+                        print(pstr + str(current_depth) + '_move: ' + str(to_game_move(code, board, available_building_cards))
+                              + ' net: ' + str(net))
+            codes = []
+
+        for code in codes:
+            if timing: start = time.perf_counter()
+            undo = apply_code(board, code, available_building_cards)
+            if timing: stats.times['apply'] += time.perf_counter() - start
+            if tracer is not None: tracer.record('move', current_depth, code)
+            if debug_level > 0: print(pstr + str(current_depth) + '_move: ' + str(to_game_move(code, board, available_building_cards)))
+            if debug_level > 1: print(board)
+            try:
+                _, net_income, current_count = self._search(board, available_building_cards, max_depth, moves_to_try, debug_level,
+                                                            current_depth + 1, current_count + 1, transposition_table, prune,
+                                                            max(alpha, best_net_income), batch_leaves, None, ordering, budget)
+            finally:
+                if timing: start = time.perf_counter()
+                revert_code(board, code, undo)
+                if timing: stats.times['apply'] += time.perf_counter() - start
             
             if net_income > best_net_income:
                 best_net_income = net_income
-                best_move = move
+                best_code = code
+
+        # with pruning, a result at or below alpha is only an upper bound
+        if use_table and best_net_income > alpha:
+            transposition_table.store(tt_key, max_depth - current_depth, best_net_income, best_code)
+            stats.tt_stores += 1
+        if tracer is not None and best_code is not None: tracer.record('best', current_depth, best_code, best_net_income)
+        if ordering is not None and best_code is not None and best_net_income > alpha:
+            ordering.record_best(best_code, tt_key, current_depth, max_depth - current_depth)
                 
-        return best_move, best_net_income, current_count
+        return best_code, best_net_income, current_count
+
+    def find_best_move_iterative(self, board: Board, available_building_cards: List[BuildingCard], max_depth: Optional[int] = None,
+                                 time_budget: Optional[float] = None, node_budget: Optional[int] = None, moves_to_try: int = -1,
+                                 prune: bool = True, transposition_table: Optional[TranspositionTable] = None,
+                                 batch_leaves: bool = False, stats: Optional[SearchStats] = None) -> Tuple[GameMove, float, int]:
+        """Anytime search that deepens until a time or node budget runs out.
+
+        Searches to depth 1, 2, 3, ... and returns the best move of the
+        deepest search that finished. Each pass orders moves using the best
+        moves, killer moves and history scores of the passes before it, so
+        with pruning the deeper passes can skip more of the tree. Depth 1 is
+        always completed, whatever the budget.
+
+        Args:
+            board: Current game board state
+            available_building_cards: List of available building cards
+            max_depth: Deepest search to attempt, defaults to the number of
+                turns in a game
+            time_budget: Seconds to search for, None for no limit
+            node_budget: Moves to evaluate in total, None for no limit
+            moves_to_try: Number of moves to try
+            prune: Use branch-and-bound pruning
+            transposition_table: Optional cache shared by all passes
+            batch_leaves: Use vectorised leaf evaluation
+            stats: Optional SearchStats collecting all passes, see find_best_move
+
+        Returns:
+            The best GameMove from the deepest completed search, or None
+            The net income of its best move sequence
+            The number of moves evaluated over all completed passes
+            The completed depth is left in self.last_completed_depth.
+        """
+        max_depth = max_depth or self.game_settings.no_of_turns_in_game
+        budget = SearchBudget(time_budget, node_budget)
+        budget.start()
+        ordering = MoveOrdering()
+        stats = stats if stats is not None else SearchStats()
+        best_move, best_net, total_count = None, float('-inf'), 0
+        self.last_completed_depth = 0
+
+        for depth in range(1, max_depth + 1):
+            budget.enforced = depth > 1
+            try:
+                move, net, total_count = self.find_best_move(board, available_building_cards, depth, moves_to_try,
+                                                             current_count=total_count, transposition_table=transposition_table,
+                                                             prune=prune, batch_leaves=batch_leaves, ordering=ordering, budget=budget, stats=stats)
+            except SearchBudgetExceeded:
+                break
+            best_move, best_net = move, net
+            self.last_completed_depth = depth
+            if move is None or budget.exhausted(total_count):
+                break
+        return best_move, best_net, total_count
+
+    def _calc_bound_tables(self, board: Board, available_building_cards: List[BuildingCard], player_ind: Optional[int] = None) -> Dict[str, int]:
+        """Find the largest gains any single move can make to a player's totals.
+
+        Scans the value tables of the available cards and of the cards the
+        player has already placed.
+
+        Args:
+            board: Current board state
+            available_building_cards: List of available building cards
+            player_ind: Player to find the gains of, defaults to this player
+
+        Returns:
+            Dictionary of the maximum value a new buy market, sell market or
+            process can produce ('buy_market', 'sell_market', 'process'), the
+            maximum gain in a market's value from a one step price change
+            ('buy_price_step', 'sell_price_step') and the maximum gain in a
+            process's value from one more connected market ('connection_step')
+        """
+        player_ind = self.player_no if player_ind is None else player_ind
+        cards = list(available_building_cards)
+        for (i, j) in board.card_index_to_location.values():
+            cards.append(board.player_bud_arrays[player_ind][i][j])
+
+        tables = {'buy_market': 0, 'sell_market': 0, 'process': 0, 'buy_price_step': 0, 'sell_price_step': 0, 'connection_step': 0}
+        for card in cards:
+            if card.card_type not in ['buy_market', 'sell_market', 'process'] or not card.values:
+                continue
+            max_value = max(v for row in card.values.values() for v in row.values())
+            tables[card.card_type] = max(tables[card.card_type], max_value)
+            if card.card_type == 'process':
+                for x in card.x_values:
+                    for y in card.y_values:
+                        value = card.get_value(x, y)
+                        step = max(card.get_value(x + 1, y), card.get_value(x, y + 1)) - value
+                        tables['connection_step'] = max(tables['connection_step'], step)
+            else:
+                # moving the player's price moves the market's total price with it
+                step_key = 'buy_price_step' if card.card_type == 'buy_market' else 'sell_price_step'
+                for x in card.x_values:
+                    for y in range(x, max(card.y_values) + 2):
+                        for d in [-1, 1]:
+                            if x + d not in card.x_values:
+                                continue
+                            try:
+                                step = card.get_value(x + d, y + d) - card.get_value(x, y)
+                            except KeyError:
+                                continue # price combination not reachable in play
+                            tables[step_key] = max(tables[step_key], step)
+        return tables
+
+    def _calc_net_upper_bound(self, board: Board, moves_left: int, player_ind: Optional[int] = None,
+                              tables: Optional[Dict[str, int]] = None, contested: bool = False) -> float:
+        """Upper bound on the player's net after a number of further moves.
+
+        Every move either builds or adds an employee (raising one output total
+        by a bounded amount and the cost by one), removes an employee (lowering
+        the cost by one) or changes a price by one (changing the margin by one
+        and every market of that kind by a bounded amount). The bound takes the
+        best case for each way of splitting the remaining moves between these.
+
+        Other players' prices and markets move the total prices the player's
+        markets are valued at, so when they also move (contested) each market
+        is bounded by the largest value of any card of its kind instead.
+
+        Args:
+            board: Current board state
+            moves_left: Number of moves the player still makes
+            player_ind: Player to bound the net of, defaults to this player
+            tables: Bound tables of the player, defaults to this player's
+                tables from the current search
+            contested: Whether other players move in between
+
+        Returns:
+            A value no continuation of moves_left moves can exceed
+        """
+        player_ind = self.player_no if player_ind is None else player_ind
+        tables = self._bound_tables if tables is None else tables
+        totals = board.player_totals[player_ind]
+        margin = board.player_sell_prices[player_ind] - board.player_buy_prices[player_ind]
+        max_margin = 5 - 1 # highest sell price less lowest buy price
+        cost = totals['tot_buds'] + totals['tot_emps']
+
+        build_gain_buy = max(tables['buy_market'], 1)
+        build_gain_sell = max(tables['sell_market'], 1)
+        build_gain_process = max(tables['process'], 4 * tables['connection_step'], 1)
+        if contested:
+            # market values are never negative, so none can gain more than the largest value
+            sum_buy = totals['sum_buy'] + totals['buy_market'] * tables['buy_market']
+            sum_sell = totals['sum_sell'] + totals['sell_market'] * tables['sell_market']
+            price_gain_buy, price_gain_sell = 0, 0
+        else:
+            sum_buy, sum_sell = totals['sum_buy'], totals['sum_sell']
+            price_gain_buy = (totals['buy_market'] + moves_left) * tables['buy_price_step']
+            price_gain_sell = (totals['sell_market'] + moves_left) * tables['sell_price_step']
+
+        best = float('-inf')
+        for builds in range(moves_left + 1):
+            for price_moves in range(moves_left - builds + 1):
+                removals = moves_left - builds - price_moves
+                units = min(
+                    sum_buy + builds * build_gain_buy + price_moves * price_gain_buy,
+                    totals['sum_process'] + builds * build_gain_process,
+                    sum_sell + builds * build_gain_sell + price_moves * price_gain_sell
+                )
+                units_margin = units * max(min(margin + price_moves, max_margin), 0)
+                min_cost = max(totals['tot_buds'], cost + builds - removals)
+                best = max(best, units_margin - min_cost)
+        return best
 
     def _generate_possible_moves(self, board: Board, available_building_cards: List[BuildingCard]) -> List[GameMove]:
         """Generate all possible valid moves from the current position.
@@ -78,74 +403,7 @@ class Player:
         Returns:
             List of valid GameMove objects
         """
-        moves = []
-        
-        # Try building placements
-        for coords in board.card_index_to_location.values():
-            if board.player_mask_arrays[self.player_no][coords[0]][coords[1]] == 1:
-                continue
-            for building_card in available_building_cards:
-                move = GameMove(
-                    player_ind=self.player_no,
-                    move_type='build',
-                    building_card=building_card,
-                    building_coordinate=coords,
-                    employee_delta=0,
-                    employee_coordinate=(0,0),
-                    sell_price_delta=0,
-                    buy_price_delta=0
-                )
-                if move.validate_move(board):
-                    moves.append(move)
-
-        # Try employee changes
-        for coords in board.card_index_to_location.values():
-            if board.player_mask_arrays[self.player_no][coords[0]][coords[1]] == 0:
-                continue
-            for delta in [-1, 1]:
-                move = GameMove(
-                    player_ind=self.player_no,
-                    move_type='employee',
-                    building_card=BuildingCard('None', 'none', max_players=4),
-                    building_coordinate=(0,0),
-                    employee_delta=delta,
-                    employee_coordinate=coords,
-                    sell_price_delta=0,
-                    buy_price_delta=0
-                )
-                if move.validate_move(board):
-                    moves.append(move)
-
-        # Try price changes
-        for sell_delta in [-1, 1]:
-            move = GameMove(
-                player_ind=self.player_no,
-                move_type='sell_price',
-                building_card=BuildingCard('None', 'none', max_players=4),
-                building_coordinate=(0,0),
-                employee_delta=0,
-                employee_coordinate=(0,0),
-                sell_price_delta=sell_delta,
-                buy_price_delta=0
-            )
-            if move.validate_move(board):
-                moves.append(move)
-
-        # Try price changes
-        for buy_delta in [-1, 1]:
-            move = GameMove(
-                player_ind=self.player_no,
-                move_type='buy_price',
-                building_card=BuildingCard('None', 'none', max_players=4),
-                building_coordinate=(0,0),
-                employee_delta=0,
-                employee_coordinate=(0,0),
-                sell_price_delta=0,
-                buy_price_delta=buy_delta
-            )
-            if move.validate_move(board):
-                moves.append(move)
-
-        return moves
+        return [to_game_move(code, board, available_building_cards)
+                for code in generate_move_codes(board, self.player_no, available_building_cards)]
 
 
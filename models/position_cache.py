@@ -0,0 +1,159 @@
+"""Persistent cache of move search results, shared between runs and processes.
+
+Searches from the same position with the same settings always find the same
+move, and the early turns of games on a layout repeat across sweeps and
+notebooks, so the best move and net of each search can be kept on disk and
+looked up instead of searching again.
+
+Entries are keyed by a SHA-256 hash of everything the result depends on: the
+cache version, the Settings, the board's static layout, its mutable state
+(see models.snapshot), the available building cards, the player and the
+search depth and breadth. The cache is a SQLite database in WAL mode, so any
+number of worker processes can read and write it at once, each through its
+own PositionCache. It holds at most max_entries positions; the least
+recently used are evicted beyond that.
+
+Example:
+    with PositionCache('positions.sqlite') as cache:
+        move, net, count = player.find_best_move(board, cards, max_depth=3, position_cache=cache)
+"""
+from typing import List, Optional, Tuple, Any
+from dataclasses import asdict
+import hashlib
+import json
+import sqlite3
+import time
+from models.board import Board
+from models.building_card import BuildingCard
+from models.snapshot import encode_board
+
+# bump when a change to the rules or the search changes search results, so
+# cached positions are searched again
+CACHE_VERSION = '1'
+
+def position_key(board: Board, available_building_cards: List[BuildingCard], player_ind: int, max_depth: int,
+                 moves_to_try: int = -1, strategy: str = 'search') -> bytes:
+    """Canonical hash of a search.
+
+    Args:
+        board: Board searched from
+        available_building_cards: Building cards available to the search
+        player_ind: Player searching
+        max_depth: Look-ahead depth of the search
+        moves_to_try: Number of moves tried at each node
+        strategy: Search algorithm the result comes from
+
+    Returns:
+        32-byte digest, the same for every search with the same result
+    """
+    header = json.dumps({
+        'version': CACHE_VERSION,
+        'settings': asdict(board.game_settings),
+        'no_players': board.no_players,
+        'style': board.style,
+        'layout': [[card.card_type, card.max_employees] for card in board.cards],
+        'cards': [[card.card_type, card.max_players] for card in available_building_cards],
+        'search': [strategy, player_ind, max_depth, moves_to_try],
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(header.encode() + encode_board(board)).digest()
+
+
+class PositionCache:
+    """Best moves and nets of searched positions, stored in a SQLite file.
+
+    Moves are stored as move codes (see models.move_codes), which index the
+    search's available building cards; the key covers those cards, so a
+    code is only ever decoded against the same list.
+
+    Attributes:
+        path: Database file
+        max_entries: Number of positions kept before the least recently used
+            are evicted
+        evict_interval: Stores between checks of the number of positions
+        hits: Lookups answered by this connection
+        misses: Lookups not answered by this connection
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, evict_interval: int = 100, timeout: float = 30.0) -> None:
+        """Open or create a position cache.
+
+        Args:
+            path: Database file, created if missing
+            max_entries: Number of positions to keep
+            evict_interval: Stores between evictions
+            timeout: Seconds to wait for another process's write to finish
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self.hits, self.misses = 0, 0
+        self._stores = 0
+        # autocommit, so every statement is its own short transaction and no
+        # lock is held between calls
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS positions (key BLOB PRIMARY KEY, move INTEGER, net REAL, '
+                                'count INTEGER, used REAL) WITHOUT ROWID')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS positions_used ON positions (used)')
+
+    def __enter__(self) -> 'PositionCache':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def get(self, key: bytes) -> Optional[Tuple[Optional[int], float, int]]:
+        """Look up a search result and mark it as recently used.
+
+        Args:
+            key: Key from position_key
+
+        Returns:
+            Tuple of the best move code (None if there was no move), net and
+            number of moves evaluated, or None if the position is not cached
+        """
+        row = self.connection.execute('SELECT move, net, count FROM positions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute('UPDATE positions SET used = ? WHERE key = ?', (time.time(), key))
+        return row[0], row[1], row[2]
+
+    def put(self, key: bytes, code: Optional[int], net: float, count: int) -> None:
+        """Store a search result, evicting old positions every evict_interval stores.
+
+        Args:
+            key: Key from position_key
+            code: Best move code, or None if there was no move
+            net: Net of the best move sequence
+            count: Number of moves evaluated
+        """
+        self.connection.execute('INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?)', (key, code, net, count, time.time()))
+        self._stores += 1
+        if self._stores % self.evict_interval == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """Delete the least recently used positions beyond max_entries.
+
+        Returns:
+            Number of positions deleted
+        """
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        self.connection.execute('DELETE FROM positions WHERE key IN (SELECT key FROM positions ORDER BY used LIMIT ?)', (excess,))
+        return excess
+
+    def clear(self) -> None:
+        """Delete every position."""
+        self.connection.execute('DELETE FROM positions')
@@ -0,0 +1,246 @@
+"""Streaming replay logs of played games, with keyframes for fast seeking.
+
+A replay log is a JSON lines file holding any number of games, one record
+per line:
+
+    {"type": "game", "game": id, "no_players": n, "style": s, "settings": {...}, "layout": [[name, type, max_employees], ...]}
+    {"type": "keyframe", "game": id, "turn": t, "state": "<base64 snapshot>"}
+    {"type": "move", "game": id, "turn": t, "move": [player, move_type, building_type, row, col, delta]}
+    {"type": "end", "game": id, "turn": t, "nets": [...]}
+
+Records are written and flushed as they happen and nothing is kept in
+memory, so logging many games costs a constant amount of memory. A run
+killed mid-write leaves at most a partial last line, which readers skip. A keyframe (see
+models.snapshot) is written at the start of every keyframe_interval-th turn,
+so reconstructing the position at any turn replays at most that many turns
+of moves.
+
+Example:
+    with ReplayWriter('games.jsonl') as log:
+        log.start_game(game)
+        game.play_game()
+
+    replay = ReplayReader('games.jsonl')
+    game = replay.game_at(replay.games()[0], turn=5)
+"""
+from typing import List, Dict, Optional, Iterator, Tuple, Any
+from dataclasses import asdict, fields
+import base64
+import json
+import os
+from models.settings import Settings
+from models.board import Board
+from models.board_card import BoardCard
+from models.building_card import NO_BUILDING
+from models.game import Game
+from models.game_move import GameMove
+from models.snapshot import encode_board, decode
+
+def encode_move(move: GameMove) -> List:
+    """Compact list form of a move: player, move type, building type, row, col, delta."""
+    if move.move_type == 'build':
+        return [move.player_ind, 'build', move.building_card.card_type, *move.building_coordinate, 0]
+    if move.move_type == 'employee':
+        return [move.player_ind, 'employee', 'none', *move.employee_coordinate, move.employee_delta]
+    delta = move.sell_price_delta if move.move_type == 'sell_price' else move.buy_price_delta
+    return [move.player_ind, move.move_type, 'none', 0, 0, delta]
+
+def decode_move(record: List, game: Game) -> GameMove:
+    """Rebuild a move from encode_move's list form, using the game's building cards."""
+    player_ind, move_type, building_type, row, col, delta = record
+    return GameMove(
+        player_ind=player_ind,
+        move_type=move_type,
+        building_card=game.building_cards[building_type][0] if move_type == 'build' else NO_BUILDING,
+        building_coordinate=(row, col) if move_type == 'build' else (0,0),
+        employee_delta=delta if move_type == 'employee' else 0,
+        employee_coordinate=(row, col) if move_type == 'employee' else (0,0),
+        sell_price_delta=delta if move_type == 'sell_price' else 0,
+        buy_price_delta=delta if move_type == 'buy_price' else 0
+    )
+
+def _settings_from_dict(values: Dict[str, Any]) -> Settings:
+    # JSON turns the int keys of the per player count tables into strings
+    names = {f.name for f in fields(Settings)}
+    return Settings(**{name: {int(k): v for k, v in value.items()} if isinstance(value, dict) else value
+                       for name, value in values.items() if name in names})
+
+def _decode_record(line: bytes) -> Optional[Dict[str, Any]]:
+    """A record of the log, or None for the partial line of an interrupted run."""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+class ReplayWriter:
+    """Appends the games it is attached to to a replay log as they are played."""
+
+    def __init__(self, path: str, keyframe_interval: int = 4) -> None:
+        """Open a replay log for appending.
+
+        Args:
+            path: JSON lines file to append to
+            keyframe_interval: Turns between state keyframes
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        games = ReplayReader(path).games() if os.path.exists(path) else []
+        self.next_game_id = max(games) + 1 if games else 0
+        self.keyframe_turns: Dict[int, int] = {} # last keyframe of each game being logged
+        self.file = open(path, 'a')
+        if self.file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n') # end the partial line of an interrupted run
+
+    def __enter__(self) -> 'ReplayWriter':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the log file."""
+        self.file.close()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def start_game(self, game: Game) -> int:
+        """Log a game from its current position on.
+
+        Attaches the writer to the game, so Game.play_turn and Game.play_game
+        log every applied move, the keyframes and the result.
+
+        Args:
+            game: Game to log
+
+        Returns:
+            Id of the game in the log
+        """
+        game.replay_log, game.replay_id = self, self.next_game_id
+        self.next_game_id += 1
+        board = game.board
+        self._write({'type': 'game', 'game': game.replay_id, 'no_players': game.no_players, 'style': board.style,
+                     'settings': asdict(game.game_settings),
+                     'layout': [[card.name, card.card_type, card.max_employees] for card in board.cards]})
+        self.keyframe(game)
+        return game.replay_id
+
+    def keyframe(self, game: Game) -> None:
+        """Log a keyframe of the game's current state."""
+        state = base64.b64encode(encode_board(game.board, game.turn_number)).decode('ascii')
+        self._write({'type': 'keyframe', 'game': game.replay_id, 'turn': game.turn_number, 'state': state})
+        self.keyframe_turns[game.replay_id] = game.turn_number
+
+    def start_turn(self, game: Game) -> None:
+        """Called by Game.play_turn before a turn; logs a keyframe when one is due."""
+        if game.turn_number % self.keyframe_interval == 0 and self.keyframe_turns.get(game.replay_id) != game.turn_number:
+            self.keyframe(game)
+
+    def record_move(self, game: Game, move: GameMove) -> None:
+        """Called by Game.play_turn after a move is applied."""
+        self._write({'type': 'move', 'game': game.replay_id, 'turn': game.turn_number, 'move': encode_move(move)})
+
+    def end_game(self, game: Game) -> None:
+        """Log the final nets and detach the writer from the game."""
+        nets = [game.board.calc_player_net(p) for p in range(game.no_players)]
+        self._write({'type': 'end', 'game': game.replay_id, 'turn': game.turn_number, 'nets': nets})
+        self.keyframe_turns.pop(game.replay_id, None)
+        game.replay_log = None
+
+
+class ReplayReader:
+    """Random access to the games in a replay log.
+
+    Opening a log scans it once and keeps only the file offsets of each
+    game's header and keyframes, so positions are reconstructed by seeking
+    to the nearest earlier keyframe and re-applying the moves after it.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Index a replay log.
+
+        Args:
+            path: JSON lines file written by ReplayWriter
+        """
+        self.path = path
+        self.index: Dict[int, Dict[str, Any]] = {}
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                # only game and keyframe records are indexed, so moves are not parsed
+                if line.startswith(b'{"type":"game"') or line.startswith(b'{"type":"keyframe"'):
+                    record = _decode_record(line) or {'type': None}
+                    if record['type'] == 'game':
+                        self.index[record['game']] = {'header': offset, 'keyframes': []}
+                    elif record['type'] == 'keyframe' and record['game'] in self.index:
+                        self.index[record['game']]['keyframes'].append((record['turn'], offset))
+                offset += len(line)
+
+    def games(self) -> List[int]:
+        """Ids of the games in the log, in the order they were started."""
+        return list(self.index)
+
+    def _read_at(self, f: Any, offset: int) -> Dict[str, Any]:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def new_game(self, game_id: int) -> Game:
+        """A game with the logged game's settings and board layout, at its starting position."""
+        with open(self.path, 'rb') as f:
+            header = self._read_at(f, self.index[game_id]['header'])
+        settings = _settings_from_dict(header['settings'])
+        game = Game(settings, header['no_players'], board_style=header['style'], shuffle=False)
+        cards = [BoardCard(name, card_type, max_employees) for name, card_type, max_employees in header['layout']]
+        game.board = Board(settings, header['no_players'], style=header['style'], cards=cards)
+        return game
+
+    def records(self, game_id: int, offset: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the records of a game, from its header or from a file offset within it."""
+        with open(self.path, 'rb') as f:
+            f.seek(self.index[game_id]['header'] if offset is None else offset)
+            for line in f:
+                record = _decode_record(line)
+                if record is not None and record['game'] == game_id:
+                    yield record
+                    if record['type'] == 'end':
+                        return
+
+    def game_at(self, game_id: int, turn: int) -> Game:
+        """Reconstruct a logged game at the start of a turn.
+
+        Args:
+            game_id: Id of the game in the log
+            turn: Turn to stop at; the moves of earlier turns are applied
+
+        Returns:
+            New Game in the logged position, with turn_number set to turn,
+            or to the last turn if the logged game ended earlier
+        """
+        keyframes = [(t, offset) for t, offset in self.index[game_id]['keyframes'] if t <= turn]
+        if not keyframes:
+            raise ValueError(f'game {game_id} was not logged from turn {turn}')
+        keyframe_turn, offset = keyframes[-1]
+        game = self.new_game(game_id)
+        building_cards = {card_type: stack[0] for card_type, stack in game.building_cards.items()}
+        game.turn_number = turn
+        for record in self.records(game_id, offset):
+            if record['type'] == 'keyframe' and record['turn'] == keyframe_turn:
+                decode(base64.b64decode(record['state'])).restore(game.board, building_cards)
+            elif record['turn'] >= turn:
+                break
+            elif record['type'] == 'move':
+                decode_move(record['move'], game).apply(game.board)
+            elif record['type'] == 'end':
+                game.turn_number = record['turn']
+        return game
+
+    def moves(self, game_id: int) -> Iterator[Tuple[int, List]]:
+        """Stream the (turn, encoded move) pairs of a game, see decode_move."""
+        for record in self.records(game_id):
+            if record['type'] == 'move':
+                yield record['turn'], record['move']
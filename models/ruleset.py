@@ -0,0 +1,64 @@
+"""Placement and employee rules compiled into per-cell lookup tables."""
+from typing import List, Dict, Tuple
+from .settings import Settings
+from .board_card import BoardCard
+
+class Ruleset:
+    """The static move rules of one board layout.
+
+    Cells are numbered by card index and sets of cells are int bitboards with
+    bit k set for card index k; every supported board has at most 36 cells,
+    so a bitboard fits in 64 bits. Boards keep their occupancy and legal move
+    cells as plain ints, update them with a few bit operations and count
+    neighbours with popcounts.
+
+    Attributes:
+        locations: (row, col) of each card index
+        cells: Flat location, row * width + col, of each card index
+        bits: Bit of each (row, col) location
+        neighbour_masks: Bitboard of the up, right, down and left neighbours
+            of each (row, col) location that are on the board
+        max_employees: Employee capacity of each card index
+        allowed_cells: Cells each building type may be placed on, from the
+            Settings *_allowed_on lists
+        allowed_types: Building types that may be placed on each card index
+    """
+
+    building_types = ['buy_market', 'sell_market', 'process', 'hq']
+
+    def __init__(self, game_settings: Settings, card_array: List[List[BoardCard]], card_index_to_location: Dict[int, Tuple[int, int]]) -> None:
+        """Compile the rules for a board layout.
+
+        Args:
+            game_settings: Game settings with the placement rules
+            card_array: Board card on each location
+            card_index_to_location: Location of each card index
+        """
+        width = len(card_array[0])
+        self.locations = [card_index_to_location[ind] for ind in range(len(card_index_to_location))]
+        self.cells = [i * width + j for (i, j) in self.locations]
+        self.bits = {loc: 1 << ind for ind, loc in enumerate(self.locations)}
+        self.neighbour_masks = {(i, j): sum(self.bits.get(n, 0) for n in [(i-1,j),(i,j+1),(i+1,j),(i,j-1)]) for (i, j) in self.locations}
+        self.max_employees = [card_array[i][j].max_employees for (i, j) in self.locations]
+        allowed_on = {
+            'buy_market': game_settings.buy_market_allowed_on,
+            'sell_market': game_settings.sell_market_allowed_on,
+            'process': game_settings.process_allowed_on,
+            'hq': game_settings.hq_allowed_on,
+        }
+        self.allowed_cells = {t: sum(1 << ind for ind, (i, j) in enumerate(self.locations) if card_array[i][j].card_type in allowed_on[t])
+                              for t in self.building_types}
+        self.allowed_types = [frozenset(t for t in self.building_types if card_array[i][j].card_type in allowed_on[t]) for (i, j) in self.locations]
+
+    def locations_of(self, cells: int) -> List[Tuple[int, int]]:
+        """(row, col) of every cell in a bitboard, in card index order."""
+        locations = []
+        while cells:
+            bit = cells & -cells
+            cells ^= bit
+            locations.append(self.locations[bit.bit_length() - 1])
+        return locations
+
+    def __deepcopy__(self, memo: Dict) -> 'Ruleset':
+        """The rules never change once compiled, so copies share them."""
+        return self
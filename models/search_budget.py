@@ -0,0 +1,37 @@
+"""Wall-clock and node budgets for anytime searches."""
+from typing import Optional
+import time
+
+class SearchBudgetExceeded(Exception):
+    """Raised inside a search when its budget runs out."""
+
+
+class SearchBudget:
+    """Limits a search by elapsed time, evaluated moves, or both."""
+
+    def __init__(self, time_limit: Optional[float] = None, node_limit: Optional[int] = None) -> None:
+        """Initialize the budget.
+
+        Args:
+            time_limit: Seconds the search may run for, None for no limit
+            node_limit: Moves the search may evaluate, None for no limit
+        """
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.deadline = None
+        self.enforced = True
+
+    def start(self) -> None:
+        """Start the clock."""
+        self.deadline = time.perf_counter() + self.time_limit if self.time_limit is not None else None
+
+    def exhausted(self, node_count: int) -> bool:
+        """Whether the budget has run out after node_count evaluated moves."""
+        if self.node_limit is not None and node_count >= self.node_limit:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def check(self, node_count: int) -> None:
+        """Raise SearchBudgetExceeded if the budget is enforced and has run out."""
+        if self.enforced and self.exhausted(node_count):
+            raise SearchBudgetExceeded()
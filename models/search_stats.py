@@ -0,0 +1,156 @@
+"""Counters, timers and event tracing for the move search."""
+from typing import List, Dict, Optional, Any, Callable
+from collections import deque
+import json
+
+class SearchTracer:
+    """Bounded ring buffer of search events.
+
+    Once the buffer is full each new event drops the oldest one, so tracing a
+    long search costs a fixed amount of memory and keeps its last events.
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        """Initialize the tracer.
+
+        Args:
+            capacity: Largest number of events kept
+        """
+        self.events: deque = deque(maxlen=capacity)
+        self.recorded = 0
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    @property
+    def dropped(self) -> int:
+        """Number of events pushed out of the buffer."""
+        return self.recorded - len(self.events)
+
+    def record(self, event: str, depth: int, move: Any = None, net: Optional[float] = None) -> None:
+        """Add an event.
+
+        Args:
+            event: Event name, e.g. 'move', 'leaf', 'cutoff', 'tt_hit' or 'best'
+            depth: Search depth the event happened at
+            move: Move the event concerns, if any
+            net: Net or bound the event concerns, if any
+        """
+        self.events.append((self.recorded, event, depth, move, net))
+        self.recorded += 1
+
+    def to_list(self, describe: Callable[[Any], str] = str) -> List[Dict[str, Any]]:
+        """Kept events as dictionaries, oldest first.
+
+        Args:
+            describe: Turns a recorded move into a string; the search records
+                move codes, which models.move_codes.to_game_move can expand
+
+        Returns:
+            List of events with 'seq', 'event', 'depth', 'move' and 'net' keys
+        """
+        return [{'seq': seq, 'event': event, 'depth': depth, 'move': describe(move) if move is not None else None, 'net': net}
+                for seq, event, depth, move, net in self.events]
+
+    def export(self, path: str, describe: Callable[[Any], str] = str) -> None:
+        """Write the kept events to a JSON lines file, see to_list."""
+        with open(path, 'w') as f:
+            for event in self.to_list(describe):
+                f.write(json.dumps(event) + '\n')
+
+    def clear(self) -> None:
+        """Remove all events."""
+        self.events.clear()
+        self.recorded = 0
+
+
+class SearchStats:
+    """What a search did and where its time went.
+
+    Counters are always collected. Section timers are only read when timing
+    is on, and events are only recorded when a tracer is attached, so an
+    untimed, untraced search pays for little more than the counters.
+
+    Attributes:
+        nodes_by_depth: Positions visited at each depth, the root being depth 0
+        expanded: Positions whose moves were generated
+        moves_generated: Moves generated over all expanded positions
+        cutoffs: Subtrees skipped by branch-and-bound pruning
+        tt_hits: Transposition table probes that found the position
+        tt_misses: Transposition table probes that did not
+        tt_stores: Positions stored in the transposition table
+        times: Seconds spent generating and validating moves ('generate'),
+            applying and reverting moves ('apply') and evaluating nets
+            ('evaluate')
+    """
+
+    sections = ['generate', 'apply', 'evaluate']
+
+    def __init__(self, timing: bool = False, tracer: Optional[SearchTracer] = None) -> None:
+        """Initialize empty statistics.
+
+        Args:
+            timing: Time each section of the search
+            tracer: Optional tracer to record search events in
+        """
+        self.timing = timing
+        self.tracer = tracer
+        self.nodes_by_depth: List[int] = []
+        self.expanded = 0
+        self.moves_generated = 0
+        self.cutoffs = 0
+        self.tt_hits = 0
+        self.tt_misses = 0
+        self.tt_stores = 0
+        self.times: Dict[str, float] = {section: 0.0 for section in self.sections}
+
+    def visit(self, depth: int) -> None:
+        """Count a position visited at a depth."""
+        while len(self.nodes_by_depth) <= depth:
+            self.nodes_by_depth.append(0)
+        self.nodes_by_depth[depth] += 1
+
+    @property
+    def nodes(self) -> int:
+        """Positions visited in total."""
+        return sum(self.nodes_by_depth)
+
+    @property
+    def branching_factor(self) -> float:
+        """Mean number of moves generated per expanded position."""
+        return self.moves_generated / self.expanded if self.expanded else 0.0
+
+    def merge(self, other: 'SearchStats') -> None:
+        """Add the counters and times of another search, e.g. a parallel worker's."""
+        for depth, count in enumerate(other.nodes_by_depth):
+            while len(self.nodes_by_depth) <= depth:
+                self.nodes_by_depth.append(0)
+            self.nodes_by_depth[depth] += count
+        self.expanded += other.expanded
+        self.moves_generated += other.moves_generated
+        self.cutoffs += other.cutoffs
+        self.tt_hits += other.tt_hits
+        self.tt_misses += other.tt_misses
+        self.tt_stores += other.tt_stores
+        for section, seconds in other.times.items():
+            self.times[section] += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary of the statistics, safe to dump as JSON."""
+        return {
+            'nodes': self.nodes,
+            'nodes_by_depth': list(self.nodes_by_depth),
+            'expanded': self.expanded,
+            'branching_factor': self.branching_factor,
+            'cutoffs': self.cutoffs,
+            'tt_hits': self.tt_hits,
+            'tt_misses': self.tt_misses,
+            'tt_stores': self.tt_stores,
+            'times': dict(self.times) if self.timing else None,
+        }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # tracers stay in the process that recorded them
+        state = dict(self.__dict__)
+        state['tracer'] = None
+        return state
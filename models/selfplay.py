@@ -0,0 +1,160 @@
+"""Headless self-play of complete games, run in batches from the command line.
+
+Example:
+    python -m models.selfplay --games 1000 --players 3 --style diamond --depth 3 --output results.jsonl
+
+Each finished game is written to the output file as one JSON line as soon as
+it completes. Games already in the output file with the same seed and
+configuration are skipped, so an interrupted batch can be resumed by running
+the same command again, and batches of other configurations can share a file.
+"""
+from typing import List, Dict, Optional, Iterator, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import inspect
+import json
+import os
+import random
+import time
+from models.settings import Settings
+from models.game import Game
+from models.mcts_player import MCTSPlayer
+from models.adversarial_player import AdversarialPlayer
+from models.position_cache import PositionCache
+
+STRATEGIES = ['search', 'mcts', 'paranoid', 'maxn']
+# arguments of play_selfplay_game written to each result, which together with
+# the seed identify a game when resuming
+CONFIG_FIELDS = ['no_players', 'board_style', 'max_depth', 'strategy', 'iterations']
+
+def play_selfplay_game(seed: int, no_players: int = 2, board_style: str = 'rectangle', max_depth: int = 2,
+                       strategy: str = 'search', iterations: int = 200, game_settings: Optional[Settings] = None,
+                       position_cache: Optional[str] = None) -> Dict[str, Any]:
+    """Play one complete game with every player controlled by its AI.
+
+    Args:
+        seed: Seed for the board layout and any randomised players
+        no_players: Number of players
+        board_style: Board layout style
+        max_depth: Look-ahead depth of each move search
+        strategy: 'search' for Player.find_best_move with pruning, 'mcts' for MCTSPlayer,
+            'paranoid' or 'maxn' for AdversarialPlayer in that mode, whose
+            max_depth counts the moves of every player
+        iterations: MCTS iterations per move, only used by the 'mcts' strategy
+        game_settings: Settings to play with, defaults to Settings()
+        position_cache: Optional PositionCache database file shared by the
+            searches of every game, only used by the 'search' strategy
+
+    Returns:
+        Dictionary describing the game and its result, safe to dump as JSON
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of {STRATEGIES}")
+    random.seed(seed)
+    start = time.perf_counter()
+    game = Game(game_settings or Settings(), no_players, board_style=board_style)
+    if strategy == 'mcts':
+        game.players = [MCTSPlayer(p, game.game_settings, seed=seed * no_players + p) for p in range(no_players)]
+        result = game.play_game(max_depth, iterations=iterations)
+    elif strategy in ['paranoid', 'maxn']:
+        game.players = [AdversarialPlayer(p, game.game_settings, mode=strategy) for p in range(no_players)]
+        result = game.play_game(max_depth)
+    elif position_cache is not None:
+        with PositionCache(position_cache) as cache:
+            result = game.play_game(max_depth, prune=True, position_cache=cache)
+    else:
+        result = game.play_game(max_depth, prune=True)
+    return {
+        'seed': seed,
+        'no_players': no_players,
+        'board_style': board_style,
+        'max_depth': max_depth,
+        'strategy': strategy,
+        'iterations': iterations,
+        'nets': result['nets'],
+        'winners': result['winners'],
+        'moves': [[str(move) if move is not None else None for move in turn] for turn in result['turns']],
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+def game_config(**game_kwargs) -> Dict[str, Any]:
+    """Values of CONFIG_FIELDS for games played with some play_selfplay_game arguments."""
+    arguments = inspect.signature(play_selfplay_game).bind(0, **game_kwargs)
+    arguments.apply_defaults()
+    return {field: arguments.arguments[field] for field in CONFIG_FIELDS}
+
+def completed_seeds(output_path: str, **game_kwargs) -> set:
+    """Seeds of the games already written to a results file with the configuration of game_kwargs."""
+    if not os.path.exists(output_path):
+        return set()
+    config = game_config(**game_kwargs)
+    seeds = set()
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if all(record.get(field) == value for field, value in config.items()):
+                    seeds.add(record['seed'])
+            except (ValueError, KeyError, AttributeError):
+                continue # partly written last line of an interrupted run
+    return seeds
+
+def run_selfplay(no_games: int, output_path: str, first_seed: int = 0, max_workers: Optional[int] = None,
+                 **game_kwargs) -> Iterator[Dict[str, Any]]:
+    """Play a batch of games across worker processes, streaming results to disk.
+
+    Games are seeded first_seed, first_seed + 1, ... and games whose seed is
+    already in the output file with the same CONFIG_FIELDS are not played
+    again. Results are appended in
+    the order the games finish.
+
+    Args:
+        no_games: Number of games in the batch
+        output_path: JSON lines file to append results to
+        first_seed: Seed of the first game
+        max_workers: Number of worker processes, defaults to the CPU count
+        **game_kwargs: Further arguments for play_selfplay_game
+
+    Yields:
+        The result of each game as it is written
+    """
+    done = completed_seeds(output_path, **game_kwargs)
+    seeds = [seed for seed in range(first_seed, first_seed + no_games) if seed not in done]
+    if not seeds:
+        return
+    with ProcessPoolExecutor(max_workers) as executor, open(output_path, 'a') as f:
+        futures = [executor.submit(play_selfplay_game, seed, **game_kwargs) for seed in seeds]
+        for future in as_completed(futures):
+            result = future.result()
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            yield result
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description='Play batches of AI self-play games.')
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--players', type=int, default=2, help='number of players in each game')
+    parser.add_argument('--style', default='rectangle', help='board layout style')
+    parser.add_argument('--depth', type=int, default=2, help='look-ahead depth of each move search')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='search', help='player AI')
+    parser.add_argument('--iterations', type=int, default=200, help='MCTS iterations per move')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the CPU count')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--output', default='selfplay.jsonl', help='JSON lines file to append results to')
+    parser.add_argument('--position-cache', default=None, help='SQLite file of search results shared between runs')
+    args = parser.parse_args(argv)
+
+    wins = [0] * args.players
+    played = 0
+    for result in run_selfplay(args.games, args.output, args.seed, args.workers, no_players=args.players,
+                               board_style=args.style, max_depth=args.depth, strategy=args.strategy,
+                               iterations=args.iterations, position_cache=args.position_cache):
+        played += 1
+        for p in result['winners']:
+            wins[p] += 1
+        print(f"game {played}: seed {result['seed']} nets {result['nets']} ({result['seconds']}s)", flush=True)
+    print(f"played {played} games, wins by player: {wins}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Compact versioned binary snapshots of the mutable game state.
+
+A snapshot holds only what changes during a game: every player's building
+type codes and employee counts in card index order, their prices, the turn
+number and optionally the state of the global random generator. The static
+layout (settings, board cards, mask) is not included; it is identified by a
+checksum so a snapshot is only restored onto a board with the same layout.
+
+Layout, little-endian:
+
+    header   16 bytes: magic b'BSNP', version, flags, players, cells,
+             turn number (uint16), layout checksum (uint32), reserved
+    rng      2504 bytes if flags & HAS_RNG: 625 uint32 Mersenne Twister
+             words and index, float64 gauss_next (NaN for None)
+    body     buildings (players x cells uint8), employees (players x cells
+             uint8), buy prices (players uint8), sell prices (players uint8)
+
+decode reads the arrays as NumPy views of the buffer, without copying.
+"""
+from typing import Dict, Optional, Tuple, Any
+import random
+import struct
+import zlib
+import numpy as np
+from .board import Board
+from .building_card import BuildingCard, BUILDING_TYPE_CODES, BUILDING_CODE_TYPES
+
+MAGIC = b'BSNP'
+SNAPSHOT_VERSION = 1
+HAS_RNG = 1
+HEADER = struct.Struct('<4sBBBBHIH')
+RNG_WORDS = 625
+RNG_SIZE = RNG_WORDS * 4 + 8
+
+def layout_checksum(board: Board) -> int:
+    """32-bit checksum of a board's static layout."""
+    layout = ','.join([board.style] + [f'{card.card_type}:{card.max_employees}' for card in board.cards])
+    return zlib.crc32(layout.encode())
+
+def encode_board(board: Board, turn_number: int = 0, rng_state: Optional[Tuple] = None) -> bytes:
+    """Encode the mutable state of a board.
+
+    Args:
+        board: Board to encode
+        turn_number: Turn number to store with the state
+        rng_state: Optional random.getstate() result to store with the state
+
+    Returns:
+        Snapshot bytes
+    """
+    locations = board.rules.locations
+    no_players, no_cells = board.no_players, len(locations)
+    buildings = np.array([[BUILDING_TYPE_CODES[board.player_bud_arrays[p][i][j].card_type] for (i, j) in locations]
+                          for p in range(no_players)], dtype=np.uint8)
+    employees = np.array([[board.player_emp_arrays[p][i][j] for (i, j) in locations] for p in range(no_players)], dtype=np.uint8)
+    prices = np.array([list(board.player_buy_prices), list(board.player_sell_prices)], dtype=np.uint8)
+
+    parts = [HEADER.pack(MAGIC, SNAPSHOT_VERSION, HAS_RNG if rng_state is not None else 0, no_players, no_cells,
+                         turn_number, layout_checksum(board), 0)]
+    if rng_state is not None:
+        _, words, gauss_next = rng_state
+        parts.append(np.array(words, dtype='<u4').tobytes())
+        parts.append(struct.pack('<d', float('nan') if gauss_next is None else gauss_next))
+    parts += [buildings.tobytes(), employees.tobytes(), prices.tobytes()]
+    return b''.join(parts)
+
+def encode_game(game: Any, include_rng: bool = True) -> bytes:
+    """Encode the mutable state of a game: its board, turn number and, optionally, the global random state.
+
+    Args:
+        game: Game to encode
+        include_rng: Store random.getstate() so a restored game draws the same numbers
+
+    Returns:
+        Snapshot bytes
+    """
+    return encode_board(game.board, game.turn_number, random.getstate() if include_rng else None)
+
+
+class Snapshot:
+    """A decoded snapshot whose arrays are views into the encoded buffer.
+
+    Attributes:
+        version: Format version the snapshot was written with
+        turn_number: Stored turn number
+        checksum: Layout checksum of the encoded board
+        buildings: Building type codes, shape (players, cells)
+        employees: Employee counts, shape (players, cells)
+        buy_prices: Buy price of each player
+        sell_prices: Sell price of each player
+        rng_state: Stored random.getstate() result, or None
+    """
+
+    def __init__(self, buffer: Any) -> None:
+        """Decode a snapshot without copying its arrays.
+
+        Args:
+            buffer: bytes, bytearray, memoryview or NumPy array holding the snapshot
+
+        Raises:
+            ValueError: If the buffer is not a snapshot of a supported version
+        """
+        view = memoryview(buffer).cast('B')
+        if len(view) < HEADER.size:
+            raise ValueError('buffer too short for a snapshot header')
+        magic, self.version, flags, no_players, no_cells, self.turn_number, self.checksum, _ = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('not a board snapshot')
+        if self.version != SNAPSHOT_VERSION:
+            raise ValueError(f'unsupported snapshot version {self.version}, expected {SNAPSHOT_VERSION}')
+
+        offset, self.rng_state = HEADER.size, None
+        if flags & HAS_RNG:
+            words = np.frombuffer(view, dtype='<u4', count=RNG_WORDS, offset=offset)
+            gauss_next = struct.unpack_from('<d', view, offset + RNG_WORDS * 4)[0]
+            self.rng_state = (3, tuple(words.tolist()), None if gauss_next != gauss_next else gauss_next)
+            offset += RNG_SIZE
+        if len(view) != offset + 2 * no_players * no_cells + 2 * no_players:
+            raise ValueError('snapshot length does not match its header')
+
+        self.buildings = np.frombuffer(view, dtype=np.uint8, count=no_players * no_cells, offset=offset).reshape(no_players, no_cells)
+        offset += no_players * no_cells
+        self.employees = np.frombuffer(view, dtype=np.uint8, count=no_players * no_cells, offset=offset).reshape(no_players, no_cells)
+        offset += no_players * no_cells
+        self.buy_prices = np.frombuffer(view, dtype=np.uint8, count=no_players, offset=offset)
+        self.sell_prices = np.frombuffer(view, dtype=np.uint8, count=no_players, offset=offset + no_players)
+
+    def to_state(self) -> Tuple[Tuple, Tuple, Tuple, Tuple]:
+        """The snapshot in the format of Board.get_state."""
+        building_types = tuple(tuple(BUILDING_CODE_TYPES[code] for code in row) for row in self.buildings.tolist())
+        employees = tuple(tuple(row) for row in self.employees.tolist())
+        return building_types, employees, tuple(self.buy_prices.tolist()), tuple(self.sell_prices.tolist())
+
+    def restore(self, board: Board, building_cards: Dict[str, BuildingCard]) -> None:
+        """Restore the snapshot onto a board with the same layout.
+
+        Args:
+            board: Board to restore into
+            building_cards: Card to place for each building type
+
+        Raises:
+            ValueError: If the board's layout differs from the encoded board's
+        """
+        if layout_checksum(board) != self.checksum or self.buildings.shape != (board.no_players, len(board.rules.locations)):
+            raise ValueError('snapshot was taken on a board with a different layout')
+        board.set_state(self.to_state(), building_cards)
+
+def decode(buffer: Any) -> Snapshot:
+    """Decode a snapshot, see Snapshot."""
+    return Snapshot(buffer)
+
+def restore_game(game: Any, buffer: Any) -> None:
+    """Restore a snapshot from encode_game onto a game with the same layout.
+
+    Sets the board state and turn number, and the global random state if the
+    snapshot holds one.
+
+    Args:
+        game: Game to restore into
+        buffer: Snapshot bytes or buffer
+    """
+    snapshot = decode(buffer)
+    snapshot.restore(game.board, {card_type: stack[0] for card_type, stack in game.building_cards.items()})
+    game.turn_number = snapshot.turn_number
+    if snapshot.rng_state is not None:
+        random.setstate(snapshot.rng_state)
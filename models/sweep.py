@@ -0,0 +1,144 @@
+"""Parameter sweeps over Settings, with results cached on disk."""
+from typing import List, Dict, Optional, Any, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields, replace
+import hashlib
+import itertools
+import json
+import os
+from models.settings import Settings
+from models.selfplay import play_selfplay_game
+
+# bump when a change to the rules or the AI changes game results, so cached
+# sweep points are computed again
+ENGINE_VERSION = '1'
+
+# Settings fields the engine never reads (Board.calc_player_net uses unit
+# costs), so sweeping them would only play the same games again
+UNUSED_FIELDS = ['base_emp_value', 'emp_cost', 'bud_cost', 'player_starting_cap']
+
+def expand_grid(base: Optional[Settings] = None, **ranges: Iterable) -> List[Settings]:
+    """Expand ranges of Settings fields into every combination.
+
+    Args:
+        base: Settings the grid points start from, defaults to Settings()
+        **ranges: Values to try for each Settings field, e.g. no_of_turns_in_game=[8, 12]
+
+    Returns:
+        List of Settings, one per combination, the last field varying fastest
+
+    Raises:
+        ValueError: If a field is not a Settings field or is in UNUSED_FIELDS
+    """
+    base = base or Settings()
+    names = {f.name for f in fields(Settings)}
+    unknown = [name for name in ranges if name not in names]
+    if unknown:
+        raise ValueError(f"unknown Settings fields {unknown}")
+    unused = [name for name in ranges if name in UNUSED_FIELDS]
+    if unused:
+        raise ValueError(f"Settings fields {unused} do not change game results")
+    keys = list(ranges)
+    return [replace(base, **dict(zip(keys, values))) for values in itertools.product(*(list(ranges[k]) for k in keys))]
+
+def point_key(game_settings: Settings, **game_kwargs: Any) -> str:
+    """Stable hash of a sweep point.
+
+    Args:
+        game_settings: Settings of the point
+        **game_kwargs: Everything else that affects the results, e.g. number of games
+
+    Returns:
+        Hex digest that changes whenever the settings, arguments or engine version change
+    """
+    payload = json.dumps({'engine_version': ENGINE_VERSION, 'settings': asdict(game_settings), 'game': game_kwargs},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def summarise_games(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate self-play results into balance statistics.
+
+    Args:
+        results: Results from play_selfplay_game for the same settings
+
+    Returns:
+        Dictionary of the mean net and win rate of each seat, with ties
+        shared between the winners, the mean net over all seats and the
+        mean game length in seconds
+    """
+    no_games, no_players = len(results), len(results[0]['nets'])
+    mean_nets = [sum(r['nets'][p] for r in results) / no_games for p in range(no_players)]
+    win_rates = [sum(1 / len(r['winners']) for r in results if p in r['winners']) / no_games for p in range(no_players)]
+    return {
+        'no_games': no_games,
+        'mean_nets': mean_nets,
+        'win_rates': win_rates,
+        'mean_net': sum(mean_nets) / no_players,
+        'mean_seconds': sum(r['seconds'] for r in results) / no_games,
+    }
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f'{key}.json')
+
+def run_sweep(grid: List[Settings], no_games: int = 20, cache_dir: str = '.sweep_cache', max_workers: Optional[int] = None,
+              no_players: int = 2, board_style: str = 'rectangle', max_depth: int = 2, strategy: str = 'search',
+              iterations: int = 200, position_cache: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Simulate games for every point of a grid, reusing cached points.
+
+    The games of all uncached points are played in one process pool. Each
+    point is written to the cache as soon as its last game finishes, so an
+    interrupted sweep keeps the points it completed.
+
+    Args:
+        grid: Settings to evaluate, e.g. from expand_grid
+        no_games: Games played per point, seeded 0 to no_games - 1
+        cache_dir: Directory of cached point results
+        max_workers: Number of worker processes, defaults to the CPU count
+        no_players: Number of players
+        board_style: Board layout style
+        max_depth: Look-ahead depth of each move search
+        strategy: Player AI, see play_selfplay_game
+        iterations: MCTS iterations per move
+        position_cache: Optional PositionCache database file shared by every
+            game's searches; it does not change results, so it is not part
+            of the point keys
+
+    Returns:
+        List with a dictionary per grid point holding its settings, its
+        cache key, whether it came from the cache and its summarise_games
+        statistics, in grid order
+    """
+    game_kwargs = {'no_players': no_players, 'board_style': board_style, 'max_depth': max_depth,
+                   'strategy': strategy, 'iterations': iterations}
+    os.makedirs(cache_dir, exist_ok=True)
+    points, pending = [], {}
+    for game_settings in grid:
+        key = point_key(game_settings, no_games=no_games, **game_kwargs)
+        point = {'settings': asdict(game_settings), 'key': key, 'cached': os.path.exists(_cache_path(cache_dir, key))}
+        if point['cached']:
+            with open(_cache_path(cache_dir, key)) as f:
+                point['summary'] = json.load(f)['summary']
+        else:
+            pending.setdefault(key, (game_settings, []))
+        points.append(point)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers) as executor:
+            futures = {key: [executor.submit(play_selfplay_game, seed, game_settings=game_settings,
+                                             position_cache=position_cache, **game_kwargs)
+                             for seed in range(no_games)] for key, (game_settings, _) in pending.items()}
+            for key, key_futures in futures.items():
+                game_settings, results = pending[key]
+                results.extend(future.result() for future in key_futures)
+                summary = summarise_games(results)
+                # write then rename, so a killed sweep never leaves a partial entry
+                tmp_path = _cache_path(cache_dir, key) + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump({'engine_version': ENGINE_VERSION, 'settings': asdict(game_settings), 'game': game_kwargs,
+                               'no_games': no_games, 'summary': summary, 'results': results}, f)
+                os.replace(tmp_path, _cache_path(cache_dir, key))
+
+    for point in points:
+        if 'summary' not in point:
+            point['summary'] = summarise_games(pending[point['key']][1])
+    return points
@@ -0,0 +1,186 @@
+"""Zobrist hashing and transposition table for the move search."""
+from typing import Dict, List, Optional, Tuple, Any
+from functools import lru_cache
+import random
+
+MAX_PRICE = 10
+
+class ZobristKeys:
+    """Random 64-bit keys for every feature of the mutable board state.
+
+    A board hash is the XOR of the keys for its current features, so applying
+    or reverting a move only needs to XOR the keys of the features it changes.
+    """
+
+    building_types = ['buy_market', 'sell_market', 'process', 'hq']
+
+    def __init__(self, no_players: int, height: int, width: int, max_employees: int = 3, seed: int = 0) -> None:
+        """Generate the keys for a board.
+
+        Args:
+            no_players: Number of players
+            height: Number of rows in the board mask
+            width: Number of columns in the board mask
+            max_employees: Largest employee count a cell can hold
+            seed: Seed for the key generator, independent of the global random state
+        """
+        rng = random.Random(seed)
+        def key() -> int:
+            return rng.getrandbits(64)
+
+        self.building_keys = [[[{t: key() for t in self.building_types} for _ in range(width)] for _ in range(height)] for _ in range(no_players)]
+        # count 0 hashes to 0 so an empty cell contributes nothing
+        self.employee_keys = [[[[0] + [key() for _ in range(max_employees)] for _ in range(width)] for _ in range(height)] for _ in range(no_players)]
+        self.buy_price_keys = [[key() for _ in range(MAX_PRICE + 1)] for _ in range(no_players)]
+        self.sell_price_keys = [[key() for _ in range(MAX_PRICE + 1)] for _ in range(no_players)]
+        self.player_keys = [key() for _ in range(no_players)]
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def shared(cls, no_players: int, height: int, width: int, max_employees: int = 3, seed: int = 0) -> 'ZobristKeys':
+        """Keys for a board shape, generated once per process and shared by every board of that shape."""
+        return cls(no_players, height, width, max_employees, seed)
+
+    def __deepcopy__(self, memo: Dict) -> 'ZobristKeys':
+        """Keys are immutable once generated, so copies share them."""
+        return self
+
+    def building(self, player_ind: int, row: int, col: int, card_type: str) -> int:
+        """Key for a player's building type on a cell; 'none' hashes to 0."""
+        return self.building_keys[player_ind][row][col].get(card_type, 0)
+
+    def employees(self, player_ind: int, row: int, col: int, count: int) -> int:
+        """Key for a player's employee count on a cell."""
+        return self.employee_keys[player_ind][row][col][count]
+
+    def buy_price(self, player_ind: int, price: int) -> int:
+        """Key for a player's buy price."""
+        return self.buy_price_keys[player_ind][price]
+
+    def sell_price(self, player_ind: int, price: int) -> int:
+        """Key for a player's sell price."""
+        return self.sell_price_keys[player_ind][price]
+
+    def player(self, player_ind: int) -> int:
+        """Key for the player a search is evaluating the board for."""
+        return self.player_keys[player_ind]
+
+    def hash_board(self, board: Any) -> int:
+        """Compute the hash of a board from scratch.
+
+        Args:
+            board: Board to hash
+
+        Returns:
+            64-bit Zobrist hash of the board's mutable state
+        """
+        h = 0
+        for p in range(board.no_players):
+            for (i, j) in board.card_index_to_location.values():
+                card = board.player_bud_arrays[p][i][j]
+                if card != None:
+                    h ^= self.building(p, i, j, card.card_type)
+                h ^= self.employees(p, i, j, board.player_emp_arrays[p][i][j])
+            h ^= self.buy_price(p, board.player_buy_prices[p])
+            h ^= self.sell_price(p, board.player_sell_prices[p])
+        return h
+
+
+class TranspositionTable:
+    """Fixed size cache of searched positions.
+
+    Each bucket holds two entries: a depth-preferred slot that keeps the
+    entry with the most remaining search depth, and an always-replace slot
+    that takes whatever the depth-preferred slot rejects. Entries are keyed
+    by the board hash together with the remaining depth, because the best
+    net over exactly k more moves differs for each k.
+    """
+
+    def __init__(self, size: int = 2 ** 16) -> None:
+        """Initialize the table.
+
+        Args:
+            size: Number of buckets; the table holds at most 2 * size entries
+        """
+        if size < 1:
+            raise ValueError('transposition table size must be at least 1')
+        self.size = size
+        self.slots: List[Optional[Tuple[int, int, float, Any]]] = [None] * (2 * size)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def __len__(self) -> int:
+        """Number of occupied entries."""
+        return sum(1 for slot in self.slots if slot is not None)
+
+    def _bucket(self, key: int, depth: int) -> int:
+        return 2 * ((key ^ (depth * 0x9E3779B97F4A7C15)) % self.size)
+
+    def probe(self, key: int, depth: int) -> Optional[Tuple[float, Any]]:
+        """Look up a position.
+
+        Args:
+            key: Board hash
+            depth: Remaining search depth
+
+        Returns:
+            Tuple of (net, best move) if the position is cached, otherwise None
+        """
+        b = self._bucket(key, depth)
+        for slot in (self.slots[b], self.slots[b + 1]):
+            if slot is not None and slot[0] == key and slot[1] == depth:
+                self.hits += 1
+                return slot[2], slot[3]
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, net: float, best_move: Any) -> None:
+        """Cache the result of searching a position.
+
+        Args:
+            key: Board hash
+            depth: Remaining search depth
+            net: Best net found below the position
+            best_move: Move that leads to the best net
+        """
+        b = self._bucket(key, depth)
+        entry = (key, depth, net, best_move)
+        self.stores += 1
+        preferred = self.slots[b]
+        if preferred is None or depth >= preferred[1] or (preferred[0] == key and preferred[1] == depth):
+            target = b
+        else:
+            target = b + 1
+        existing = self.slots[target]
+        if existing is not None and (existing[0] != key or existing[1] != depth):
+            self.replacements += 1
+        self.slots[target] = entry
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        self.slots = [None] * (2 * self.size)
+        self.hits = self.misses = self.stores = self.replacements = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of probes that found a cached position."""
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Summary of table usage for sizing the table.
+
+        Returns:
+            Dictionary of hit, miss, store and replacement counts, hit rate and fill
+        """
+        return {
+            'size': 2 * self.size,
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'stores': self.stores,
+            'replacements': self.replacements,
+        }
@@ -1,7 +1,75 @@
 """Test suite for the game models."""
 
+import asyncio
+import copy
+import json
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
-from models import Settings, Board, Game, BuildingCard
+import numpy as np
+from models import Settings, Board, ArrayBoard, Game, BuildingCard, MCTSPlayer, AdversarialPlayer
+from models.game_move import GameMove
+from models.building_card import NO_BUILDING
+from models.transposition import TranspositionTable
+from models.move_ordering import MoveOrdering
+from models.search_budget import SearchBudget
+from models.evaluation import evaluate_moves
+from models.parallel import ParallelSearch
+from models.selfplay import play_selfplay_game, completed_seeds
+from models.sweep import expand_grid, run_sweep
+from models.search_stats import SearchStats, SearchTracer
+from models.snapshot import encode_board, encode_game, decode, restore_game
+from models.replay import ReplayWriter, ReplayReader
+from models.position_cache import PositionCache, position_key
+from models.match_server import MatchServer
+from models.layouts import generate_layouts, score_layouts, start_net_table, to_board, BOARD_CODE_TYPES
+from models.move_codes import generate_move_codes, to_game_move, from_game_move, apply_code, revert_code
+
+
+def board_state(board):
+    """Snapshot the mutable parts of a board for comparisons."""
+    return (
+        [[[int(v) for v in row] for row in arr] for arr in board.player_mask_arrays],
+        [[[card.card_type for card in row] for row in arr] for arr in board.player_bud_arrays],
+        [[[int(v) for v in row] for row in arr] for arr in board.player_emp_arrays],
+        [int(v) for v in board.player_buy_prices],
+        [int(v) for v in board.player_sell_prices],
+    )
+
+
+def play_random_moves(game, cards, no_turns, seed):
+    """Advance a game by applying seeded random moves for every player."""
+    rng = random.Random(seed)
+    for _ in range(no_turns):
+        for player in game.players:
+            moves = player._generate_possible_moves(game.board, cards)
+            builds = [m for m in moves if m.move_type == 'build'] or moves
+            rng.choice(builds).apply(game.board)
+
+
+class PositionTestCase(unittest.TestCase):
+    """Base for tests that start from a seeded game advanced by random moves.
+
+    setUp creates self.game with no_players players on a layout seeded with
+    layout_seed, draws self.cards and applies random_turns turns of random
+    moves seeded with moves_seed.
+    """
+
+    no_players = 2
+    layout_seed = 0
+    random_turns = 3
+    moves_seed = 1
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        random.seed(self.layout_seed)
+        self.game = Game(Settings(), no_players=self.no_players)
+        self.cards = self.game.get_turn_building_cards(False, 4)
+        play_random_moves(self.game, self.cards, self.random_turns, seed=self.moves_seed)
+
 
 class TestSettings(unittest.TestCase):
     """Test cases for the Settings class."""
@@ -34,6 +102,50 @@ class TestBoard(unittest.TestCase):
         net = self.board.calc_player_net(0)
         self.assertIsInstance(net, (int, float))
 
+    def test_neighbour_masks(self):
+        """Test that the neighbour bitboards hold the on-board neighbours of every cell."""
+        for style in ['rectangle', 'diamond', 'linear']:
+            for no_players in [1, 4]:
+                board = Board(self.settings, no_players, style=style)
+                for loc in board.card_index_to_location.values():
+                    expected = [n for n in board.neighbours[loc] if n in board.location_to_card_index]
+                    self.assertEqual(board.rules.locations_of(board.rules.neighbour_masks[loc]), sorted(expected, key=board.location_to_card_index.get))
+
+
+class TestArrayBoard(PositionTestCase):
+    """Test cases for the ArrayBoard class."""
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        super().setUp()
+        self.board = ArrayBoard.from_board(self.game.board)
+
+    def test_matches_board(self):
+        """Test that a converted board has the same state, hash and totals."""
+        self.assertEqual(str(self.board), str(self.game.board))
+        self.assertEqual(board_state(self.board), board_state(self.game.board))
+        self.assertEqual(self.board.zobrist_hash, self.game.board.zobrist_hash)
+        self.assertEqual(self.board.player_totals, self.game.board.player_totals)
+        self.assertEqual(self.board.bud_codes.dtype, np.int8)
+
+    def test_find_best_move_matches_board(self):
+        """Test that the search gives the same result on both representations."""
+        player = self.game.players[1]
+        expected = player.find_best_move(self.game.board, self.cards, max_depth=2)
+        result = player.find_best_move(self.board, self.cards, max_depth=2)
+        self.assertEqual((str(result[0]), result[1], result[2]), (str(expected[0]), expected[1], expected[2]))
+
+    def test_copy_is_independent(self):
+        """Test that copies share the layout but not the mutable state."""
+        board_copy = self.board.copy()
+        self.assertIs(board_copy.card_array, self.board.card_array)
+        before = board_state(self.board)
+        for move in self.game.players[0]._generate_possible_moves(board_copy, self.cards):
+            move.apply(board_copy)
+        self.assertEqual(board_state(self.board), before)
+        for p in range(board_copy.no_players):
+            self.assertEqual(board_copy.player_totals[p], board_copy.calc_player_totals(p))
+
 
 class TestGame(unittest.TestCase):
     """Test cases for the Game class."""
@@ -58,6 +170,67 @@ class TestGame(unittest.TestCase):
         self.assertIn('process', self.game.building_cards)
         self.assertIn('hq', self.game.building_cards)
 
+    def test_building_cards_are_shared(self):
+        """Test that decks are stacks of one shared card and games share definitions."""
+        stack = self.game.building_cards['process']
+        self.assertEqual(len(stack), 100)
+        self.assertIs(stack[0], stack[-1])
+        self.assertEqual(len(stack[:10]), 10)
+        with self.assertRaises(IndexError):
+            stack[100]
+        self.assertEqual(stack.draw(3), [stack.card] * 3)
+        self.assertEqual(len(stack.materialise()), 97)
+        other = Game(self.settings, no_players=2)
+        self.assertIs(other.building_cards['process'][0].values, stack.card.values)
+        self.assertIs(other.board.zobrist, self.game.board.zobrist)
+        board_copy = copy.deepcopy(self.game.board)
+        self.assertIs(board_copy.cards[0], self.game.board.cards[0])
+        # sharing is only safe because cards cannot be changed
+        with self.assertRaises(AttributeError):
+            board_copy.cards[0].card_type = 'farm'
+        with self.assertRaises(AttributeError):
+            del stack.card.name
+        self.assertEqual(copy.copy(stack.card).values, stack.card.values)
+
+    def test_headless_import(self):
+        """Test that simulating a game does not import the rendering libraries or the position cache's sqlite3."""
+        code = ("import sys; from models import Game, Settings; Game(Settings(), 2).play_turn(1); "
+                "print(','.join(m for m in ['matplotlib', 'pandas', 'pyfonts', 'sqlite3'] if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+    def test_play_game(self):
+        """Test that a game is played to its last turn with a move per player per turn."""
+        self.settings.no_of_turns_in_game = 4
+        result = self.game.play_game(max_depth=2, prune=True)
+        self.assertEqual(self.game.turn_number, 4)
+        self.assertEqual([len(turn) for turn in result['turns']], [2, 2, 2, 2])
+        self.assertEqual(result['nets'], [self.game.board.calc_player_net(p) for p in range(2)])
+        self.assertEqual(result['winners'], [p for p in range(2) if result['nets'][p] == max(result['nets'])])
+
+    def test_selfplay_game_is_reproducible(self):
+        """Test that a self-play game is JSON serialisable and determined by its seed."""
+        settings = Settings(no_of_turns_in_game=3)
+        first = play_selfplay_game(5, max_depth=2, game_settings=settings)
+        second = play_selfplay_game(5, max_depth=2, game_settings=settings)
+        self.assertEqual(json.loads(json.dumps(first))['moves'], second['moves'])
+        self.assertEqual(first['nets'], second['nets'])
+
+    def test_completed_seeds_match_the_configuration(self):
+        """Test that resuming only skips games played with the same configuration."""
+        settings = Settings(no_of_turns_in_game=1)
+        records = [play_selfplay_game(0, game_settings=settings), play_selfplay_game(1, max_depth=1, game_settings=settings),
+                   play_selfplay_game(2, strategy='mcts', iterations=10, game_settings=settings)]
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = f'{out_dir}/selfplay.jsonl'
+            with open(path, 'w') as f:
+                f.write(''.join(json.dumps(record) + '\n' for record in records) + '{"seed": 3, "no_pl')
+            self.assertEqual(completed_seeds(path), {0})
+            self.assertEqual(completed_seeds(path, max_depth=1), {1})
+            self.assertEqual(completed_seeds(path, strategy='mcts', iterations=10), {2})
+            self.assertEqual(completed_seeds(path, strategy='mcts'), set())
+            self.assertEqual(completed_seeds(path, no_players=3, board_style='diamond'), set())
+
 
 class TestBuildingCard(unittest.TestCase):
     """Test cases for the BuildingCard class."""
@@ -107,6 +280,724 @@ class TestBuildingCard(unittest.TestCase):
         self.assertEqual(len(y_values), 3)
         self.assertGreaterEqual(values[1][1], 0)
 
+    def test_dense_value_lookups(self):
+        """Test that dense lookups match the value dictionary, clamped to its range."""
+        card = BuildingCard('Sell Market', 'sell_market')
+        self.assertEqual(card.get_value(3, 5), card.values[3][5])
+        self.assertEqual(card.get_value(0, 2), card.values[2][2])
+        self.assertEqual(card.get_value(9, 40), card.values[5][10])
+        with self.assertRaises(KeyError):
+            card.get_value(2, 3) # gap in the table
+        x, y = np.array([3, 0, 9, 2]), np.array([5, 2, 40, 3])
+        self.assertEqual(list(card.get_values(x, y)), [card.values[3][5], card.values[2][2], card.values[5][10], card.values[2][2]])
+        self.assertIs(BuildingCard('Other', 'sell_market').value_array, card.value_array)
+        self.assertFalse(card.value_array.flags.writeable)
+
+
+class TestGameMove(PositionTestCase):
+    """Test cases for the GameMove class."""
+
+    def test_revert_restores_board(self):
+        """Test that reverting every possible move restores the board."""
+        board = self.game.board
+        before = board_state(board)
+        for player in self.game.players:
+            for move in player._generate_possible_moves(board, self.cards):
+                move.apply(board)
+                self.assertNotEqual(board_state(board), before)
+                move.revert(board)
+                self.assertEqual(board_state(board), before)
+
+    def test_revert_without_apply_fails(self):
+        """Test that reverting a build that is not applied raises instead of clearing the location."""
+        board = self.game.board
+        before = board_state(board)
+        move = next(move for move in self.game.players[0]._generate_possible_moves(board, self.cards) if move.move_type == 'build')
+        with self.assertRaises(ValueError):
+            move.revert(board)
+        move.apply(board)
+        move.revert(board)
+        with self.assertRaises(ValueError):
+            move.revert(board)
+        self.assertEqual(board_state(board), before)
+
+    def test_zobrist_hash_is_incremental(self):
+        """Test that apply and revert keep the Zobrist hash up to date."""
+        board = self.game.board
+        start_hash = board.zobrist_hash
+        self.assertEqual(start_hash, board.zobrist.hash_board(board))
+        for move in self.game.players[1]._generate_possible_moves(board, self.cards):
+            move.apply(board)
+            self.assertEqual(board.zobrist_hash, board.zobrist.hash_board(board))
+            self.assertNotEqual(board.zobrist_hash, start_hash)
+            move.revert(board)
+            self.assertEqual(board.zobrist_hash, start_hash)
+
+    def test_running_totals_match_full_scan(self):
+        """Test that apply and revert keep every player's net accounting current."""
+        board = self.game.board
+        rng = random.Random(2)
+        applied = []
+        for _ in range(30):
+            player = rng.choice(self.game.players)
+            move = rng.choice(player._generate_possible_moves(board, self.cards))
+            move.apply(board)
+            applied.append(move)
+            for p in range(board.no_players):
+                self.assertEqual(board.player_totals[p], board.calc_player_totals(p))
+        for move in reversed(applied):
+            move.revert(board)
+            for p in range(board.no_players):
+                self.assertEqual(board.player_totals[p], board.calc_player_totals(p))
+
+    def test_evaluate_moves_matches_apply(self):
+        """Test that batch evaluation gives the net of applying each move."""
+        board = self.game.board
+        for b in [board, ArrayBoard.from_board(board)]:
+            for player in self.game.players:
+                moves = player._generate_possible_moves(b, self.cards)
+                expected = []
+                for move in moves:
+                    move.apply(b)
+                    expected.append(b.calc_player_net(player.player_no))
+                    move.revert(b)
+                self.assertEqual(list(evaluate_moves(b, moves)), expected)
+
+    def test_zobrist_hash_ignores_move_order(self):
+        """Test that transposed move orders reach the same hash."""
+        board = self.game.board
+        moves = [m for m in self.game.players[0]._generate_possible_moves(board, self.cards) if m.move_type == 'build']
+        first, second = moves[0], moves[-1]
+        first.apply(board)
+        second.apply(board)
+        forward = board.zobrist_hash
+        second.revert(board)
+        first.revert(board)
+        second.apply(board)
+        first.apply(board)
+        self.assertEqual(board.zobrist_hash, forward)
+
+    def test_move_codes_match_game_moves(self):
+        """Test that move codes cover exactly the valid moves and round trip through GameMove."""
+        board = self.game.board
+        for b in [board, ArrayBoard.from_board(board)]:
+            for player in self.game.players:
+                codes = generate_move_codes(b, player.player_no, self.cards)
+                moves = [to_game_move(code, b, self.cards) for code in codes]
+                self.assertEqual(len(set(codes)), len(codes))
+                self.assertTrue(all(move.validate_move(b) for move in moves))
+                self.assertEqual([from_game_move(move, b, self.cards) for move in moves], codes)
+
+    def test_legal_cells_are_incremental(self):
+        """Test that the legal cells kept by apply and revert match a rebuild and validate_move."""
+        board = self.game.board
+        rng = random.Random(3)
+        for _ in range(20):
+            player = rng.choice(self.game.players)
+            rng.choice(player._generate_possible_moves(board, self.cards)).apply(board)
+            self.game.players[0].find_best_move(board, self.cards, max_depth=2)
+            board.update_legal_cells()
+            kept = (dict(board.open_cells), board.employee_remove_cells, board.employee_add_cells, list(board.player_occupied_cells))
+            building_cells = [dict(cells) for cells in board.player_building_cells]
+            board.refresh_player_totals()
+            board.refresh_legal_cells()
+            self.assertEqual(board.player_building_cells, building_cells)
+            self.assertEqual((board.open_cells, board.employee_remove_cells, board.employee_add_cells, board.player_occupied_cells), kept)
+            for p in range(board.no_players):
+                locations = board.card_index_to_location.values()
+                candidates = [GameMove(p, 'build', card, loc, 0, (0, 0), 0, 0) for loc in locations for card in self.cards]
+                candidates += [GameMove(p, 'employee', NO_BUILDING, (0, 0), d, loc, 0, 0) for loc in locations for d in [-1, 1]]
+                candidates += [GameMove(p, 'sell_price', NO_BUILDING, (0, 0), 0, (0, 0), d, 0) for d in [-1, 1]]
+                candidates += [GameMove(p, 'buy_price', NO_BUILDING, (0, 0), 0, (0, 0), 0, d) for d in [-1, 1]]
+                valid = {str(move) for move in candidates if move.validate_move(board)}
+                generated = {str(to_game_move(code, board, self.cards)) for code in generate_move_codes(board, p, self.cards)}
+                self.assertEqual(generated, valid)
+
+    def test_apply_code_matches_apply(self):
+        """Test that applying and reverting a code matches the equivalent GameMove."""
+        board = self.game.board
+        before = board_state(board)
+        for code in generate_move_codes(board, 1, self.cards):
+            move = to_game_move(code, board, self.cards)
+            move.apply(board)
+            expected, expected_hash = board_state(board), board.zobrist_hash
+            move.revert(board)
+            undo = apply_code(board, code, self.cards)
+            self.assertEqual((board_state(board), board.zobrist_hash), (expected, expected_hash))
+            revert_code(board, code, undo)
+            self.assertEqual(board_state(board), before)
+
+
+class TestTranspositionTable(unittest.TestCase):
+    """Test cases for the TranspositionTable class."""
+
+    def test_probe_and_store(self):
+        """Test that entries are found only for the stored depth."""
+        table = TranspositionTable(size=8)
+        self.assertIsNone(table.probe(12345, 2))
+        table.store(12345, 2, 7, 'move')
+        self.assertEqual(table.probe(12345, 2), (7, 'move'))
+        self.assertIsNone(table.probe(12345, 3))
+        self.assertEqual(table.hits, 1)
+        self.assertEqual(table.misses, 2)
+
+    def test_bounded_size(self):
+        """Test that the table never holds more than its fixed capacity."""
+        table = TranspositionTable(size=4)
+        for key in range(100):
+            table.store(key, key % 3, key, None)
+        self.assertLessEqual(len(table), 8)
+        self.assertGreater(table.replacements, 0)
+        table.clear()
+        self.assertEqual(len(table), 0)
+
+
+class TestPlayer(PositionTestCase):
+    """Test cases for the Player search."""
+
+    def reference_search(self, player, board, max_depth, current_depth=0):
+        """Exhaustive search that deep copies the board for every node."""
+        if current_depth == max_depth:
+            return None, board.calc_player_net(player.player_no)
+        best_move, best_net = None, float('-inf')
+        for move in player._generate_possible_moves(board, self.cards):
+            board_copy = copy.deepcopy(board)
+            move.apply(board_copy)
+            _, net = self.reference_search(player, board_copy, max_depth, current_depth + 1)
+            if net > best_net:
+                best_move, best_net = move, net
+        return best_move, best_net
+
+    def test_find_best_move_matches_deepcopy_search(self):
+        """Test that make/unmake search matches the deepcopy search."""
+        player = self.game.players[0]
+        before = board_state(self.game.board)
+        move, net, _ = player.find_best_move(self.game.board, self.cards, max_depth=2)
+        ref_move, ref_net = self.reference_search(player, self.game.board, 2)
+        self.assertEqual(str(move), str(ref_move))
+        self.assertEqual(net, ref_net)
+        self.assertEqual(board_state(self.game.board), before)
+
+    def test_find_best_move_with_transposition_table(self):
+        """Test that a transposition table does not change the search result."""
+        player = self.game.players[0]
+        move, net, _ = player.find_best_move(self.game.board, self.cards, max_depth=3)
+        table = TranspositionTable(size=1024)
+        tt_move, tt_net, _ = player.find_best_move(self.game.board, self.cards, max_depth=3, transposition_table=table)
+        self.assertEqual(str(tt_move), str(move))
+        self.assertEqual(tt_net, net)
+        self.assertGreater(table.hits, 0)
+
+    def test_find_best_move_with_pruning(self):
+        """Test that branch-and-bound pruning returns the exhaustive result."""
+        for player in self.game.players:
+            move, net, count = player.find_best_move(self.game.board, self.cards, max_depth=3)
+            pruned_move, pruned_net, pruned_count = player.find_best_move(self.game.board, self.cards, max_depth=3, prune=True)
+            self.assertEqual(str(pruned_move), str(move))
+            self.assertEqual(pruned_net, net)
+            self.assertGreater(player.nodes_pruned, 0)
+            self.assertLess(pruned_count, count)
+
+    def test_find_best_move_with_batch_leaves(self):
+        """Test that vectorised leaf evaluation does not change the search result."""
+        player = self.game.players[1]
+        move, net, count = player.find_best_move(self.game.board, self.cards, max_depth=2)
+        batch_move, batch_net, batch_count = player.find_best_move(self.game.board, self.cards, max_depth=2, batch_leaves=True)
+        self.assertEqual((str(batch_move), batch_net, batch_count), (str(move), net, count))
+
+    def test_parallel_search_matches_serial(self):
+        """Test that root-parallel search returns the serial search result."""
+        with ParallelSearch(self.game.board, max_workers=2, tt_size=256) as search:
+            for player in self.game.players:
+                move, net, count = player.find_best_move(self.game.board, self.cards, max_depth=2)
+                parallel_move, parallel_net, parallel_count = search.search(player, self.game.board, self.cards, max_depth=2, prune=True)
+                self.assertEqual((str(parallel_move), parallel_net), (str(move), net))
+                self.assertLessEqual(parallel_count, count)
+
+    def test_board_state_round_trip(self):
+        """Test that set_state restores a state captured by get_state."""
+        board = self.game.board
+        state = board.get_state()
+        totals = [dict(t) for t in board.player_totals]
+        other = copy.deepcopy(board)
+        play_random_moves(self.game, self.cards, 2, seed=5)
+        self.assertNotEqual(board.get_state(), state)
+        board.set_state(state, {card.card_type: card for card in self.cards})
+        self.assertEqual(board.get_state(), state)
+        self.assertEqual(board.player_totals, totals)
+        self.assertEqual(board.zobrist_hash, other.zobrist_hash)
+
+    def test_iterative_deepening_finds_best_net(self):
+        """Test that an unlimited iterative search reaches the exhaustive net."""
+        player = self.game.players[0]
+        _, net, _ = player.find_best_move(self.game.board, self.cards, max_depth=3)
+        before = board_state(self.game.board)
+        move, iterative_net, _ = player.find_best_move_iterative(self.game.board, self.cards, max_depth=3)
+        self.assertEqual(iterative_net, net)
+        self.assertEqual(player.last_completed_depth, 3)
+        self.assertTrue(move.validate_move(self.game.board))
+        self.assertEqual(board_state(self.game.board), before)
+
+    def test_iterative_deepening_respects_budget(self):
+        """Test that a node budget stops the search at a completed depth."""
+        player = self.game.players[0]
+        before = board_state(self.game.board)
+        move, net, count = player.find_best_move_iterative(self.game.board, self.cards, max_depth=6, node_budget=500)
+        depth = player.last_completed_depth
+        self.assertGreaterEqual(depth, 1)
+        self.assertLess(depth, 6)
+        _, expected_net, _ = player.find_best_move(self.game.board, self.cards, max_depth=depth)
+        self.assertEqual(net, expected_net)
+        self.assertEqual(board_state(self.game.board), before)
+
+    def test_search_stats(self):
+        """Test that the search statistics agree with the search result."""
+        player = self.game.players[0]
+        stats = SearchStats(timing=True)
+        _, _, count = player.find_best_move(self.game.board, self.cards, max_depth=3, prune=True, stats=stats)
+        self.assertIs(player.stats, stats)
+        self.assertEqual(stats.nodes, count + 1)
+        self.assertEqual(stats.nodes_by_depth[0], 1)
+        self.assertEqual(stats.moves_generated, count)
+        self.assertEqual(player.nodes_pruned, stats.cutoffs)
+        self.assertGreater(stats.cutoffs, 0)
+        self.assertGreater(stats.times['generate'], 0)
+        player.find_best_move(self.game.board, self.cards, max_depth=1)
+        self.assertIsNot(player.stats, stats)
+        self.assertEqual(player.stats.to_dict()['times'], None)
+
+    def test_search_tracer_is_bounded(self):
+        """Test that the tracer keeps only the most recent events."""
+        player = self.game.players[0]
+        tracer = SearchTracer(capacity=50)
+        move, net, _ = player.find_best_move(self.game.board, self.cards, max_depth=2, stats=SearchStats(tracer=tracer))
+        events = tracer.to_list(lambda code: str(to_game_move(code, self.game.board, self.cards)))
+        self.assertEqual(len(events), 50)
+        self.assertGreater(tracer.dropped, 0)
+        self.assertEqual(events[-1], {'seq': tracer.recorded - 1, 'event': 'best', 'depth': 0, 'move': str(move), 'net': net})
+
+    def test_net_upper_bound_is_admissible(self):
+        """Test that the pruning bound is never below the best reachable net."""
+        player = self.game.players[0]
+        board = self.game.board
+        player._bound_tables = player._calc_bound_tables(board, self.cards)
+        for depth in [1, 2]:
+            _, net, _ = player.find_best_move(board, self.cards, max_depth=depth)
+            self.assertGreaterEqual(player._calc_net_upper_bound(board, depth), net)
+
+
+class TestMCTSPlayer(PositionTestCase):
+    """Test cases for the Monte Carlo Tree Search player."""
+
+    def test_finds_valid_move_and_restores_board(self):
+        """Test that the search returns a valid move and leaves the board unchanged."""
+        player = MCTSPlayer(0, self.game.game_settings, seed=0)
+        before = board_state(self.game.board)
+        move, net, count = player.find_best_move(self.game.board, self.cards, max_depth=3, iterations=200)
+        self.assertEqual(count, 200)
+        self.assertTrue(move.validate_move(self.game.board))
+        self.assertEqual(board_state(self.game.board), before)
+        self.assertEqual(self.game.board.player_totals[0], self.game.board.calc_player_totals(0))
+        self.assertEqual(sum(child.visits for child in player.root.children), 200)
+
+    def test_one_move_horizon_finds_best_net(self):
+        """Test that with a horizon of one move the search finds the exhaustive optimum."""
+        player = MCTSPlayer(0, self.game.game_settings, seed=0)
+        _, net, _ = player.find_best_move(self.game.board, self.cards, max_depth=1, iterations=100)
+        _, best_net, _ = self.game.players[0].find_best_move(self.game.board, self.cards, max_depth=1)
+        self.assertLessEqual(net, best_net)
+        self.assertEqual(max(child.best_net for child in player.root.children), best_net)
+
+    def test_rejects_other_search_arguments(self):
+        """Test that arguments for other searches are refused rather than ignored."""
+        player = MCTSPlayer(0, self.game.game_settings, seed=0)
+        with self.assertRaises(TypeError):
+            player.find_best_move(self.game.board, self.cards, max_depth=5, prune=True)
+        self.game.players = [MCTSPlayer(p, self.game.game_settings, seed=p) for p in range(2)]
+        with self.assertRaises(TypeError):
+            self.game.play_turn(1, iterations=10, position_cache=None)
+        self.assertEqual(len(self.game.play_turn(1, iterations=10)), 2)
+
+
+class TestAdversarialPlayer(PositionTestCase):
+    """Test cases for the paranoid and max-n players."""
+
+    no_players, layout_seed, random_turns, moves_seed = 3, 1, 6, 2
+
+    def test_pruning_matches_full_search(self):
+        """Test that pruned searches find the net of the full search with fewer moves and restore the board."""
+        before = board_state(self.game.board)
+        for mode in ['paranoid', 'maxn']:
+            for player_ind in range(3):
+                move, net, count = AdversarialPlayer(player_ind, self.game.game_settings, mode).find_best_move(self.game.board, self.cards, max_depth=3)
+                _, full_net, full_count = AdversarialPlayer(player_ind, self.game.game_settings, mode, prune=False).find_best_move(self.game.board, self.cards, max_depth=3)
+                self.assertEqual(net, full_net)
+                self.assertLess(count, full_count)
+                self.assertTrue(move.validate_move(self.game.board))
+                self.assertEqual(board_state(self.game.board), before)
+
+    def test_one_move_horizon_matches_player(self):
+        """Test that looking one move ahead finds the same net as Player."""
+        for mode in ['paranoid', 'maxn']:
+            _, net, _ = AdversarialPlayer(1, self.game.game_settings, mode).find_best_move(self.game.board, self.cards, max_depth=1)
+            self.assertEqual(net, self.game.players[1].find_best_move(self.game.board, self.cards, max_depth=1)[1])
+
+    def test_budget_and_selfplay(self):
+        """Test that a node budget stops deepening and that self-play games run with both modes."""
+        player = AdversarialPlayer(0, self.game.game_settings)
+        player.find_best_move(self.game.board, self.cards, max_depth=6, node_budget=200)
+        self.assertLess(player.last_completed_depth, 6)
+        budget = SearchBudget(node_limit=200)
+        budget.start()
+        player.find_best_move(self.game.board, self.cards, max_depth=6, budget=budget)
+        self.assertLess(player.last_completed_depth, 6)
+        with self.assertRaises(TypeError):
+            player.find_best_move(self.game.board, self.cards, transposition_table=TranspositionTable())
+        for strategy in ['paranoid', 'maxn']:
+            result = play_selfplay_game(0, no_players=3, strategy=strategy, game_settings=Settings(no_of_turns_in_game=2))
+            self.assertEqual((len(result['nets']), len(result['moves'])), (3, 2))
+
+
+class TestSnapshot(PositionTestCase):
+    """Test cases for binary state snapshots."""
+
+    no_players, random_turns, moves_seed = 3, 4, 2
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        super().setUp()
+        self.game.turn_number = 4
+
+    def test_board_round_trip(self):
+        """Test that a snapshot restores the board state onto both board representations."""
+        board = self.game.board
+        data = encode_board(board)
+        self.assertLess(len(data), 200)
+        expected = (board.get_state(), board.zobrist_hash, [dict(totals) for totals in board.player_totals])
+        for target in [copy.deepcopy(board), ArrayBoard.from_board(board)]:
+            for player in self.game.players:
+                player._generate_possible_moves(target, self.cards)[0].apply(target)
+            self.assertNotEqual(target.get_state(), expected[0])
+            decode(data).restore(target, {card.card_type: card for card in self.cards})
+            self.assertEqual((target.get_state(), target.zobrist_hash, target.player_totals), expected)
+
+    def test_zero_copy_decode(self):
+        """Test that decoded arrays are views of the buffer, and bad buffers are rejected."""
+        buffer = np.frombuffer(encode_board(self.game.board), dtype=np.uint8).copy()
+        snapshot = decode(buffer)
+        self.assertTrue(np.shares_memory(snapshot.buildings, buffer))
+        self.assertTrue(np.shares_memory(snapshot.employees, buffer))
+        with self.assertRaises(ValueError):
+            decode(b'XXXX' + buffer.tobytes()[4:])
+        buffer[4] = 99 # version
+        with self.assertRaises(ValueError):
+            decode(memoryview(buffer))
+        other = Game(Settings(), no_players=3)
+        with self.assertRaises(ValueError):
+            decode(encode_board(other.board)).restore(self.game.board, {})
+
+    def test_game_round_trip_restores_random_state(self):
+        """Test that a restored game continues with the same turn number and random numbers."""
+        data = encode_game(self.game)
+        expected = random.random()
+        restored = copy.deepcopy(self.game)
+        play_random_moves(restored, self.cards, 1, seed=4)
+        restored.turn_number = 0
+        restore_game(restored, data)
+        self.assertEqual(restored.turn_number, 4)
+        self.assertEqual(restored.board.get_state(), self.game.board.get_state())
+        self.assertEqual(random.random(), expected)
+
+
+class TestReplay(unittest.TestCase):
+    """Test cases for replay logs."""
+
+    def test_game_at_matches_played_positions(self):
+        """Test that every turn of every logged game is reconstructed exactly."""
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = f'{log_dir}/games.jsonl'
+            positions = {}
+            for no_players, style in [(2, 'rectangle'), (3, 'diamond')]:
+                with ReplayWriter(path, keyframe_interval=3) as log:
+                    random.seed(no_players)
+                    game = Game(Settings(no_of_turns_in_game=7), no_players, board_style=style)
+                    game_id = log.start_game(game)
+                    positions[game_id] = [game.board.get_state()]
+                    while game.turn_number < 7:
+                        game.play_turn(max_depth=1)
+                        positions[game_id].append(game.board.get_state())
+                    nets = game.play_game()['nets']
+            replay = ReplayReader(path)
+            self.assertEqual(replay.games(), [0, 1])
+            self.assertEqual([t for t, _ in replay.index[1]['keyframes']], [0, 3, 6])
+            for game_id, states in positions.items():
+                for turn, state in enumerate(states):
+                    game = replay.game_at(game_id, turn)
+                    self.assertEqual((game.turn_number, game.board.get_state()), (turn, state))
+                self.assertEqual(len(list(replay.moves(game_id))), 7 * len(states[0][0]))
+            self.assertEqual(list(replay.records(1))[-1]['nets'], nets)
+
+    def test_logged_game_can_be_copied(self):
+        """Test that a game with an open log can be deep copied and pickled, and its copies are not logged."""
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = f'{log_dir}/games.jsonl'
+            with ReplayWriter(path) as log:
+                random.seed(0)
+                game = Game(Settings(no_of_turns_in_game=2), 2)
+                log.start_game(game)
+                for other in [copy.deepcopy(game), pickle.loads(pickle.dumps(game))]:
+                    self.assertIsNone(other.replay_log)
+                    self.assertEqual(other.board.get_state(), game.board.get_state())
+                    other.play_game(max_depth=1)
+                self.assertIs(game.replay_log, log)
+                game.play_game(max_depth=1)
+            self.assertEqual(len(list(ReplayReader(path).moves(0))), 2 * 2)
+
+    def test_interrupted_log_is_read_and_appended_to(self):
+        """Test that a log cut off mid-record is indexed without the partial line and can be appended to."""
+        with tempfile.TemporaryDirectory() as log_dir:
+            path = f'{log_dir}/games.jsonl'
+            log = ReplayWriter(path, keyframe_interval=1)
+            random.seed(0)
+            game = Game(Settings(no_of_turns_in_game=3), 2)
+            log.start_game(game)
+            game.play_turn(max_depth=1)
+            game.play_turn(max_depth=1)
+            log.start_turn(game)
+            with open(path, 'rb') as f:
+                written = f.read()
+            log.close()
+            # every record reached the file before the game ended; cut the last keyframe short
+            self.assertTrue(written.endswith(b'\n') and written.splitlines()[-1].startswith(b'{"type":"keyframe"'))
+            with open(path, 'wb') as f:
+                f.write(written[:-20])
+
+            replay = ReplayReader(path)
+            self.assertEqual([t for t, _ in replay.index[0]['keyframes']], [0, 1])
+            self.assertEqual(replay.game_at(0, 1).turn_number, 1)
+            with ReplayWriter(path) as log:
+                random.seed(1)
+                game = Game(Settings(no_of_turns_in_game=2), 2)
+                self.assertEqual(log.start_game(game), 1)
+                nets = game.play_game(max_depth=1)['nets']
+            replay = ReplayReader(path)
+            self.assertEqual(replay.games(), [0, 1])
+            self.assertEqual(list(replay.records(1))[-1]['nets'], nets)
+            self.assertEqual(replay.game_at(1, 2).board.get_state(), game.board.get_state())
+
+
+class TestPositionCache(unittest.TestCase):
+    """Test cases for the persistent position cache."""
+
+    def test_cached_games_match_searched_games(self):
+        """Test that games played through the cache, in new connections, match games played without it."""
+        expected = play_selfplay_game(3, game_settings=Settings(no_of_turns_in_game=3))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = f'{cache_dir}/positions.sqlite'
+            for _ in range(2):
+                result = play_selfplay_game(3, game_settings=Settings(no_of_turns_in_game=3), position_cache=path)
+                self.assertEqual((result['nets'], result['moves']), (expected['nets'], expected['moves']))
+            with PositionCache(path) as cache:
+                self.assertEqual(len(cache), 3 * 2)
+
+            random.seed(3)
+            game = Game(Settings(no_of_turns_in_game=3), 2)
+            cards = game.get_turn_building_cards(False, 4)
+            with PositionCache(path) as cache:
+                move, net, _ = game.players[0].find_best_move(game.board, cards, max_depth=2, position_cache=cache)
+                self.assertEqual((cache.hits, cache.misses), (1, 0))
+                for key_args in [(1, 2, -1), (0, 3, -1), (0, 2, 5)]:
+                    self.assertIsNone(cache.get(position_key(game.board, cards, *key_args)))
+                self.assertIsNone(cache.get(position_key(game.board, cards[1:], 0, 2)))
+            searched_move, searched_net, _ = game.players[0].find_best_move(game.board, cards, max_depth=2)
+            self.assertEqual((str(move), net), (str(searched_move), searched_net))
+            with PositionCache(path) as cache:
+                game.players[0].find_best_move(game.board, cards, max_depth=2, ordering=MoveOrdering(), position_cache=cache)
+                game.players[0].find_best_move(game.board, cards, max_depth=2, moves_to_try=3, position_cache=cache)
+                self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 3 * 2))
+
+    def test_least_recently_used_are_evicted(self):
+        """Test that eviction keeps the most recently stored or looked up positions."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with PositionCache(f'{cache_dir}/positions.sqlite', max_entries=2, evict_interval=1) as cache:
+                cache.put(b'a', 1, 1.0, 1)
+                cache.put(b'b', None, float('-inf'), 0)
+                self.assertEqual(cache.get(b'a'), (1, 1.0, 1))
+                cache.put(b'c', 3, 3.0, 3)
+                self.assertEqual(len(cache), 2)
+                self.assertIsNone(cache.get(b'b'))
+                self.assertEqual(cache.get(b'a'), (1, 1.0, 1))
+
+
+class TestMatchServer(unittest.TestCase):
+    """Test cases for the asyncio match server."""
+
+    def test_hosts_ai_and_client_games(self):
+        """Test that concurrent AI games and a scripted client game play to the end over a socket."""
+        async def run(path):
+            server = MatchServer(max_workers=1, time_budget=0.5)
+            serving = asyncio.create_task(server.serve(path=path))
+            await asyncio.sleep(0.1)
+            reader, writer = await asyncio.open_unix_connection(path)
+
+            async def call(**request):
+                writer.write((json.dumps(request) + '\n').encode())
+                await writer.drain()
+                return json.loads(await reader.readline())
+
+            settings = {'no_of_turns_in_game': 2}
+            ai_games = [(await call(op='new_game', players=2, seed=seed, settings=settings))['game'] for seed in range(3)]
+            client_game = (await call(op='new_game', players=2, seats=['ai', 'client'], seed=0, settings=settings))['game']
+            for turn in range(2):
+                state = await call(op='wait_turn', game=client_game, seat=1)
+                self.assertEqual((state['turn'], state['to_move']), (turn, 1))
+                self.assertFalse((await call(op='move', game=client_game, seat=1, move=[1, 'hq', 'none', 0, 0, 1]))['ok'])
+                self.assertTrue((await call(op='move', game=client_game, seat=1, move=[1, 'sell_price', 'none', 0, 0, 1 - 2 * turn]))['ok'])
+            results = [await call(op='result', game=game_id, id=game_id) for game_id in ai_games + [client_game]]
+            stats = await call(op='stats')
+            self.assertFalse((await call(op='state', game=99))['ok'])
+            writer.close()
+            await writer.wait_closed()
+            serving.cancel()
+            server.close()
+            return results, stats
+
+        with tempfile.TemporaryDirectory() as socket_dir:
+            results, stats = asyncio.run(run(f'{socket_dir}/server.sock'))
+        self.assertEqual([r['id'] for r in results], [0, 1, 2, 3])
+        self.assertTrue(all(len(r['nets']) == 2 and len(r['moves']) == 2 for r in results))
+        self.assertEqual([turn[1][1:] for turn in results[-1]['moves']], [['sell_price', 'none', 0, 0, 1], ['sell_price', 'none', 0, 0, -1]])
+        self.assertEqual((stats['games'], stats['latency_ms']['count']), (0, 3 * 4 + 2))
+        self.assertLessEqual(stats['latency_ms']['p50'], stats['latency_ms']['p99'])
+
+    def test_answers_invalid_requests(self):
+        """Test that malformed requests, invalid new_game arguments and unknown seats are answered with an error."""
+        async def run(path):
+            server = MatchServer(max_workers=1)
+            serving = asyncio.create_task(server.serve(path=path))
+            await asyncio.sleep(0.1)
+            reader, writer = await asyncio.open_unix_connection(path)
+            responses = []
+            for line in ['[1]', 'not json', '{"op": "new_game", "style": "hexagon"}', '{"op": "new_game", "depth": "a"}',
+                         '{"op": "new_game", "time_budget": 0}', '{"op": "new_game", "players": 5}',
+                         '{"op": "new_game", "settings": {"no_of_turns_in_game": "x"}}', '{"op": "new_game", "settings": {"turns": 2}}',
+                         '{"op": "new_game", "settings": {"no_players_to_board_size": {"2": 99}}}']:
+                writer.write((line + '\n').encode())
+                await writer.drain()
+                responses.append(json.loads(await asyncio.wait_for(reader.readline(), 5)))
+            writer.write(b'{"op": "stats"}\n')
+            stats = json.loads(await reader.readline())
+            game_id = server.new_game(seats=['client', 'client'])
+            seat_responses = []
+            for request in [{'op': 'wait_turn'}, {'op': 'wait_turn', 'seat': 'a'}, {'op': 'move', 'seat': -1, 'move': None},
+                            {'op': 'move', 'seat': 99, 'move': None}]:
+                writer.write((json.dumps({**request, 'game': game_id}) + '\n').encode())
+                seat_responses.append(json.loads(await asyncio.wait_for(reader.readline(), 5)))
+            writer.close()
+            await writer.wait_closed()
+            serving.cancel()
+            server.close()
+            return responses, stats, seat_responses
+
+        with tempfile.TemporaryDirectory() as socket_dir:
+            responses, stats, seat_responses = asyncio.run(run(f'{socket_dir}/server.sock'))
+        self.assertTrue(all(not r['ok'] and r['error'] for r in responses))
+        self.assertEqual(stats['games'], 0)
+        self.assertTrue(all(not r['ok'] and r['error'].startswith('seat must be an integer from 0 to 1') for r in seat_responses))
+
+
+class TestLayouts(unittest.TestCase):
+    """Test cases for bulk layout generation and scoring."""
+
+    def test_surplus_cards_are_left_out(self):
+        """Test that boards with more cards than locations generate layouts of their locations."""
+        layouts = generate_layouts(20, no_players=1, style='linear', seed=0)
+        cells = Board(Settings(), 1, style='linear').rules.cells
+        self.assertTrue((layouts.reshape(20, -1)[:, cells] != 0).all())
+        self.assertEqual(int((layouts != 0).sum()), 20 * len(cells))
+        board = to_board(layouts[0], no_players=1, style='linear')
+        self.assertEqual(sorted(card.card_type for card in board.cards), sorted(card.card_type for card in Board(Settings(), 1, style='linear').cards))
+        types = [[card.card_type if card is not None else 'none' for card in row] for row in board.card_array]
+        self.assertEqual(types, [[BOARD_CODE_TYPES[code] for code in row] for row in layouts[0]])
+        self.assertEqual(score_layouts(layouts, no_players=1)['start_nets'].shape, (20, 1))
+
+    def test_generated_layouts_match_boards(self):
+        """Test that layouts hold the board's cards on its mask and score as their boards do."""
+        layouts = generate_layouts(50, no_players=3, style='diamond', seed=0)
+        self.assertTrue(np.array_equal(layouts, generate_layouts(50, no_players=3, style='diamond', seed=0)))
+        self.assertEqual(len({layout.tobytes() for layout in layouts}), 50)
+        scores = score_layouts(layouts, no_players=3)
+        table = start_net_table()
+        for ind in range(5):
+            board = to_board(layouts[ind], no_players=3, style='diamond')
+            types = [[card.card_type if card is not None else 'none' for card in row] for row in board.card_array]
+            self.assertEqual(types, [[BOARD_CODE_TYPES[code] for code in row] for row in layouts[ind]])
+            self.assertEqual(sorted(card.card_type for card in board.cards), sorted(card.card_type for card in Board(Settings(), 3, style='diamond').cards))
+
+            edges, nets = {'farm': 0, 'residential': 0}, []
+            for (i, j) in board.card_index_to_location.values():
+                if types[i][j] == 'industry':
+                    counts = {t: sum(types[ii][jj] == t for (ii, jj) in board.neighbours[(i, j)]) for t in edges}
+                    edges = {t: edges[t] + counts[t] for t in edges}
+                    nets.append(table[counts['farm'], counts['residential']])
+            self.assertEqual((scores['industry_farm_edges'][ind], scores['industry_residential_edges'][ind]), (edges['farm'], edges['residential']))
+            self.assertEqual(scores['start_nets'][ind].tolist(), sorted(nets, reverse=True)[:3])
+
+    def test_start_net_table_is_reachable(self):
+        """Test that each table net is the best a player makes building around a process on a real board."""
+        board = to_board(generate_layouts(1, seed=3)[0])
+        cards = {t: BuildingCard(card_type=t) for t in ['buy_market', 'sell_market', 'process']}
+        start = board.get_state()
+        table = start_net_table()
+        for (i, j) in board.card_index_to_location.values():
+            if board.card_array[i][j].card_type != 'industry':
+                continue
+            farms = [n for n in board.neighbours[(i, j)] if n in board.location_to_card_index and board.card_array[n[0]][n[1]].card_type == 'farm']
+            residentials = [n for n in board.neighbours[(i, j)] if n in board.location_to_card_index and board.card_array[n[0]][n[1]].card_type == 'residential']
+            best = 0
+            for buy_markets in range(len(farms) + 1):
+                for sell_markets in range(len(residentials) + 1):
+                    for buy_price in range(1, 5):
+                        for sell_price in range(2, 6):
+                            if 1 + buy_markets + sell_markets + buy_price - 1 + sell_price - 2 > Settings().no_of_turns_in_game:
+                                continue
+                            board.set_building(0, i, j, cards['process'])
+                            for (ii, jj) in farms[:buy_markets]:
+                                board.set_building(0, ii, jj, cards['buy_market'])
+                            for (ii, jj) in residentials[:sell_markets]:
+                                board.set_building(0, ii, jj, cards['sell_market'])
+                            board.shift_buy_price(0, buy_price - 1)
+                            board.shift_sell_price(0, sell_price - 2)
+                            best = max(best, board.calc_player_net(0))
+                            board.set_state(start, cards)
+            self.assertEqual(best, table[len(farms), len(residentials)])
+
+
+class TestSweep(unittest.TestCase):
+    """Test cases for Settings parameter sweeps."""
+
+    def test_expand_grid(self):
+        """Test that every combination of field values becomes a Settings."""
+        allowed = [['industry'], ['industry', 'farm'], ['farm', 'residential']]
+        grid = expand_grid(Settings(player_starting_cap=5), no_of_turns_in_game=[2, 3], hq_allowed_on=allowed)
+        self.assertEqual([(s.no_of_turns_in_game, s.hq_allowed_on) for s in grid], [(t, a) for t in [2, 3] for a in allowed])
+        self.assertTrue(all(s.player_starting_cap == 5 for s in grid))
+        with self.assertRaises(ValueError):
+            expand_grid(not_a_field=[1])
+        with self.assertRaises(ValueError):
+            expand_grid(emp_cost=[1, 2])
+
+    def test_sweep_reuses_cached_points(self):
+        """Test that extending a sweep only plays games for the new points."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            base = Settings(no_of_turns_in_game=2)
+            first = run_sweep(expand_grid(base, no_of_turns_in_game=[2]), no_games=2, cache_dir=cache_dir, max_workers=1)
+            second = run_sweep(expand_grid(base, no_of_turns_in_game=[2, 3]), no_games=2, cache_dir=cache_dir, max_workers=1)
+            self.assertEqual([p['cached'] for p in first], [False])
+            self.assertEqual([p['cached'] for p in second], [True, False])
+            self.assertEqual(second[0]['summary'], first[0]['summary'])
+            self.assertNotEqual(second[0]['key'], second[1]['key'])
+
 
 if __name__ == '__main__':
     unittest.main()